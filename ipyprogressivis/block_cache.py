@@ -0,0 +1,287 @@
+"""
+Local block cache for the remote (fsspec) sources read by the sniffers and loaders.
+
+A remote file is read by fixed size blocks. Every block is stored in the cache
+directory under the hash of (url, version, block number), the version being the
+ETag (or size and modification time) of the file, so a changed file never
+reuses stale blocks. The least recently used blocks are evicted when the cache
+exceeds its size limit. When a file is read sequentially, the next blocks are
+fetched in background threads (read-ahead) so the network latency overlaps
+with the parsing.
+
+The versions are kept in a manifest, so cached files remain readable offline.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+import fsspec  # type: ignore
+from fsspec.compression import compr  # type: ignore
+from fsspec.utils import infer_compression, get_protocol  # type: ignore
+from typing import Any, IO
+
+#: protocols read through the cache (the local files are not cached)
+CACHED_PROTOCOLS = {"http", "https", "s3", "s3a", "gs", "gcs", "ftp", "sftp", "az", "abfs"}
+
+
+@dataclass
+class CacheSettings:
+    enabled: bool = True
+    directory: str = os.path.join(os.path.expanduser("~"), ".progressivis", "block_cache")
+    max_size: int = 2 << 30  # bytes
+    block_size: int = 4 << 20  # bytes
+    read_ahead: int = 2  # blocks fetched in advance
+    offline: bool = False  # only the cached blocks are read
+
+
+SETTINGS = CacheSettings()
+_CACHE: BlockCache | None = None
+
+
+def configure_cache(**kw: Any) -> CacheSettings:
+    """
+    Changes the cache settings (see `CacheSettings`), e.g.
+    `configure_cache(max_size=10 << 30, read_ahead=4)`
+    """
+    global _CACHE
+    for key, value in kw.items():
+        if not hasattr(SETTINGS, key):
+            raise ValueError(f"unknown cache setting '{key}'")
+        setattr(SETTINGS, key, value)
+    _CACHE = None  # rebuilt with the new settings
+    return SETTINGS
+
+
+def get_cache() -> BlockCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = BlockCache(SETTINGS)
+    return _CACHE
+
+
+def is_cached(url: Any) -> bool:
+    "True if `url` is read through the cache"
+    return (
+        SETTINGS.enabled and isinstance(url, str) and get_protocol(url) in CACHED_PROTOCOLS
+    )
+
+
+def _hash(*parts: Any) -> str:
+    return hashlib.sha256("\0".join(str(p) for p in parts).encode()).hexdigest()
+
+
+class BlockCache:
+    """
+    Content addressed block store with a size based LRU eviction
+    """
+
+    def __init__(self, settings: CacheSettings) -> None:
+        self.settings = settings
+        self.directory = settings.directory
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, settings.read_ahead))
+        self._pending: dict[str, Future[bytes]] = {}
+        # block key -> size, in LRU order (oldest first)
+        self._blocks: dict[str, int] = {}
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if len(name) == 64:  # a block
+                    st = os.stat(os.path.join(root, name))
+                    entries.append((st.st_atime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._blocks[name] = size
+        self._size = sum(self._blocks.values())
+        self._manifest_path = os.path.join(self.directory, "manifest.json")
+        self._manifest: dict[str, dict[str, Any]] = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def file_info(self, url: str) -> dict[str, Any]:
+        "size and version of a remote file, from the manifest when offline"
+        if not self.settings.offline:
+            try:
+                fs, path = fsspec.core.url_to_fs(url)
+                info = fs.info(path)
+                version = info.get("ETag") or info.get("etag") or info.get("mtime") or ""
+                entry = dict(size=info["size"], version=str(version))
+                with self._lock:
+                    if self._manifest.get(url) != entry:
+                        self._manifest[url] = entry
+                        tmp = f"{self._manifest_path}.tmp"
+                        with open(tmp, "w") as f:
+                            json.dump(self._manifest, f)
+                        os.replace(tmp, self._manifest_path)
+                return entry
+            except (OSError, FileNotFoundError):
+                pass  # falls back to the manifest
+        if url not in self._manifest:
+            raise FileNotFoundError(f"{url} is neither reachable nor cached")
+        return self._manifest[url]
+
+    def _load(self, key: str) -> bytes | None:
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:  # most recently used
+            self._blocks[key] = self._blocks.pop(key, len(data))
+        os.utime(self._path(key))
+        return data
+
+    def _store(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._size += len(data) - self._blocks.pop(key, 0)
+            self._blocks[key] = len(data)
+            evicted = []
+            while self._size > self.settings.max_size and len(self._blocks) > 1:
+                old = next(iter(self._blocks))
+                self._size -= self._blocks.pop(old)
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self._path(old))
+            except FileNotFoundError:
+                pass
+
+    def _fetch(self, url: str, key: str, start: int, end: int) -> bytes:
+        fs, path = fsspec.core.url_to_fs(url)
+        data = fs.cat_file(path, start=start, end=end)
+        self._store(key, data)
+        return data
+
+    def block(self, url: str, version: str, size: int, i: int) -> bytes:
+        "the i-th block of the file, fetched if not cached"
+        key = _hash(url, version, self.settings.block_size, i)
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            return pending.result()
+        if (data := self._load(key)) is not None:
+            return data
+        if self.settings.offline:
+            raise FileNotFoundError(f"block {i} of {url} is not cached")
+        start = i * self.settings.block_size
+        return self._fetch(url, key, start, min(size, start + self.settings.block_size))
+
+    def read_ahead(self, url: str, version: str, size: int, first: int) -> None:
+        "fetches in background the blocks following `first`"
+        if self.settings.offline:
+            return
+        block_size = self.settings.block_size
+        n_blocks = (size + block_size - 1) // block_size
+        for i in range(first, min(first + self.settings.read_ahead, n_blocks)):
+            key = _hash(url, version, block_size, i)
+            with self._lock:
+                if key in self._blocks or key in self._pending:
+                    continue
+                start = i * block_size
+                fut = self._pool.submit(
+                    self._fetch, url, key, start, min(size, start + block_size)
+                )
+                self._pending[key] = fut
+            fut.add_done_callback(lambda _, key=key: self._forget(key))
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+
+
+class CachedFile(io.RawIOBase):
+    """
+    Seekable read only binary file on a remote url, read through the block cache
+    """
+
+    def __init__(self, url: str, cache: BlockCache | None = None) -> None:
+        super().__init__()
+        self.url = url
+        self.cache = cache or get_cache()
+        info = self.cache.file_info(url)
+        self._size: int = info["size"]
+        self._version: str = info["version"]
+        self._pos = 0
+        self._last_block = -1
+
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def readinto(self, buffer: Any) -> int:
+        block_size = self.cache.settings.block_size
+        view = memoryview(buffer).cast("B")
+        n = 0
+        while n < len(view) and self._pos < self._size:
+            i, offset = divmod(self._pos, block_size)
+            data = self.cache.block(self.url, self._version, self._size, i)
+            if i == self._last_block + 1:  # sequential read
+                self.cache.read_ahead(self.url, self._version, self._size, i + 1)
+            self._last_block = i
+            chunk = data[offset: offset + len(view) - n]
+            view[n: n + len(chunk)] = chunk
+            n += len(chunk)
+            self._pos += len(chunk)
+        return n
+
+
+def open_url(
+    url: str,
+    mode: str = "rb",
+    compression: str | None = None,
+    encoding: str | None = None,
+) -> IO[Any]:
+    """
+    Opens `url` for reading like `fsspec.open(...).open()`, the remote files
+    being read through the block cache and the decompression being
+    multi-threaded when possible (see `ipyprogressivis.decompress`)
+    """
+    from ipyprogressivis.decompress import PARALLEL_CODECS, open_decompressed
+
+    if compression == "infer":
+        compression = infer_compression(url)
+    f: Any
+    if compression in PARALLEL_CODECS:
+        f = io.BufferedReader(open_decompressed(url, compression))  # type: ignore
+    elif not is_cached(url):
+        return fsspec.open(  # type: ignore
+            url, mode=mode, compression=compression, encoding=encoding
+        ).open()
+    elif compression:
+        f = compr[compression](CachedFile(url), mode="rb")
+    else:
+        f = io.BufferedReader(CachedFile(url))
+    if "t" in mode:
+        f = io.TextIOWrapper(f, encoding=encoding)
+    return f  # type: ignore
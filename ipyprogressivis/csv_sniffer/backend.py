@@ -13,8 +13,9 @@ import logging
 # import pprint
 
 import pandas as pd
-import fsspec  # type: ignore
+from pandas.tseries.api import guess_datetime_format
 from ipyprogressivis.ipywel import Proxy
+from ipyprogressivis.block_cache import open_url
 
 # from traitlets import HasTraits, observe, Instance
 
@@ -83,6 +84,43 @@ def _merge_with_dialect_properties(
     return kwds
 
 
+#: formats tried when the format guessed from the first value does not fit all the values
+DATETIME_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%Y%m%d",
+]
+
+
+def infer_date_format(values: pd.Series[Any], dayfirst: bool = False) -> str | None:
+    """
+    Exact strptime format of all the (non null) `values`, None if there is
+    no such format
+    """
+    values = values.dropna().astype(str)
+    if not len(values):
+        return None
+    candidates = []
+    if guess := guess_datetime_format(values.iloc[0], dayfirst=dayfirst):
+        candidates.append(guess)
+    candidates += [fmt for fmt in DATETIME_FORMATS if fmt not in candidates]
+    for fmt in candidates:
+        if pd.to_datetime(values, format=fmt, errors="coerce").notna().all():
+            return fmt
+    return None
+
+
 class CSVSniffer:
     """
     Non progressive class to assist in specifying parameters
@@ -198,7 +236,7 @@ class CSVSniffer:
     def head(self) -> str:
         if self._head:
             return self._head
-        with fsspec.open(self.path, mode="rt", compression="infer") as inp:
+        with open_url(self.path, mode="rt", compression="infer") as inp:
             lineno = 0
             # TODO assumes that newline is correctly specified to fsspec
             for line in inp:
@@ -299,6 +337,7 @@ class CSVSniffer:
         needs_names = False
         names_types: dict[Hashable, str] = dict()
         na_values: dict[Hashable, list[str]] = dict()
+        date_formats: dict[Hashable, str] = dict()
         assert self._df is not None
         for name in list(self._df.columns):
             col = self.column[name]
@@ -316,6 +355,8 @@ class CSVSniffer:
                 if type_ == "datetime":
                     types[rname] = "str"
                     parse_dates.append(rname)
+                    if fmt := col.date_format(self.dayfirst):
+                        date_formats[rname] = fmt
                 else:
                     types[rname] = type_
             raw = col.na_values_
@@ -341,6 +382,9 @@ class CSVSniffer:
             self.params["parse_dates"] = parse_dates
             self.params["dayfirst"] = self.dayfirst
             self.params["date_format"] = self.date_format
+            if self.date_format == "mixed" and date_formats:
+                # exact formats, "mixed" being the fallback of the loader
+                self.params["date_format"] = date_formats
         # usecols
         if names == usecols:
             if "usecols" in self.params:
@@ -442,6 +486,17 @@ class PColumnInfo:
         self.na_values_ = ""
         self.na_values_sep = ""
         self.filtering_ck = False
+        self._date_formats: dict[bool, str | None] = {}
+
+    def date_format(self, dayfirst: bool) -> str | None:
+        "exact format of the sampled values, once retyped as datetime"
+        if dayfirst not in self._date_formats:
+            self._date_formats[dayfirst] = (
+                infer_date_format(self.series, dayfirst)
+                if pd.api.types.is_string_dtype(self.series.dtype)
+                else None
+            )
+        return self._date_formats[dayfirst]
 
     def retype_values(self) -> list[str]:
         type = self.series.dtype.name
@@ -0,0 +1,447 @@
+"""
+Multi-threaded decompression of the compressed inputs of the sniffer and loaders.
+
+The compressed stream is cut into independent units which are decoded by a pool
+of threads (the codecs release the GIL), a producer thread handing the decoded
+units, in order, to the reader. The decompression is then a pipeline stage
+running ahead of the parsing:
+
+* bzip2: every block is a unit. The blocks are found by their bit aligned magic
+  number, then re-encoded as standalone streams. If a block cannot be decoded
+  (a magic number found inside the compressed data) the file is decoded
+  sequentially from the point reached.
+* gzip: the members are units. A first sequential read builds an index of the
+  member boundaries, stored next to the block cache, which the later reads use
+  to decode the members in parallel. A single member file (the usual ``gzip``
+  output) has no parallel decoding, unlike the ``bgzip`` or ``pigz -i`` outputs.
+* zstd (requires the ``zstandard`` package): the frames are units.
+"""
+from __future__ import annotations
+
+import bz2
+import io
+import json
+import os
+import queue
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import fsspec  # type: ignore
+from fsspec.utils import infer_compression  # type: ignore
+from ipyprogressivis.block_cache import SETTINGS, CachedFile, get_cache, is_cached, _hash
+from typing import Any, Callable, IO, Iterator
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 1 << 20  # compressed bytes read at once
+WORKERS = min(8, os.cpu_count() or 1)
+
+#: codecs decompressed by `DecompressedFile`
+PARALLEL_CODECS = {"bz2", "gzip"} | ({"zstd"} if zstandard is not None else set())
+
+Unit = tuple[Callable[[Any], bytes], Any]  # decoding function and its argument
+
+
+def resolve_compression(url: str, compression: str | None) -> str | None:
+    "the codec of `url`, inferred from its extension if `compression` is 'infer'"
+    if compression == "infer":
+        return infer_compression(url)  # type: ignore
+    return compression
+
+
+def _decoded(data: bytes) -> bytes:
+    return data
+
+
+# bzip2
+
+BLOCK_MAGIC = 0x314159265359
+EOS_MAGIC = 0x177245385090
+
+
+def _bits(data: bytes, pos: int, n: int) -> int:
+    "the `n` bits starting at bit `pos` of `data`"
+    i, j = pos >> 3, (pos + n + 7) >> 3
+    v = int.from_bytes(data[i:j], "big")
+    return (v >> ((j - i) * 8 - (pos & 7) - n)) & ((1 << n) - 1)
+
+
+def _bit_positions(data: bytes, magic: int, start: int) -> list[int]:
+    "bit offsets (>= `start`) of the 48 bits `magic` in `data`"
+    res = []
+    end = len(data) * 8 - 48
+    for shift in range(8):
+        word = (magic << (16 - shift)).to_bytes(8, "big")
+        # bytes entirely covered by the magic number when it starts at bit `shift`
+        first = 0 if shift == 0 else 1
+        middle = word[first:6]
+        k = max(0, (start >> 3) - 1)
+        while (k := data.find(middle, k)) >= 0:
+            pos = (k - first) * 8 + shift
+            if start <= pos <= end and _bits(data, pos, 48) == magic:
+                res.append(pos)
+            k += 1
+    return res
+
+
+class _Bz2Splitter:
+    "cuts a bzip2 stream into standalone single block streams"
+
+    def __init__(self) -> None:
+        self._buf = b""
+        self._scanned = 0  # bit offset in _buf where the search resumes
+        self._start: int | None = None  # bit offset in _buf of the current block
+
+    def _stream(self, a: int, b: int) -> bytes:
+        "standalone stream of the block in bits [a, b)"
+        n = b - a
+        v = _bits(self._buf, a, n)
+        crc = (v >> (n - 80)) & 0xFFFFFFFF  # follows the block magic
+        nbits = n + 80
+        v = (v << 80) | (EOS_MAGIC << 32) | crc  # the stream CRC of a single block
+        pad = -nbits % 8
+        return b"BZh9" + (v << pad).to_bytes((nbits + pad) // 8, "big")
+
+    def feed(self, data: bytes) -> list[bytes]:
+        self._buf += data
+        marks = sorted(
+            [(pos, True) for pos in _bit_positions(self._buf, BLOCK_MAGIC, self._scanned)]
+            + [(pos, False) for pos in _bit_positions(self._buf, EOS_MAGIC, self._scanned)]
+        )
+        res = []
+        for pos, is_block in marks:
+            if self._start is not None:
+                res.append(self._stream(self._start, pos))
+            self._start = pos if is_block else None
+        self._scanned = max(self._scanned, len(self._buf) * 8 - 47)
+        cut = self._scanned >> 3 if self._start is None else self._start >> 3
+        self._buf = self._buf[cut:]
+        self._scanned -= cut * 8
+        if self._start is not None:
+            self._start -= cut * 8
+        return res
+
+    def finish(self) -> None:
+        if self._start is not None:
+            raise OSError("truncated bzip2 stream")
+
+
+def _bz2_units(f: IO[bytes]) -> Iterator[Unit]:
+    splitter = _Bz2Splitter()
+    while data := f.read(CHUNK_SIZE):
+        for stream in splitter.feed(data):
+            yield bz2.decompress, stream
+    splitter.finish()
+
+
+# gzip
+
+def _gunzip(data: bytes) -> bytes:
+    "decodes consecutive gzip members"
+    res = []
+    while data:
+        d = zlib.decompressobj(31)
+        res.append(d.decompress(data))
+        if not d.eof:
+            raise OSError("truncated gzip member")
+        data = d.unused_data
+    return b"".join(res)
+
+
+def index_path(key: str) -> str:
+    "file of the gzip index of `key`, next to the block cache"
+    return os.path.join(SETTINGS.directory, "gzip_index", f"{_hash(key)}.json")
+
+
+def load_gzip_index(key: str | None) -> list[tuple[int, int]] | None:
+    "(compressed, uncompressed) end offsets of the members, None if not indexed"
+    if key is None or not os.path.exists(index_path(key)):
+        return None
+    with open(index_path(key)) as f:
+        return [tuple(end) for end in json.load(f)["ends"]]  # type: ignore
+
+
+def _save_gzip_index(key: str, ends: list[tuple[int, int]]) -> None:
+    path = index_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(dict(ends=ends), f)
+    os.replace(tmp, path)
+
+
+def _gzip_units(f: IO[bytes], key: str | None) -> Iterator[Unit]:
+    ends = load_gzip_index(key)
+    if ends is not None and len(ends) > 1:
+        # consecutive members are grouped into units of at least CHUNK_SIZE bytes
+        start = 0
+        for i, (end, _) in enumerate(ends):
+            if end - start >= CHUNK_SIZE or i == len(ends) - 1:
+                yield _gunzip, f.read(end - start)
+                start = end
+        return
+    # sequential decoding, the member ends being indexed
+    ends = []
+    pos = out = 0  # compressed offset of `data`, uncompressed size
+    d: Any = None  # decompressor of the current member
+    while data := f.read(CHUNK_SIZE):
+        while data:
+            if d is None:
+                if not data.strip(b"\0"):  # trailing padding
+                    break
+                d = zlib.decompressobj(31)
+            res = d.decompress(data)
+            out += len(res)
+            yield _decoded, res
+            if not d.eof:
+                pos += len(data)
+                break
+            pos += len(data) - len(d.unused_data)
+            ends.append((pos, out))
+            data, d = d.unused_data, None
+    if d is not None:
+        raise OSError("truncated gzip stream")
+    if key is not None:
+        _save_gzip_index(key, ends)
+
+
+# zstd
+
+ZSTD_MAGIC = 0xFD2FB528
+
+
+def _zstd_frame_size(buf: bytes, i: int) -> int | None:
+    "size of the frame starting at `i`, None if it is not entirely in `buf`"
+    if len(buf) < i + 8:
+        return None
+    magic = int.from_bytes(buf[i: i + 4], "little")
+    if magic & 0xFFFFFFF0 == 0x184D2A50:  # skippable frame
+        return 8 + int.from_bytes(buf[i + 4: i + 8], "little")
+    if magic != ZSTD_MAGIC:
+        raise OSError("invalid zstd frame")
+    fhd = buf[i + 4]
+    single_segment = (fhd >> 5) & 1
+    fcs_size = [single_segment, 2, 4, 8][fhd >> 6]
+    pos = i + 5 + (not single_segment) + [0, 1, 2, 4][fhd & 3] + fcs_size
+    while True:
+        if len(buf) < pos + 3:
+            return None
+        header = int.from_bytes(buf[pos: pos + 3], "little")
+        pos += 3 + (1 if (header >> 1) & 3 == 1 else header >> 3)  # RLE: one byte
+        if header & 1:  # last block
+            break
+    pos += 4 * ((fhd >> 2) & 1)  # checksum
+    return pos - i if pos <= len(buf) else None
+
+
+def _unzstd(frames: list[bytes]) -> bytes:
+    dctx = zstandard.ZstdDecompressor()
+    return b"".join(
+        dctx.decompressobj().decompress(frame)
+        for frame in frames
+        if int.from_bytes(frame[:4], "little") == ZSTD_MAGIC
+    )
+
+
+def _zstd_units(f: IO[bytes]) -> Iterator[Unit]:
+    buf = b""
+    frames: list[bytes] = []
+    size = 0
+    while data := f.read(CHUNK_SIZE):
+        buf += data
+        i = 0
+        while (n := _zstd_frame_size(buf, i)) is not None:
+            frames.append(buf[i: i + n])
+            size += n
+            i += n
+            if size >= CHUNK_SIZE:
+                yield _unzstd, frames
+                frames, size = [], 0
+        buf = buf[i:]
+    if buf:
+        raise OSError("truncated zstd stream")
+    if frames:
+        yield _unzstd, frames
+
+
+# pipeline
+
+_DECODING_ERRORS: tuple[type[Exception], ...] = (OSError, ValueError, EOFError)
+if zstandard is not None:
+    _DECODING_ERRORS += (zstandard.ZstdError,)
+
+#: sequential decoders used when a unit cannot be decoded (not for gzip)
+_SERIAL: dict[str, Callable[[IO[bytes]], Any]] = {
+    "bz2": lambda f: bz2.BZ2File(f, mode="rb"),
+    "zstd": lambda f: zstandard.ZstdDecompressor().stream_reader(
+        f, read_across_frames=True
+    ),
+}
+
+
+class _Stopped(Exception):
+    pass
+
+
+class DecompressedFile(io.RawIOBase):
+    """
+    Decompressed read only stream, the decompression being done ahead of the
+    reads by a pool of threads (see the module doc). Like `size`, `tell` counts
+    compressed bytes (those decoded into the data read so far), the loaders
+    measuring their progress on the compressed file.
+
+    Args:
+        opener: opens the compressed file (called again on a sequential fallback)
+        compression: a codec of `PARALLEL_CODECS`
+        key: identifies the file content for the gzip index (e.g. url and version)
+        workers: size of the thread pool
+        size: size of the compressed file, 0 if unknown
+    """
+
+    def __init__(
+        self,
+        opener: Callable[[], IO[bytes]],
+        compression: str,
+        key: str | None = None,
+        workers: int = WORKERS,
+        size: int = 0,
+    ) -> None:
+        super().__init__()
+        if compression not in PARALLEL_CODECS:
+            raise ValueError(f"no parallel decompression for '{compression}'")
+        self._opener = opener
+        self._compression = compression
+        self._key = key
+        self._workers = max(1, workers)
+        self._size = size
+        # decoded data and the compressed bytes consumed when it was decoded
+        self._queue: queue.Queue[tuple[bytes, int] | BaseException | None] = queue.Queue(
+            maxsize=2 * self._workers
+        )
+        self._stop = threading.Event()
+        self._chunk = b""
+        self._offset = 0  # in _chunk
+        self._pos = 0  # compressed
+        self._produced = 0
+        self._eof = False
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def size(self) -> int:
+        "compressed size when known, else 0"
+        return self._size
+
+    def _put(self, item: tuple[bytes, int] | BaseException | None) -> None:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise _Stopped()
+
+    def _units(self, f: IO[bytes]) -> Iterator[Unit]:
+        if self._compression == "bz2":
+            return _bz2_units(f)
+        if self._compression == "gzip":
+            return _gzip_units(f, self._key)
+        return _zstd_units(f)
+
+    def _produce(self) -> None:
+        try:
+            with self._opener() as f, ThreadPoolExecutor(self._workers) as pool:
+                pending: deque[tuple[Future[bytes], int]] = deque()
+                try:
+                    for func, arg in self._units(f):
+                        pending.append((pool.submit(func, arg), f.tell()))
+                        while len(pending) > self._workers or (
+                            pending and pending[0][0].done()
+                        ):
+                            self._emit(*self._result(pending.popleft()))
+                    while pending:
+                        self._emit(*self._result(pending.popleft()))
+                except _DECODING_ERRORS:
+                    if self._compression == "gzip":
+                        raise
+                    for fut, _ in pending:
+                        fut.cancel()
+                    self._fallback()
+            self._put(None)
+        except _Stopped:
+            pass
+        except BaseException as exc:
+            try:
+                self._put(exc)
+            except _Stopped:
+                pass
+
+    @staticmethod
+    def _result(unit: tuple[Future[bytes], int]) -> tuple[bytes, int]:
+        return unit[0].result(), unit[1]
+
+    def _emit(self, data: bytes, consumed: int) -> None:
+        if data:
+            self._put((data, consumed))
+            self._produced += len(data)
+
+    def _fallback(self) -> None:
+        "sequential decoding of the rest of the file"
+        with self._opener() as f, _SERIAL[self._compression](f) as dec:
+            skip = self._produced
+            while skip:
+                skip -= len(dec.read(min(skip, CHUNK_SIZE)))
+            while data := dec.read(CHUNK_SIZE):
+                self._emit(data, f.tell())
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readinto(self, buffer: Any) -> int:
+        view = memoryview(buffer).cast("B")
+        while self._offset == len(self._chunk):
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            (self._chunk, self._pos), self._offset = item, 0
+        n = min(len(view), len(self._chunk) - self._offset)
+        view[:n] = self._chunk[self._offset: self._offset + n]
+        self._offset += n
+        return n
+
+    def close(self) -> None:
+        self._stop.set()
+        super().close()
+
+
+def open_decompressed(url: str, compression: str, workers: int = WORKERS) -> DecompressedFile:
+    "decompressed stream of a local or remote file, the remote ones read through the cache"
+    if is_cached(url):
+        info = get_cache().file_info(url)
+        version, size = info["version"], info["size"]
+
+        def _opener() -> IO[bytes]:
+            return io.BufferedReader(CachedFile(url))
+    else:
+        fs, path = fsspec.core.url_to_fs(os.path.expanduser(url))
+        info = fs.info(path)
+        version = f"{info['size']}:{info.get('mtime', info.get('ETag', ''))}"
+        size = info["size"]
+
+        def _opener() -> IO[bytes]:
+            return fs.open(path, mode="rb")  # type: ignore
+    return DecompressedFile(
+        _opener, compression, key=f"{url}:{version}", workers=workers, size=size
+    )
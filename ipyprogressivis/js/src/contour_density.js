@@ -153,6 +153,59 @@ function draw(svgId) {
   };
 }
 
+function drawGrid(svgId) {
+  // density grid mode: contours are traced from the kernel computed grid
+  return function (grid, points, info) {
+    if (grid === null || !info.shape) return;
+    $(svgId).empty();
+    const [gridHeight, gridWidth] = info.shape;
+    const [x0, x1, y0, y1] = info.extent;
+    const svg = d3.select(svgId);
+    const margin = 15;
+    const width = svg.attr("width") - 2 * margin;
+    const height = svg.attr("height") - 2 * margin;
+    const sx = width / gridWidth;
+    const sy = height / gridHeight;
+    const density = Array.from(grid.data[grid.columns[0]].data);
+    const contours = d3
+      .contours()
+      .size([gridWidth, gridHeight])
+      .thresholds(info.levels)(density);
+    const project = d3.geoTransform({
+      point: function (x, y) {
+        this.stream.point(x * sx, y * sy);
+      },
+    });
+    const root = svg.append("g").attr("transform", translate(margin, margin));
+    const color = d3
+      .scaleSequential(d3.interpolateViridis)
+      .domain(d3.extent(contours, (d) => d.value));
+    root
+      .append("g")
+      .selectAll("path")
+      .data(contours)
+      .enter()
+      .append("path")
+      .attr("d", d3.geoPath(project))
+      .attr("fill", (d) => color(d.value));
+    if (points === null) return;
+    const x = d3.scaleLinear().domain([x0, x1]).range([0, width]);
+    const y = d3.scaleLinear().domain([y0, y1]).range([0, height]);
+    const px = points.data.x;
+    const py = points.data.y;
+    root
+      .append("g")
+      .selectAll("circle")
+      .data(d3.range(px.shape[0]))
+      .enter()
+      .append("circle")
+      .attr("cx", (d) => x(px.get(d)))
+      .attr("cy", (d) => y(py.get(d)))
+      .attr("r", 1.5)
+      .style("fill", "#aaa");
+  };
+}
+
 function serializeImgURL(imgURL, mgr) {
   if (mgr.idEnd === undefined) {
     return imgURL;
@@ -176,12 +229,17 @@ export class ContourDensityModel extends widgets.DOMWidgetModel {
       _model_module_version: "0.1.0",
       _view_module_version: "0.1.0",
       _df: ndarray([]),
+      _grid: ndarray([]),
+      _points: ndarray([]),
+      _grid_info: {},
       _img_url: "",
     };
   }
   static serializers = {
     ...widgets.DOMWidgetModel.serializers,
     _df: table_serialization,
+    _grid: table_serialization,
+    _points: table_serialization,
     _img_url: { serialize: serializeImgURL },
   };
 }
@@ -207,9 +265,21 @@ export class ContourDensityView extends widgets.DOMWidgetView {
     let that = this;
     elementReady(`#${this.id}`).then(() => {
       that.draw_ = draw(`#${that.id}`);
+      that.drawGrid_ = drawGrid(`#${that.id}`);
     });
     this.data_changed();
     this.model.on("change:_df", this.data_changed, this);
+    this.model.on("change:_grid_info", this.grid_changed, this);
+  }
+  grid_changed() {
+    const that = this;
+    elementReady(`#${this.id}`).then(() => {
+      that.drawGrid_(
+        that.model.get("_grid"),
+        that.model.get("_points"),
+        that.model.get("_grid_info"),
+      );
+    });
   }
   data_changed() {
     const that = this;
@@ -49,6 +49,7 @@ export class ScatterplotModel extends widgets.DOMWidgetModel {
       move_point: "{0}",
       modal: false,
       to_hide: [],
+      _codecs: [],
     };
   }
 
@@ -93,6 +94,10 @@ export class ScatterplotView extends widgets.DOMWidgetView {
     // Observe changes in the value traitlet in Python, and define
     // a custom callback.
     this.model.on("change:data", this.data_changed, this);
+    // decoders provided by jupyter-tablewidgets
+    this.model.set("_codecs", ["zlib", "lz4"]);
+    this.model.save_changes();
+    this.model.send({ event: "rendered" });
   }
   data_changed() {
     const val = this.model.get("data");
@@ -300,11 +305,19 @@ function Scatterplot(ipyView) {
     }
     const dot_color = ["red", "blue", "green", "cyan", "orange"];
     const data_ = rawdata.chart;
+    // only the changed class histograms are sent, the others are kept here
     const histograms = ipyView.model.get("histograms");
-    for (let i in histograms.columns) {
-      let col = histograms.columns[i];
-      //console.log("sum", col, histograms.data[col].data.reduce((partialSum, a) => partialSum + a, 0));
-      data_.buffers[i].binnedPixels = ndarray_unpack(histograms.data[col]);
+    const histCache = ipyView.model.histCache || (ipyView.model.histCache = {});
+    if (histograms && histograms.columns) {
+      for (let col of histograms.columns) {
+        histCache[col] = histograms.data[col];
+      }
+    }
+    for (let i = 0; i < data_.buffers.length; i++) {
+      const hist = histCache[`hist_${i}`];
+      if (hist !== undefined) {
+        data_.buffers[i].binnedPixels = ndarray_unpack(hist);
+      }
     }
     function render(spec, data) {
       const config = new Config(spec);
@@ -6,6 +6,7 @@ from .facade_creator import FacadeCreatorW
 from .heatmap import HeatmapW
 from .group_by import GroupByW
 from .aggregate import AggregateW
+from .group_aggregate import GroupAggregateW
 from .dump_table import DumpPTableW
 from .join import JoinW
 from .multi_series import MultiSeriesW
@@ -15,6 +16,7 @@ from .histogram import HistogramW
 from .iscaler import ScalerW
 from .any_vega import AnyVegaW
 from .range_query_2d import RangeQuery2DW
+from .linked_filters import CrossFilterW
 from .quantiles import QuantilesW
 from .snippet import SnippetW
 from .mc_density_map import MCDensityMapW
@@ -28,6 +30,7 @@ __all__ = [
     "DescStatsW",  # disabled
     "GroupByW",
     "AggregateW",
+    "GroupAggregateW",
     "DumpPTableW",
     "JoinW",
     "MultiSeriesW",  # disabled
@@ -39,6 +42,7 @@ __all__ = [
     "HeatmapW",
     "AnyVegaW",
     "RangeQuery2DW",
+    "CrossFilterW",
     "QuantilesW",
     "MCDensityMapW",
     "MBKMeansW",
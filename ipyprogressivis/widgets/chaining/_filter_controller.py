@@ -0,0 +1,97 @@
+"""
+Interactive filter controller: debounced, cancellable query updates
+"""
+from __future__ import annotations
+
+import time
+import progressivis.core.aio as aio
+from progressivis.core.api import Module
+from typing import Any, Callable, Coroutine
+
+DEBOUNCE_DELAY = 0.15  # seconds
+LATENCY_HISTORY = 20
+
+
+class FilterController:
+    """
+    Links interactive widgets (sliders ...) to an asynchronous query update.
+
+    * observers are registered once per widget, whatever the number of `watch()` calls
+    * changes are debounced: the update runs `delay` seconds after the last change
+    * a new change cancels the pending update and the in-flight one (stale values)
+    * the latency between the last change and the next run of the `result_module`
+      (once the update is applied) is measured and reported through `on_latency`
+
+    Args:
+        apply: coroutine function pushing the widget values into the query
+        delay: debounce delay in seconds
+        on_latency: called with the last latency (in seconds)
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[], Coroutine[Any, Any, None]],
+        delay: float = DEBOUNCE_DELAY,
+        on_latency: Callable[[float], None] | None = None,
+    ) -> None:
+        self.apply = apply
+        self.delay = delay
+        self.on_latency = on_latency
+        self.latencies: list[float] = []
+        self._watched: set[int] = set()
+        self._task: aio.Task[Any] | None = None
+        self._changed_at: float | None = None
+        self._applied = False
+        self._result_modules: set[int] = set()
+
+    def watch(self, *widgets: Any, names: str = "value") -> None:
+        for wg in widgets:
+            if id(wg) in self._watched:
+                continue
+            self._watched.add(id(wg))
+            wg.observe(self._on_change, names)
+
+    def watch_result(self, module: Module) -> None:
+        "measures the latency on the after run of `module`"
+        if id(module) in self._result_modules:
+            return
+        self._result_modules.add(id(module))
+        module.on_after_run(self._on_result)
+
+    @property
+    def pending(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def last_latency(self) -> float | None:
+        return self.latencies[-1] if self.latencies else None
+
+    def _on_change(self, _change: Any) -> None:
+        self.trigger()
+
+    def trigger(self, delay: float | None = None) -> None:
+        "schedules an update, cancelling the pending or running one"
+        if self.pending:
+            assert self._task is not None
+            self._task.cancel()
+        self._changed_at = time.perf_counter()
+        self._applied = False
+        self._task = aio.create_task(
+            self._debounced(self.delay if delay is None else delay)
+        )
+
+    async def _debounced(self, delay: float) -> None:
+        if delay:
+            await aio.sleep(delay)
+        await self.apply()
+        self._applied = True
+
+    async def _on_result(self, m: Module, run_number: int) -> None:
+        if not self._applied or self._changed_at is None:
+            return
+        latency = time.perf_counter() - self._changed_at
+        self._changed_at = None
+        self._applied = False
+        self.latencies = (self.latencies + [latency])[-LATENCY_HISTORY:]
+        if self.on_latency is not None:
+            self.on_latency(latency)
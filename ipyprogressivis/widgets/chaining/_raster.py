@@ -0,0 +1,174 @@
+"""
+Incremental server side rasterization of scatterplots
+"""
+from __future__ import annotations
+
+import io
+import numpy as np
+from PIL import Image
+from progressivis.core.pintset import PIntSet
+from progressivis.table.api import BasePTable
+from typing import Any
+
+RASTER_WIDTH = 512
+RASTER_HEIGHT = 384
+MAX_CATEGORIES = 10
+MARGIN = 0.05  # extent margin added when bounds are (re)computed
+# tableau10, the last one is used for "other" categories
+PALETTE = np.array(
+    [
+        (31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40),
+        (148, 103, 189), (140, 86, 75), (227, 119, 194), (127, 127, 127),
+        (188, 189, 34), (23, 190, 207),
+    ],
+    dtype=np.float64,
+)
+
+
+class IncrementalRaster:
+    """
+    Count grid of (x, y) points, one layer per category, updated only with
+    the rows added to the table since the previous update.
+    The whole grid is rebuilt when rows are deleted or fall out of the current bounds.
+    The rows with a missing (or infinite) coordinate are not drawn.
+    """
+
+    def __init__(
+        self,
+        x_col: str,
+        y_col: str,
+        cat_col: str | None = None,
+        width: int = RASTER_WIDTH,
+        height: int = RASTER_HEIGHT,
+    ) -> None:
+        self.x_col = x_col
+        self.y_col = y_col
+        self.cat_col = cat_col
+        self.width = width
+        self.height = height
+        self.categories: dict[Any, int] = {}
+        self.bounds: tuple[float, float, float, float] | None = None
+        self._reset()
+
+    def _reset(self) -> None:
+        n_layers = MAX_CATEGORIES if self.cat_col else 1
+        self.counts = np.zeros((n_layers, self.height, self.width), dtype=np.int64)
+        self._seen = PIntSet()
+
+    @property
+    def n_points(self) -> int:
+        return len(self._seen)
+
+    def _codes(self, cats: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+        uniques, inverse = np.unique(cats, return_inverse=True)
+        lut = np.empty(len(uniques), dtype=np.int64)
+        for i, u in enumerate(uniques.tolist()):
+            code = self.categories.get(u)
+            if code is None:
+                code = min(len(self.categories), MAX_CATEGORIES - 1)
+                if len(self.categories) < MAX_CATEGORIES - 1:
+                    self.categories[u] = code
+            lut[i] = code
+        return lut[inverse.reshape(-1)]
+
+    def _points(
+        self, table: BasePTable, ids: np.ndarray[Any, Any]
+    ) -> tuple[np.ndarray[Any, Any], np.ndarray[Any, Any], np.ndarray[Any, Any]]:
+        "the finite points of the rows `ids` and these rows"
+        x = np.asarray(table[self.x_col].loc[ids], dtype=np.float64)
+        y = np.asarray(table[self.y_col].loc[ids], dtype=np.float64)
+        ok = np.isfinite(x) & np.isfinite(y)
+        return x[ok], y[ok], ids[ok]
+
+    def _fit_bounds(self, x: np.ndarray[Any, Any], y: np.ndarray[Any, Any]) -> None:
+        x0, x1, y0, y1 = float(x.min()), float(x.max()), float(y.min()), float(y.max())
+        dx = (x1 - x0) * MARGIN or 1.0
+        dy = (y1 - y0) * MARGIN or 1.0
+        self.bounds = (x0 - dx, x1 + dx, y0 - dy, y1 + dy)
+
+    def _bin(self, x: np.ndarray[Any, Any], y: np.ndarray[Any, Any],
+             codes: np.ndarray[Any, Any] | None) -> None:
+        assert self.bounds is not None
+        x0, x1, y0, y1 = self.bounds
+        ix = ((x - x0) * (self.width / (x1 - x0))).astype(np.int64)
+        iy = ((y1 - y) * (self.height / (y1 - y0))).astype(np.int64)  # y axis upward
+        ok = (ix >= 0) & (ix < self.width) & (iy >= 0) & (iy < self.height)
+        layer = codes[ok] if codes is not None else 0
+        flat = (layer * self.height + iy[ok]) * self.width + ix[ok]
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(
+            self.counts.shape
+        )
+
+    def update(self, table: BasePTable) -> bool:
+        """
+        Bins the rows added since the last call, returns True if the grid changed
+        """
+        index = table.index
+        changed = False
+        if self._seen and not (self._seen <= index):  # some rows were deleted
+            self._reset()
+            changed = True
+        new = index - self._seen
+        if not new:
+            return changed
+        x, y, ids = self._points(table, np.asarray(new.to_array(), dtype=np.int64))
+        if len(ids) and (self.bounds is None or not self._inside(x, y)):
+            # the whole table is binned again within the new bounds
+            self._reset()
+            new = index
+            x, y, ids = self._points(table, np.asarray(index.to_array(), dtype=np.int64))
+            self._fit_bounds(x, y)
+        self._seen |= new
+        if not len(ids):
+            return changed
+        codes = (
+            self._codes(np.asarray(table[self.cat_col].loc[ids])) if self.cat_col else None
+        )
+        self._bin(x, y, codes)
+        return True
+
+    def _inside(self, x: np.ndarray[Any, Any], y: np.ndarray[Any, Any]) -> bool:
+        assert self.bounds is not None
+        x0, x1, y0, y1 = self.bounds
+        return bool(x.min() >= x0 and x.max() <= x1 and y.min() >= y0 and y.max() <= y1)
+
+    def _window(self, zoom: tuple[float, float, float, float] | None) -> tuple[slice, slice]:
+        if zoom is None or self.bounds is None:
+            return slice(None), slice(None)
+        x0, x1, y0, y1 = self.bounds
+        zx0, zx1, zy0, zy1 = zoom
+        cx0 = int(np.clip((zx0 - x0) / (x1 - x0) * self.width, 0, self.width - 1))
+        cx1 = int(np.clip(np.ceil((zx1 - x0) / (x1 - x0) * self.width), cx0 + 1, self.width))
+        cy0 = int(np.clip((y1 - zy1) / (y1 - y0) * self.height, 0, self.height - 1))
+        cy1 = int(np.clip(np.ceil((y1 - zy0) / (y1 - y0) * self.height), cy0 + 1, self.height))
+        return slice(cy0, cy1), slice(cx0, cx1)
+
+    def count_in(self, zoom: tuple[float, float, float, float] | None) -> int:
+        "approximate number of points inside a region (cell granularity)"
+        rows, cols = self._window(zoom)
+        return int(self.counts[:, rows, cols].sum())
+
+    def to_png(self, zoom: tuple[float, float, float, float] | None = None) -> bytes:
+        """
+        Renders the grid (or its `zoom` part) as a PNG image: log scaled density,
+        colored by the dominant category of each cell
+        """
+        rows, cols = self._window(zoom)
+        counts = self.counts[:, rows, cols]
+        total = counts.sum(axis=0)
+        alpha = np.log1p(total)
+        if alpha.max() > 0:
+            alpha /= alpha.max()
+        if self.cat_col:
+            rgb = PALETTE[np.argmax(counts, axis=0) % len(PALETTE)]
+        else:
+            rgb = np.broadcast_to(PALETTE[0], total.shape + (3,))
+        rgba = np.empty(total.shape + (4,), dtype=np.uint8)
+        rgba[..., :3] = rgb.astype(np.uint8)
+        rgba[..., 3] = (alpha * 255).astype(np.uint8)
+        img = Image.fromarray(rgba)
+        if img.size != (self.width, self.height):
+            img = img.resize((self.width, self.height), Image.Resampling.NEAREST)
+        buf = io.BytesIO()
+        img.save(buf, format="png")
+        return buf.getvalue()
@@ -13,8 +13,17 @@ from ipyprogressivis.ipywel import (
     select,
     gridbox,
     checkbox,
+    hbox,
+    html,
+    int_text,
     _container_impl
 )
+from .sketches import (
+    DEFAULT_SKETCH_MEMORY,
+    error_bounds,
+    resolve_compute,
+)
+from .schema import aggregate_dtypes
 from typing import Any as AnyType
 
 WidgetType = AnyType
@@ -23,7 +32,7 @@ RECORD = "__RECORD__"
 ALL_FNC_SET = set(Aggregate.registry.keys())
 
 type_op_mismatches: dict[str, set[str]] = dict(
-    string=ALL_FNC_SET-{"set", "nunique", "hide"},
+    string=ALL_FNC_SET-{"set", "nunique", "hide", "approx_nunique", "top_k"},
     _=ALL_FNC_SET-{"count", "hide"}
 )
 
@@ -55,10 +64,34 @@ class AggregateW(VBox):
             gridbox(
                 *self.get_checkboxes()
             ).layout(grid_template_columns=f"200px repeat({len(self.all_functions)}, 70px)").uid("grid"),
+            hbox(
+                int_text("Sketch memory per group (bytes):",
+                         value=DEFAULT_SKETCH_MEMORY,
+                         style={"description_width": "initial"}
+                         ).uid("sketch_memory").observe(self._sketch_memory_cb),
+                html(self.error_bounds_html(DEFAULT_SKETCH_MEMORY)).uid("sketch_errors"),
+            ),
             button("Start",
                    disabled=True
                    ).uid("start_btn").on_click(self._start_btn_cb)
         )
+
+    @staticmethod
+    def error_bounds_html(memory: int) -> str:
+        return "&nbsp;".join(
+            f"<b>{name}</b>: {err}" for (name, err) in error_bounds(memory).items()
+        )
+
+    def _sketch_memory_cb(self, proxy: Proxy, change: AnyType) -> None:
+        proxy.that.sketch_errors.attrs(value=self.error_bounds_html(change["new"]))
+
+    @property
+    def sketch_memory(self) -> int | None:
+        assert self._proxy is not None
+        if "sketch_memory" not in self._proxy._registry:  # older records
+            return None
+        return int(self._proxy.that.sketch_memory.widget.value)
+
     @property
     def hidden_cols(self) -> list[str]:
         if self._proxy is None:
@@ -69,11 +102,23 @@ class AggregateW(VBox):
     @property
     def visible_cols(self) -> list[str]:
         return [col for col in self.all_columns if col not in self.hidden_cols]
+    def consumed_columns(
+        self, compute: AnyType, sketch_memory: int | None = None
+    ) -> list[str]:
+        return [col for (col, _) in compute if col]  # "" is the records count
+
+    def infer_output_dtypes(
+        self, compute: AnyType, sketch_memory: int | None = None
+    ) -> dict[str, str] | None:
+        # the group keys are defined by the parent GroupBy module
+        by = getattr(self.input_module, "by", None)
+        return aggregate_dtypes(by, compute, self.dtypes, from_rows=True)
+
     @modules_producer
-    def init_modules(self, compute: AnyType) -> Aggregate:
+    def init_modules(self, compute: AnyType, sketch_memory: int | None = None) -> Aggregate:
         s = self.input_module.scheduler
         with s:
-            aggr = Aggregate(compute=compute, scheduler=s)
+            aggr = Aggregate(compute=resolve_compute(compute, sketch_memory), scheduler=s)
             aggr.input.table = self.input_module.output[self.input_slot]
             sink = Sink(scheduler=s)
             sink.input.inp = aggr.output.result
@@ -122,7 +167,7 @@ class AggregateW(VBox):
         ]
         assert self._proxy is not None
         self.record = self._proxy.dump()
-        self.output_module = self.init_modules(compute)
+        self.output_module = self.init_modules(compute, self.sketch_memory)
         self.output_slot = "result"
 
     @runner
@@ -133,7 +178,7 @@ class AggregateW(VBox):
             for ((col, fnc), ck) in self.info_cbx_dict().items()
             if fnc != "hide" and ck.widget.value
         ]
-        self.output_module = self.init_modules(compute)
+        self.output_module = self.init_modules(compute, self.sketch_memory)
         self.output_slot = "result"
 
     def _sel_obs_cb(self, proxy: Proxy, change: AnyType) -> None:
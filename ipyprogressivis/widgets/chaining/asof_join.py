@@ -0,0 +1,202 @@
+"""
+As-of (merge) join for time-ordered streams
+"""
+from __future__ import annotations
+
+import numpy as np
+from progressivis.core.module import Module, ReturnRunStep, def_input, def_output
+from progressivis.core.pintset import PIntSet
+from progressivis.core.utils import fix_loc, indices_len
+from progressivis.table.api import PTable, BasePTable
+from typing import Any
+
+ROW_BATCH = 10_000
+
+
+def to_seconds(values: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+    """
+    Converts a timestamp column into comparable int64/float64 values.
+    Datetime columns are stored as YMDhms vectors, they become seconds since epoch.
+    """
+    if len(values.shape) == 1:
+        return values if values.dtype.kind == "f" else values.astype("int64")
+    vec = values.astype("int64")
+    months = (vec[:, 0] - 1970) * 12 + vec[:, 1] - 1
+    days = months.astype("datetime64[M]").astype("datetime64[D]") + (vec[:, 2] - 1)
+    return (
+        days.astype("int64") * 86_400 + vec[:, 3] * 3600 + vec[:, 4] * 60 + vec[:, 5]
+    )
+
+
+def _fields(table: BasePTable, columns: list[str], names: list[str]) -> list[str]:
+    return [f"{n}: {table._column(c).dshape}" for (c, n) in zip(columns, names)]
+
+
+@def_input("primary", PTable, doc="time-ordered table whose rows are looked up")
+@def_input("related", PTable, doc="time-ordered table providing the output rows")
+@def_output("result", PTable)
+class AsofJoin(Module):
+    """
+    Joins each `related` row with the last `primary` row whose timestamp is not
+    after its own and not older than `tolerance` (pandas' `merge_asof` backward
+    direction, inner semantics).
+
+    Both inputs are supposed ordered on their timestamp column, so only a window
+    of primary rows is kept (the rows which can still match an upcoming related row)
+    and related rows are buffered only while the primary stream lags behind them.
+
+    Args:
+        primary_on: timestamp column of the primary table
+        related_on: timestamp column of the related table
+        primary_cols: primary columns added to the output
+        related_cols: related columns kept in the output
+        tolerance: maximum distance (in seconds for datetime columns) between matched
+                   timestamps, None means unbounded
+        suffix: appended to primary column names colliding with related ones
+    """
+
+    def __init__(
+        self,
+        *,
+        primary_on: str,
+        related_on: str,
+        primary_cols: list[str],
+        related_cols: list[str],
+        tolerance: float | None = None,
+        suffix: str = "_primary",
+        **kwds: Any,
+    ) -> None:
+        super().__init__(**kwds)
+        self.primary_on = primary_on
+        self.related_on = related_on
+        self.primary_cols = primary_cols
+        self.related_cols = related_cols
+        self.tolerance = tolerance
+        self._names = [
+            f"{c}{suffix}" if c in related_cols else c for c in primary_cols
+        ]
+        self._p_times = np.empty(0, dtype="int64")
+        self._p_ids = np.empty(0, dtype="int64")
+        self._pending = PIntSet()
+
+    @property
+    def window_size(self) -> int:
+        "Number of primary rows currently kept"
+        return len(self._p_ids)
+
+    @property
+    def pending_size(self) -> int:
+        "Number of related rows waiting for the primary stream"
+        return len(self._pending)
+
+    def _add_primary(self, table: BasePTable, created: PIntSet) -> None:
+        ids = np.asarray(created.to_array(), dtype="int64")
+        times = to_seconds(np.asarray(table[self.primary_on].loc[ids]))
+        self._p_times = np.concatenate([self._p_times, times])
+        self._p_ids = np.concatenate([self._p_ids, ids])
+        if len(times) and np.any(np.diff(self._p_times[-len(times) - 1:]) < 0):
+            # slightly unordered chunks are tolerated at the cost of a sort
+            order = np.argsort(self._p_times, kind="stable")
+            self._p_times = self._p_times[order]
+            self._p_ids = self._p_ids[order]
+
+    def _evict(self, low: Any) -> None:
+        """
+        Drops primary rows which cannot match any related row from `low` onwards
+        """
+        # the last row not after `low` is the oldest one still matchable
+        keep_from = np.searchsorted(self._p_times, low, side="right") - 1
+        if keep_from > 0:
+            self._p_times = self._p_times[keep_from:]
+            self._p_ids = self._p_ids[keep_from:]
+
+    def _match(
+        self, related: BasePTable, primary: BasePTable, flush: bool
+    ) -> tuple[int, bool]:
+        """
+        Matches a batch of the pending rows, returns the number of matched rows
+        and whether the pending rows past the batch are matchable too
+        """
+        pending = np.asarray(self._pending.to_array(), dtype="int64")
+        ids = pending[:ROW_BATCH]
+        more = len(pending) > ROW_BATCH
+        if not len(ids):
+            return 0, False
+        if not len(self._p_ids):
+            if flush:  # nothing to match with, inner semantics
+                self._pending = PIntSet()
+            return 0, False
+        times = to_seconds(np.asarray(related[self.related_on].loc[ids]))
+        if not flush:
+            # a later primary row could still be closer to rows past the watermark
+            ready = times < self._p_times[-1]
+            ids, times = ids[ready], times[ready]
+            # the related rows being ordered, the next batch is not ready either
+            more &= bool(ready.all())
+            if not len(ids):
+                return 0, False
+        self._pending -= PIntSet(ids)
+        pos = np.searchsorted(self._p_times, times, side="right") - 1
+        matched = pos >= 0
+        if self.tolerance is not None:
+            matched &= times - self._p_times[np.maximum(pos, 0)] <= self.tolerance
+        if np.any(matched):
+            r_ids = ids[matched]
+            p_ids = self._p_ids[pos[matched]]
+            data = {c: related[c].loc[r_ids] for c in self.related_cols}
+            # .loc sorts and deduplicates the ids, a primary row can match many rows
+            uniq, inv = np.unique(p_ids, return_inverse=True)
+            for c, n in zip(self.primary_cols, self._names):
+                data[n] = np.asarray(primary[c].loc[uniq])[inv]
+            assert self.result is not None
+            self.result.append(data)
+        self._evict(times.max())
+        return len(ids), more
+
+    def is_ready(self) -> bool:
+        if self._pending and not self.is_terminated():
+            # the remaining related rows must be flushed once the primary stream ends
+            p_slot = self.get_input_slot("primary")
+            if p_slot is not None and p_slot.output_module.is_terminated():
+                return True
+        return super().is_ready()
+
+    def run_step(
+        self, run_number: int, step_size: int, quantum: float
+    ) -> ReturnRunStep:
+        p_slot = self.get_input_slot("primary")
+        r_slot = self.get_input_slot("related")
+        assert p_slot is not None and r_slot is not None
+        primary = p_slot.data()
+        related = r_slot.data()
+        if primary is None or related is None:
+            return self._return_run_step(self.state_blocked, steps_run=0)
+        if self.result is None:
+            self.result = PTable(
+                self.generate_table_name("asof"),
+                dshape="{" + ",".join(
+                    _fields(related, self.related_cols, self.related_cols)
+                    + _fields(primary, self.primary_cols, self._names)
+                ) + "}",
+                create=True,
+            )
+        steps = 0
+        for slot in (p_slot, r_slot):  # updates and deletions are not supported
+            slot.updated.next()
+            slot.deleted.next()
+        if p_slot.created.any():
+            created = fix_loc(p_slot.created.next(length=step_size, as_slice=False))
+            steps += indices_len(created)
+            self._add_primary(primary, created)
+        if r_slot.created.any():
+            created = fix_loc(r_slot.created.next(length=step_size, as_slice=False))
+            steps += indices_len(created)
+            self._pending |= created
+        flush = p_slot.output_module.is_terminated()
+        matched, more = self._match(related, primary, flush)
+        steps += matched
+        if more or r_slot.has_buffered() or p_slot.has_buffered():
+            return self._return_run_step(self.state_ready, steps)
+        if flush and self._pending:
+            return self._return_run_step(self.state_ready, steps)
+        return self._return_run_step(self.state_blocked, steps)
@@ -0,0 +1,233 @@
+"""
+CSV loader reading the files by blocks in random order (progressive sampling)
+"""
+from __future__ import annotations
+
+import io
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import fsspec  # type: ignore
+from fsspec.utils import read_block, infer_compression  # type: ignore
+from progressivis.core.module import Module, ReturnRunStep, def_input, def_output
+from progressivis.core.utils import force_valid_id_columns
+from progressivis.table.api import PTable
+from progressivis.table.dshape import dshape_from_dataframe
+from progressivis.utils.inspect import filter_kwds
+from ipyprogressivis.block_cache import CachedFile, get_cache, is_cached
+from typing import Any, Callable, cast
+
+BLOCK_SIZE = 1 << 20  # bytes
+MAX_OPEN_FILES = 32  # the least recently read files are closed beyond
+
+
+def is_compressed(url: str) -> bool:
+    "compressed files cannot be read at random offsets"
+    return infer_compression(url) is not None
+
+
+def file_size(url: str) -> int | None:
+    "size of `url`, None when unknown (e.g. a HTTP server not telling it)"
+    if is_cached(url):
+        return cast(int | None, get_cache().file_info(url)["size"])
+    fs, path = fsspec.core.url_to_fs(url)
+    return cast(int | None, fs.size(path))
+
+
+def has_random_access(url: str) -> bool:
+    "True if `url` can be read by `RandomBlockCSVLoader`"
+    return not is_compressed(url) and file_size(url) is not None
+
+
+class _Source:
+    """
+    A file, its size and header line. The file is opened when a block is read
+    and closed after its last block (or earlier by the loader, see MAX_OPEN_FILES)
+    """
+
+    def __init__(self, url: str, has_header: bool) -> None:
+        self.url = url
+        size = file_size(url)
+        if size is None:
+            raise ValueError(f"unknown size of '{url}', it cannot be read by blocks")
+        self.size = size
+        self.has_header = has_header
+        self.header = b""
+        self.file: Any = None
+        self.remaining = 0  # blocks not read yet
+
+    def open(self) -> None:
+        if self.file is not None:
+            return
+        if is_cached(self.url):
+            self.file = CachedFile(self.url)
+        else:
+            fs, path = fsspec.core.url_to_fs(self.url)
+            self.file = fs.open(path, mode="rb")
+        if self.has_header and not self.header:
+            self.header = read_block(self.file, 0, 1, delimiter=b"\n")
+
+    def block(self, offset: int, length: int) -> bytes:
+        """
+        The lines starting in [offset, offset+length), resynchronized on the line
+        boundaries, prefixed with the header line
+        """
+        self.open()
+        data = read_block(self.file, offset, length, delimiter=b"\n")
+        if offset == 0:  # the header is already there
+            return data
+        return self.header + data
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+@def_input("filenames", PTable, doc="the urls, in a 'filename' column")
+@def_output("result", PTable)
+class RandomBlockCSVLoader(Module):
+    """
+    Reads uncompressed CSV files as block-aligned byte ranges taken in random
+    order (over all the files), every block being resynchronized on the line
+    boundaries. The rows arriving first are then a uniform sample (by blocks)
+    of the whole data, the files being still entirely covered in the end.
+
+    Every block is parsed with :func:`pandas.read_csv` and the header line of
+    its file, so the parameters are the same as for `SimpleCSVLoader`. Quoted
+    fields containing newlines are not supported.
+
+    Args:
+        block_size: size of the byte ranges
+        seed: seed of the random order
+        filter_: function applied to every parsed block
+        throttle: maximum number of rows per step
+        force_valid_ids: force renaming of columns to valid identifiers
+        kwds: :func:`pandas.read_csv` parameters and module parameters
+    """
+
+    def __init__(
+        self,
+        block_size: int = BLOCK_SIZE,
+        seed: int | None = None,
+        filter_: Callable[[pd.DataFrame], pd.DataFrame] | None = None,
+        throttle: bool | int | float = False,
+        force_valid_ids: bool = True,
+        **kwds: Any,
+    ) -> None:
+        super().__init__(**kwds)
+        self.default_step_size = 1000
+        csv_kwds = filter_kwds(kwds, pd.read_csv)
+        for key in ("chunksize", "iterator", "compression", "skipfooter"):
+            csv_kwds.pop(key, None)
+        self._nrows: int | None = csv_kwds.pop("nrows", None)
+        csv_kwds["index_col"] = False
+        self.csv_kwds = csv_kwds
+        self.block_size = block_size
+        self.force_valid_ids = force_valid_ids
+        self.throttle = int(throttle) if isinstance(throttle, (int, float)) and throttle else 0
+        self._filter = filter_
+        self._rng = np.random.default_rng(seed)
+        self._sources: list[_Source] = []
+        self._open: OrderedDict[int, None] = OrderedDict()  # open sources, LRU first
+        self._plan: list[tuple[int, int]] = []  # (source, offset) still to be read
+        self._total_size = 0
+        self._bytes_read = 0
+        self._last_progress = (0, 0)
+
+    def is_ready(self) -> bool:
+        if self._plan:
+            return True
+        return super().is_ready()
+
+    def is_data_input(self) -> bool:
+        return True
+
+    def _add_files(self, urls: list[str]) -> None:
+        header = self.csv_kwds.get("header", "infer")
+        # the first line is a header (see pandas.read_csv)
+        has_header = header == 0 or (header == "infer" and self.csv_kwds.get("names") is None)
+        new_blocks: list[tuple[int, int]] = []
+        for url in urls:
+            src = _Source(url, has_header)
+            i = len(self._sources)
+            self._sources.append(src)
+            self._total_size += src.size
+            offsets = range(0, src.size, self.block_size)
+            src.remaining = len(offsets)
+            new_blocks += [(i, off) for off in offsets]
+        # the new blocks are shuffled with the remaining ones
+        self._plan += new_blocks
+        self._plan = [self._plan[k] for k in self._rng.permutation(len(self._plan))]
+
+    def _close(self, source: int) -> None:
+        self._sources[source].close()
+        self._open.pop(source, None)
+
+    def _read(self, source: int, offset: int) -> pd.DataFrame | None:
+        src = self._sources[source]
+        if source not in self._open and len(self._open) >= MAX_OPEN_FILES:
+            self._close(next(iter(self._open)))
+        self._open[source] = None
+        self._open.move_to_end(source)
+        data = src.block(offset, self.block_size)
+        src.remaining -= 1
+        if not src.remaining:
+            self._close(source)
+        self._bytes_read += len(data) - (len(src.header) if offset else 0)
+        if not data.strip() or data == src.header:
+            return None
+        df = pd.read_csv(io.BytesIO(data), **self.csv_kwds)
+        if self._filter is not None:
+            df = self._filter(df)
+        return df if len(df) else None
+
+    def get_progress(self) -> tuple[int, int]:
+        if self.result is None or not self._bytes_read:
+            return self._last_progress
+        length = len(self.result)
+        self._last_progress = length, int(length * self._total_size / self._bytes_read)
+        return self._last_progress
+
+    def run_step(
+        self, run_number: int, step_size: int, quantum: float
+    ) -> ReturnRunStep:
+        if self.throttle:
+            step_size = min(self.throttle, step_size)
+        fn_slot = self.get_input_slot("filenames")
+        if fn_slot.created.any():
+            indices = fn_slot.created.next(as_slice=False)
+            df_files = fn_slot.data()
+            self._add_files([df_files.at[i, "filename"] for i in indices])
+        if not self._plan:  # waiting for new files
+            return self._return_run_step(self.state_blocked, steps_run=0)
+        frames: list[pd.DataFrame] = []
+        rows = 0
+        while self._plan and rows < step_size:  # at least one block per step
+            df = self._read(*self._plan.pop())
+            if df is not None:
+                frames.append(df)
+                rows += len(df)
+        if not frames:
+            return self._return_run_step(self.state_ready, steps_run=0)
+        df = pd.concat(frames, ignore_index=True)
+        if self.force_valid_ids:
+            force_valid_id_columns(df)
+        if self._nrows:
+            limit = self._nrows - (0 if self.result is None else len(self.result))
+            if len(df) >= limit:
+                df = df[:limit]
+                self._plan = []
+        if self.result is None:
+            self.result = PTable(
+                self.generate_table_name("table"),
+                dshape=dshape_from_dataframe(df),
+                data=df,
+                create=True,
+            )
+        else:
+            self.result.append(df)
+        if not self._plan:
+            for source in list(self._open):
+                self._close(source)
+        return self._return_run_step(self.state_ready, steps_run=len(df))
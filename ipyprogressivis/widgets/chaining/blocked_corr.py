@@ -0,0 +1,258 @@
+"""
+Blocked (tiled) incremental covariance/correlation matrix, updated in parallel
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations_with_replacement
+import numpy as np
+from progressivis.core.module import Module, ReturnRunStep, def_input, def_output
+from progressivis.core.utils import fix_loc, indices_len
+from progressivis.table.api import PTable, BasePTable
+from progressivis.utils.psdict import PDict
+from typing import Any, Literal, Sequence, cast
+
+TILE_SIZE = 32
+CATCHUP_FACTOR = 4  # a stale tile reads at most CATCHUP_FACTOR * step_size rows per run
+
+
+class _Tile:
+    """
+    Co-moments of the columns `rows` x `cols` (two column tiles), with their own
+    row count and means so that every tile can be updated independently
+    """
+
+    def __init__(self, rows: slice, cols: slice) -> None:
+        self.rows = rows
+        self.cols = cols
+        n_rows, n_cols = rows.stop - rows.start, cols.stop - cols.start
+        self.pos = 0  # number of rows (in arrival order) already accounted for
+        self.n = 0
+        self.mean_r = np.zeros(n_rows)
+        self.mean_c = np.zeros(n_cols)
+        self.m2_r = np.zeros(n_rows)
+        self.m2_c = np.zeros(n_cols)
+        self.comoment = np.zeros((n_rows, n_cols))
+
+    def update(self, block: np.ndarray[Any, Any]) -> None:
+        "block: (n_rows, n_columns) values of all the tracked columns"
+        x, y = block[:, self.rows], block[:, self.cols]
+        n_b = len(block)
+        mean_x, mean_y = x.mean(axis=0), y.mean(axis=0)
+        xc, yc = x - mean_x, y - mean_y
+        n = self.n + n_b
+        ratio = n_b / n
+        dx, dy = mean_x - self.mean_r, mean_y - self.mean_c
+        # one BLAS product per tile and per chunk
+        self.comoment += xc.T @ yc + np.outer(dx, dy) * (self.n * ratio)
+        self.m2_r += np.einsum("ij,ij->j", xc, xc) + dx * dx * (self.n * ratio)
+        self.m2_c += np.einsum("ij,ij->j", yc, yc) + dy * dy * (self.n * ratio)
+        self.mean_r += dx * ratio
+        self.mean_c += dy * ratio
+        self.n = n
+
+    def cov(self, ddof: int) -> np.ndarray[Any, Any]:
+        if self.n <= ddof:
+            return np.zeros_like(self.comoment)
+        return self.comoment / (self.n - ddof)
+
+    def corr(self) -> np.ndarray[Any, Any]:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            res = self.comoment / np.sqrt(np.outer(self.m2_r, self.m2_c))
+        return np.nan_to_num(res, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+@def_input("table", PTable)
+@def_output("result", PDict, doc="{(col_x, col_y): value} like the `Corr` module")
+class BlockedCorr(Module):
+    """
+    Computes the covariance (or Pearson correlation) matrix of many columns.
+
+    The column set is split into tiles of `tile_size` columns and every pair of
+    tiles keeps its own co-moments, updated with one matrix product per chunk.
+    The tiles are updated concurrently on a thread pool (NumPy releases the GIL
+    during the products).
+
+    When some tiles are declared visible (`set_visible()`), only these tiles are
+    updated with the new chunks, the other ones are left stale and catch up
+    (a bounded number of rows per run) once visible again.
+
+    The result has the same layout as the `Corr` one, so it can be displayed the
+    same way.
+
+    Args:
+        columns: the (numerical) columns
+        mode: "Pearson" or "CovarianceOnly"
+        tile_size: number of columns in a tile
+        max_workers: size of the thread pool (the CPU count by default)
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        mode: Literal["Pearson", "CovarianceOnly"] = "Pearson",
+        tile_size: int = TILE_SIZE,
+        max_workers: int | None = None,
+        **kwds: Any,
+    ) -> None:
+        assert mode in ("Pearson", "CovarianceOnly")
+        super().__init__(**kwds)
+        self._columns = list(columns)
+        self._is_corr = mode == "Pearson"
+        self.ddof = 1
+        self.tile_size = tile_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.default_step_size = 10000
+        self._pool: ThreadPoolExecutor | None = None
+        bounds = [
+            slice(start, min(start + tile_size, len(self._columns)))
+            for start in range(0, len(self._columns), tile_size)
+        ]
+        self._tile_bounds = list(combinations_with_replacement(bounds, 2))
+        self._visible: set[int] | None = None  # tile numbers, None means all
+        self.reset()
+
+    @property
+    def columns(self) -> list[str]:
+        return self._columns
+
+    @property
+    def n_tiles(self) -> int:
+        "number of column tiles (the matrix is made of n_tiles x n_tiles blocks)"
+        return len(range(0, len(self._columns), self.tile_size))
+
+    def tile_columns(self, i: int) -> list[str]:
+        return self._columns[i * self.tile_size:(i + 1) * self.tile_size]
+
+    def reset(self) -> None:
+        if self.result is not None:
+            self.result.clear()
+        self._tiles = [_Tile(rows, cols) for (rows, cols) in self._tile_bounds]
+        self._ids = np.zeros(0, dtype="int64")
+        self._n_ids = 0
+
+    def set_visible(self, tiles: Sequence[tuple[int, int]] | None) -> None:
+        """
+        Restricts the updates to the (row tile, column tile) blocks displayed,
+        None makes all the tiles visible
+        """
+        if tiles is None:
+            self._visible = None
+            return
+        size = self.tile_size
+        wanted = {(min(i, j) * size, max(i, j) * size) for (i, j) in tiles}
+        self._visible = {
+            k for (k, t) in enumerate(self._tiles)
+            if (t.rows.start, t.cols.start) in wanted
+        }
+
+    def is_ready(self) -> bool:
+        if self._stale_tiles():
+            return True
+        return super().is_ready()
+
+    def _active_tiles(self) -> list[_Tile]:
+        if self._visible is None:
+            return self._tiles
+        return [self._tiles[k] for k in sorted(self._visible)]
+
+    def _stale_tiles(self) -> list[_Tile]:
+        return [t for t in self._active_tiles() if t.pos < self._n_ids]
+
+    def _append_ids(self, ids: np.ndarray[Any, Any]) -> None:
+        size = self._n_ids + len(ids)
+        if size > len(self._ids):
+            grown = np.zeros(max(size, 2 * len(self._ids)), dtype="int64")
+            grown[: self._n_ids] = self._ids[: self._n_ids]
+            self._ids = grown
+        self._ids[self._n_ids:size] = ids
+        self._n_ids = size
+
+    def _block(
+        self, table: BasePTable, ids: np.ndarray[Any, Any], tiles: list[_Tile]
+    ) -> np.ndarray[Any, Any]:
+        "(n_rows, n_columns) float64 block, only the columns of `tiles` are read"
+        needed: set[int] = set()
+        for tile in tiles:
+            needed.update(range(tile.rows.start, tile.rows.stop))
+            needed.update(range(tile.cols.start, tile.cols.stop))
+        block = np.zeros((len(ids), len(self._columns)), dtype="float64")
+        for i in sorted(needed):
+            block[:, i] = table[self._columns[i]].loc[ids]
+        return block
+
+    def _update_tiles(self, table: BasePTable, max_rows: int) -> tuple[int, list[_Tile]]:
+        """
+        Brings the stale active tiles up to date, the tiles sharing the same
+        position read the same block. Returns the steps and the updated tiles
+        """
+        by_pos: dict[int, list[_Tile]] = {}
+        for tile in self._stale_tiles():
+            by_pos.setdefault(tile.pos, []).append(tile)
+        steps = 0
+        updated: list[_Tile] = []
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        for pos, tiles in by_pos.items():
+            stop = min(self._n_ids, pos + max_rows)
+            block = self._block(table, self._ids[pos:stop], tiles)
+            for fut in [self._pool.submit(t.update, block) for t in tiles]:
+                fut.result()
+            for tile in tiles:
+                tile.pos = stop
+            updated += tiles
+            steps += stop - pos
+        return steps, updated
+
+    def _publish(self, tiles: list[_Tile]) -> None:
+        "only the values of the updated `tiles` are rewritten"
+        res: dict[tuple[str, str], float] = {}
+        cols = self._columns
+        for tile in tiles:
+            if not tile.n:
+                continue
+            values = tile.corr() if self._is_corr else tile.cov(self.ddof)
+            rows = cols[tile.rows]
+            for i, ci in enumerate(rows):
+                for j, cj in enumerate(cols[tile.cols]):
+                    if tile.rows == tile.cols and j < i:
+                        continue
+                    res[(ci, cj)] = float(values[i, j])
+            if tile.rows == tile.cols and self._is_corr:
+                for ci in rows:
+                    res[(ci, ci)] = 1.0
+        # the tuple keys of the `Corr` layout, PDict is typed for str keys only
+        values = cast(dict[str, Any], res)
+        if self.result is None:
+            self.result = PDict(values)
+        else:
+            self.result.update(values)
+
+    def run_step(
+        self, run_number: int, step_size: int, quantum: float
+    ) -> ReturnRunStep:
+        slot = self.get_input_slot("table")
+        assert slot is not None
+        table = slot.data()
+        if table is None:
+            return self._return_run_step(self.state_blocked, steps_run=0)
+        if slot.deleted.any() or slot.updated.any():
+            slot.reset()
+            slot.update(run_number)
+            self.reset()
+        if slot.created.any():
+            ids = fix_loc(slot.created.next(length=step_size, as_slice=False))
+            if indices_len(ids):
+                self._append_ids(np.asarray(ids.to_array(), dtype="int64"))
+        steps, updated = self._update_tiles(table, CATCHUP_FACTOR * step_size)
+        self._publish(updated)
+        if slot.has_buffered() or self._stale_tiles():
+            return self._return_run_step(self.state_ready, steps)
+        return self._return_run_step(self.state_blocked, steps)
+
+    async def ending(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        await super().ending()
@@ -0,0 +1,193 @@
+"""
+Loaders reading the remote files through the local block cache
+(see `ipyprogressivis.block_cache`)
+"""
+from __future__ import annotations
+
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from fsspec.compression import compr  # type: ignore
+from progressivis.io.api import SimpleCSVLoader, ParquetLoader
+from ipyprogressivis.block_cache import CachedFile, get_cache, is_cached, open_url
+from ipyprogressivis.decompress import (
+    PARALLEL_CODECS,
+    DecompressedFile,
+    open_decompressed,
+    resolve_compression,
+)
+from typing import Any, Callable, Iterable
+
+
+class CachedCSVLoader(SimpleCSVLoader):
+    """
+    `SimpleCSVLoader` reading the remote files through the block cache, the
+    compressed files being decompressed by a separate pipeline stage
+    """
+
+    def open(self, filepath: Any) -> io.IOBase:
+        if not isinstance(filepath, str) or filepath.startswith("buffer://"):
+            return super().open(filepath)
+        compression = resolve_compression(filepath, self._compression)
+        stream: Any
+        if compression in PARALLEL_CODECS:
+            stream = open_decompressed(filepath, compression)  # type: ignore
+        elif not is_cached(filepath):
+            return super().open(filepath)
+        elif compression:
+            stream = open_url(filepath, compression=compression)
+        else:  # exposes the size
+            stream = CachedFile(filepath)
+        res = super().open(stream)
+        self._last_opened = filepath  # reopened the same way on recovery
+        return res
+
+    def refresh_total_size(self) -> None:
+        "the remote sizes are known by the cache (offline too)"
+        if self._file_mode:
+            return
+        df = self.get_input_slot("filenames").data()
+        if df is None or len(df) == self._n_files:
+            return
+        self._n_files = len(df)
+        total_size = 0
+        for fname in df["filename"].loc[:]:
+            if is_cached(fname):
+                total_size += get_cache().file_info(fname)["size"]
+            elif not fname.startswith("buffer://"):
+                total_size += os.stat(fname).st_size
+        self._total_size = total_size
+
+
+class CachedParquetLoader(ParquetLoader):
+    "`ParquetLoader` reading the remote files through the block cache"
+
+    def open(self, filepath: Any) -> io.IOBase:
+        if not is_cached(filepath):
+            return super().open(filepath)
+        res = super().open(CachedFile(filepath))
+        self._last_opened = filepath
+        return res
+
+
+@dataclass
+class FetchStats:
+    url: str
+    latency: float  # seconds, from the request to the last byte
+    nbytes: int
+
+
+def read_file(url: str) -> bytes:
+    """
+    Whole content of a local or remote file, the remote files being read
+    through the block cache (the fsspec filesystems, hence their connection
+    pools, are shared by all the reads)
+    """
+    with open_url(url, "rb") as f:
+        return f.read()  # type: ignore
+
+
+class _Buffer(io.BytesIO):
+    "in memory file exposing its size like the cached files"
+
+    def size(self) -> int:
+        return len(self.getbuffer())
+
+
+class Prefetcher:
+    """
+    Reads in background threads the next `in_flight` files of a plan, the
+    files being handed over entirely buffered, in the planned order
+    """
+
+    def __init__(
+        self, in_flight: int, fetch: Callable[[str], bytes] = read_file
+    ) -> None:
+        self.in_flight = max(1, in_flight)
+        self._fetch = fetch
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.in_flight, thread_name_prefix="prefetch"
+        )
+        self._planned: deque[str] = deque()
+        self._running: deque[tuple[str, Future[tuple[bytes, FetchStats]]]] = deque()
+        self.n_planned = 0
+        self.stats: list[FetchStats] = []  # handed over files, in order
+
+    def plan(self, urls: Iterable[str]) -> None:
+        "appends `urls` to the plan"
+        for url in urls:
+            self._planned.append(url)
+            self.n_planned += 1
+        self._fill()
+
+    def _timed_fetch(self, url: str) -> tuple[bytes, FetchStats]:
+        start = time.perf_counter()
+        data = self._fetch(url)
+        return data, FetchStats(url, time.perf_counter() - start, len(data))
+
+    def _fill(self) -> None:
+        while self._planned and len(self._running) < self.in_flight:
+            url = self._planned.popleft()
+            self._running.append((url, self._pool.submit(self._timed_fetch, url)))
+
+    def get(self, url: str) -> bytes:
+        "content of `url`, awaited if it is the next planned file, else read now"
+        if self._running and self._running[0][0] == url:
+            _, fut = self._running.popleft()
+            self._fill()
+            data, stats = fut.result()
+        else:  # out of the plan, e.g. reopened on recovery
+            data, stats = self._timed_fetch(url)
+        self.stats.append(stats)
+        return data
+
+    def close(self) -> None:
+        for _, fut in self._running:
+            fut.cancel()
+        self._running.clear()
+        self._planned.clear()
+        self._pool.shutdown(wait=False)
+
+
+class PrefetchingCSVLoader(CachedCSVLoader):
+    """
+    `CachedCSVLoader` for many small files: the next `prefetch` files of the
+    `filenames` table are read concurrently while the current one is parsed,
+    so the open latency of each file is hidden. Every file is entirely
+    buffered in memory before being parsed.
+    """
+
+    def __init__(self, prefetch: int = 8, **kwds: Any) -> None:
+        super().__init__(**kwds)
+        self.prefetcher = Prefetcher(prefetch)
+
+    def _plan_files(self) -> None:
+        "the new rows of the `filenames` table are appended to the plan"
+        if self._file_mode or not self.has_input_slot("filenames"):
+            return
+        df = self.get_input_slot("filenames").data()
+        if df is None or len(df) <= self.prefetcher.n_planned:
+            return
+        self.prefetcher.plan(list(df["filename"].loc[:])[self.prefetcher.n_planned:])
+
+    def open(self, filepath: Any) -> io.IOBase:
+        if not isinstance(filepath, str) or filepath.startswith("buffer://"):
+            return super().open(filepath)
+        self._plan_files()
+        data = self.prefetcher.get(filepath)
+        stream: Any = _Buffer(data)
+        compression = resolve_compression(filepath, self._compression)
+        if compression in PARALLEL_CODECS:
+            stream = DecompressedFile(lambda: _Buffer(data), compression, size=len(data))
+        elif compression:  # sequential decompression of the prefetched bytes
+            stream = compr[compression](stream, mode="rb")
+        res = super().open(stream)
+        self._last_opened = filepath
+        return res
+
+    async def ending(self) -> None:
+        self.prefetcher.close()
+        await super().ending()
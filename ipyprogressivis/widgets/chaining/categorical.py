@@ -0,0 +1,189 @@
+"""
+Categorical columns counted and grouped at bounded costs: the dictionary
+encoded columns (see `storage.Dictionary`) on their integer codes, the labels
+being looked up only for display, and the high cardinality columns by their
+top k values only
+"""
+from __future__ import annotations
+
+import logging
+import numpy as np
+import pandas as pd
+from progressivis.core.api import Module
+from progressivis.core.decorators import process_slot, run_if_any
+from progressivis.core.module import ReturnRunStep, def_input, def_output
+from progressivis.core.pintset import PIntSet
+from progressivis.core.utils import fix_loc, indices_len
+from progressivis.table.api import PTable
+from progressivis.table.group_by import GroupBy
+from progressivis.utils.api import PDict
+from .fused_stats import discard
+from .sketches import ApproxTopK, bounded_aggregates, topk_memory
+from .storage import Dictionary
+from typing import Any, cast
+
+logger = logging.getLogger(__name__)
+
+OTHER_LABEL = "(other)"  # the bar of the values out of the top k
+
+
+@def_input("table", PTable, doc="the input table")
+@def_output("result", PDict, doc="occurrence counters by label")
+class CodesHistogram(Module):
+    """
+    Bar chart of a dictionary encoded column, computed like
+    `Histogram1DCategorical` but counting the codes with :func:`numpy.bincount`
+    instead of hashing the strings of every row
+
+    Args:
+        column: the encoded column
+        dictionary: the labels of its codes
+        kwds: extra keyword args to be passed to the ``Module`` superclass
+    """
+
+    def __init__(self, column: str, dictionary: Dictionary, **kwds: Any) -> None:
+        super().__init__(dataframe_slot="table", **kwds)
+        self.column = column
+        self.dictionary = dictionary
+        self.default_step_size = 10000
+        self.counts = np.zeros(0, dtype="int64")  # by code
+        self.result = PDict()
+
+    def reset(self) -> None:
+        self.counts = np.zeros(0, dtype="int64")
+        if self.result:
+            self.result.clear()
+
+    @process_slot("table", reset_cb="reset")
+    @run_if_any
+    def run_step(
+        self, run_number: int, step_size: int, quantum: float
+    ) -> ReturnRunStep:
+        assert self.context is not None
+        with self.context as ctx:
+            dfslot = ctx.table
+            if not dfslot.created.any():
+                logger.info("Input buffers empty")
+                return self._return_run_step(self.state_blocked, steps_run=0)
+            indices = dfslot.created.next(step_size)
+            steps = indices_len(indices)
+            codes = dfslot.data()[self.column].loc[fix_loc(indices)]
+            codes = codes[codes >= 0]  # -1: missing value
+            step_counts = np.bincount(codes, minlength=len(self.counts))
+            if len(step_counts) > len(self.counts):
+                self.counts = np.pad(self.counts, (0, len(step_counts) - len(self.counts)))
+            self.counts += step_counts
+            # the labels of the codes seen by the step, nothing else is decoded
+            labels = self.dictionary.labels
+            assert self.result is not None
+            for code in np.flatnonzero(step_counts):
+                self.result[labels[code]] = int(self.counts[code])
+            return self._return_run_step(self.next_state(dfslot), steps_run=steps)
+
+
+@def_input("table", PTable, doc="the input table")
+@def_output("result", PDict, doc="estimated counters of the top k labels and of the others")
+class TopKHistogram(Module):
+    """
+    Bar chart of the `k` most frequent values of a categorical column, the
+    other values being counted together under `OTHER_LABEL` (i.e. `k + 1` bars).
+    The counters are kept by a heavy hitters sketch (see `sketches.ApproxTopK`),
+    so the memory and the result stay bounded whatever the number of distinct
+    values. The `k` values are the ones with the largest estimates, the values
+    whose counts differ by less than the sketch error may be swapped.
+
+    Args:
+        column: the categorical column
+        k: the number of values counted apart, `OTHER_LABEL` excluded
+        dictionary: the labels of the codes if the column is dictionary encoded
+        kwds: extra keyword args to be passed to the ``Module`` superclass
+    """
+
+    def __init__(
+        self, column: str, k: int, dictionary: Dictionary | None = None, **kwds: Any
+    ) -> None:
+        super().__init__(dataframe_slot="table", **kwds)
+        self.column = column
+        self.k = k
+        self.dictionary = dictionary
+        self.default_step_size = 10000
+        self.topk = cast(ApproxTopK, bounded_aggregates(topk_memory(k))["top_k"]())
+        self.total = 0  # counted values
+        self.result = PDict()
+
+    def reset(self) -> None:
+        self.topk.reset()
+        self.total = 0
+        if self.result:
+            discard(self.result, list(self.result))
+
+    def _counts(self, values: Any) -> pd.Series[Any]:
+        "the counts of the (non missing) values by label"
+        if self.dictionary is None:
+            return pd.Series(values).value_counts(sort=False)
+        counts = np.bincount(values[values >= 0])
+        codes = np.flatnonzero(counts)
+        return pd.Series(counts[codes], index=self.dictionary.decode(codes))
+
+    @process_slot("table", reset_cb="reset")
+    @run_if_any
+    def run_step(
+        self, run_number: int, step_size: int, quantum: float
+    ) -> ReturnRunStep:
+        assert self.context is not None
+        with self.context as ctx:
+            dfslot = ctx.table
+            if not dfslot.created.any():
+                logger.info("Input buffers empty")
+                return self._return_run_step(self.state_blocked, steps_run=0)
+            indices = dfslot.created.next(step_size)
+            steps = indices_len(indices)
+            counts = self._counts(dfslot.data()[self.column].loc[fix_loc(indices)])
+            self.topk.update_counts(counts)
+            self.total += int(counts.sum())
+            top = dict(self.topk.items(self.k))
+            # the estimates being upper bounds, the others count is a lower bound
+            if (other := self.total - sum(top.values())) > 0:
+                top[OTHER_LABEL] = other
+            assert self.result is not None
+            discard(self.result, set(self.result) - set(top))
+            self.result.update(top)
+            return self._return_run_step(self.next_state(dfslot), steps_run=steps)
+
+
+class CodesGroupBy(GroupBy):
+    """
+    `GroupBy` grouping the rows of a step at once when the keys are integer
+    columns, e.g. dictionary codes: the keys are sorted by numpy and every
+    group index is updated once per step instead of once per row. The other
+    keys are grouped row by row like `GroupBy` does.
+    """
+
+    def process_created(self, by: Any, indices: PIntSet) -> None:
+        assert self._input_table is not None
+        if isinstance(by, str):
+            columns = [by]
+        elif isinstance(by, (list, tuple)):
+            columns = list(by)
+        else:
+            columns = []
+        if not columns or not all(
+            np.issubdtype(self._input_table[col].dtype, np.integer) for col in columns
+        ):
+            return super().process_created(by, indices)  # type: ignore
+        if not indices:
+            return
+        rows = np.asarray(indices.to_array())
+        if isinstance(by, str):
+            keys = self._input_table[by].loc[indices]
+            uniques, inverse = np.unique(keys, return_inverse=True)
+            group_keys: list[Any] = uniques.tolist()
+        else:
+            keys = np.stack([self._input_table[col].loc[indices] for col in columns], axis=1)
+            uniques, inverse = np.unique(keys, axis=0, return_inverse=True)
+            group_keys = [tuple(key) for key in uniques.tolist()]
+        inverse = inverse.ravel()
+        bounds = np.cumsum(np.bincount(inverse, minlength=len(uniques)))[:-1]
+        groups = np.split(rows[np.argsort(inverse, kind="stable")], bounds)
+        for key, group in zip(group_keys, groups):
+            self._index[key] |= PIntSet(group)
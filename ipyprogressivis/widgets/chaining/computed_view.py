@@ -8,11 +8,14 @@ from .utils import (
     restore_on_replay
 )
 import numpy as np
+import calendar
 from itertools import chain, batched
 from inspect import signature
 from progressivis.table.repeater import Repeater, Computed
 from progressivis.core.api import Sink
+from progressivis.core.pintset import PIntSet
 from progressivis.table.compute import (
+    MultiColFunc,
     week_day,
     # UNCHANGED,
     # make_if_else,
@@ -48,10 +51,12 @@ from ipyprogressivis.ipywel import (
     _container_impl
 )
 
-from typing import Any as AnyType, Callable
+from .schema import computed_dtypes
+from typing import Any as AnyType, Callable, Hashable, Sequence
 
 WidgetType = AnyType
 N_BOXES = 30
+FUSED_BLOCK_SIZE = 16_384  # rows per block, keeps a block of every base column in cache
 
 # NB: `np.sctypes` was removed in the NumPy 2.0 release. Access dtypes explicitly instead.
 np_sctypes = [[np.int8, np.int16, np.int32, np.int64],
@@ -83,6 +88,178 @@ ALL_FUNCS.update(
      }
 )
 
+class _DateParts:
+    """
+    Lazily computed decomposition of a block of YMDhms vectors,
+    shared by all the fused expressions based on the same column
+    """
+    def __init__(self, vec: np.ndarray[AnyType, AnyType]) -> None:
+        self.vec = vec
+        self._days: np.ndarray[AnyType, AnyType] | None = None
+
+    @property
+    def days(self) -> np.ndarray[AnyType, AnyType]:
+        if self._days is None:
+            vec = self.vec.astype("int64")
+            months = (vec[:, 0] - 1970) * 12 + vec[:, 1] - 1
+            self._days = (
+                months.astype("datetime64[M]").astype("datetime64[D]")
+                + (vec[:, 2] - 1)
+            )
+        return self._days
+
+    @property
+    def week_day_int(self) -> np.ndarray[AnyType, AnyType]:
+        # 1970-01-01 was a thursday, i.e. weekday() == 3
+        return (self.days.astype("int64") + 3) % 7
+
+    @property
+    def year_day_int(self) -> np.ndarray[AnyType, AnyType]:
+        first = (self.vec[:, 0].astype("int64") - 1970).astype("datetime64[Y]")
+        return (self.days - first.astype("datetime64[D]")).astype("int64") + 1
+
+
+_DAY_NAMES = np.array(list(calendar.day_name), dtype=object)
+
+FUSED_DATE_FUNCS: dict[Callable[..., AnyType], Callable[[_DateParts], AnyType]] = {
+    year: lambda dp: dp.vec[:, 0],
+    month: lambda dp: dp.vec[:, 1],
+    day: lambda dp: dp.vec[:, 2],
+    hour: lambda dp: dp.vec[:, 3],
+    year_day_int: lambda dp: dp.year_day_int,
+    week_day: lambda dp: _DAY_NAMES[dp.week_day_int],
+    is_weekend: lambda dp: dp.week_day_int >= 5,
+    ymd_string: lambda dp: np.array(
+        [f"{y}-{m}-{d}" for (y, m, d) in dp.vec[:, :3].tolist()], dtype=object
+    ),
+}
+
+FUSED_ARITH_FUNCS: dict[Callable[..., AnyType], Callable[..., AnyType]] = {
+    # same parameter names as the scalar versions, col_var_map refers to them
+    add_: lambda x, y: np.add(x, y),
+    mul_: lambda x, y: np.multiply(x, y),
+    true_div: lambda num, den: np.true_divide(num, den),
+    floor_div: lambda num, den: np.floor_divide(num, den),
+    div_percent: lambda num, den=1: np.floor_divide(np.multiply(num, 100), den),
+}
+
+
+def _index_key(index: AnyType) -> Hashable:
+    if isinstance(index, slice):
+        return ("slice", index.start, index.stop, index.step)
+    if isinstance(index, (int, np.integer)):
+        return ("int", int(index))
+    if isinstance(index, PIntSet):
+        index = index.to_array()
+    arr = np.asarray(index)
+    return ("array", arr.shape, hash(arr.tobytes()))
+
+
+class FusedEvaluator:
+    """
+    Evaluates a group of computed columns sharing base columns in a single
+    pass over cache-sized blocks. Datetime decompositions are computed once
+    per block and per column, then shared by all the expressions using them.
+    The results for the last index are kept, so reading the other columns
+    of the group on the same index costs no further computation.
+    """
+    def __init__(self, base: list[str],
+                 block_size: int = FUSED_BLOCK_SIZE) -> None:
+        self.base = base
+        self.block_size = block_size
+        self.exprs: dict[str, tuple[Callable[..., AnyType], list[str],
+                                    dict[str, str], np.dtype[AnyType]]] = {}
+        self._key: Hashable = None
+        self._inputs: dict[str, AnyType] = {}
+        self._results: dict[str, np.ndarray[AnyType, AnyType]] = {}
+
+    def add(self, name: str, func: Callable[..., AnyType], cols: list[str],
+            col_var_map: dict[str, str], dtype: np.dtype[AnyType]) -> None:
+        self.exprs[name] = (func, cols, col_var_map, dtype)
+
+    def column_func(self, name: str) -> Callable[[AnyType, dict[str, AnyType]], AnyType]:
+        def _func(index: AnyType, local_dict: dict[str, AnyType]) -> AnyType:
+            res = self.evaluate(index, local_dict)[name]
+            if isinstance(index, (int, np.integer)):
+                return res[0]
+            return res
+        return _func
+
+    def _is_cached(self, key: Hashable, local_dict: dict[str, AnyType]) -> bool:
+        if key != self._key:
+            return False
+        # the index is the same, make sure the data did not change meanwhile
+        return all(np.array_equal(self._inputs[k], local_dict[k]) for k in self.base)
+
+    def evaluate(self, index: AnyType,
+                 local_dict: dict[str, AnyType]) -> dict[str, np.ndarray[AnyType, AnyType]]:
+        key = _index_key(index)
+        if self._is_cached(key, local_dict):
+            return self._results
+        inputs = {k: np.asarray(v) for (k, v) in local_dict.items() if k in self.base}
+        length = len(next(iter(inputs.values()))) if inputs else 0
+        results = {
+            name: np.empty(length, dtype=dt) for (name, (_, _, _, dt)) in self.exprs.items()
+        }
+        for start in range(0, length, self.block_size):
+            sl = slice(start, start + self.block_size)
+            block = {k: v[sl] for (k, v) in inputs.items()}
+            dates: dict[str, _DateParts] = {}
+            for name, (func, cols, col_var_map, _) in self.exprs.items():
+                results[name][sl] = self._eval_block(func, cols, col_var_map, block, dates)
+        self._key = key
+        self._inputs = inputs
+        self._results = results
+        return results
+
+    @staticmethod
+    def _eval_block(func: Callable[..., AnyType], cols: list[str],
+                    col_var_map: dict[str, str], block: dict[str, AnyType],
+                    dates: dict[str, _DateParts]) -> AnyType:
+        if len(cols) == 1:
+            col = cols[0]
+            values = block[col]
+            if func in FUSED_DATE_FUNCS and len(values.shape) == 2:
+                if col not in dates:
+                    dates[col] = _DateParts(values)
+                return FUSED_DATE_FUNCS[func](dates[col])
+            if isinstance(func, (np.ufunc, np.vectorize)):
+                return func(values)
+            return np.apply_along_axis(func, len(values.shape) - 1, values)
+        kwargs = {var: block[col] for (var, col) in col_var_map.items()}
+        return FUSED_ARITH_FUNCS.get(func, func)(**kwargs)
+
+
+def _fused_groups(comp_list: Sequence[dict[str, AnyType]]) -> list[list[dict[str, AnyType]]]:
+    """
+    Partitions the computations into groups of connected base columns
+    """
+    groups: list[tuple[set[str], list[dict[str, AnyType]]]] = []
+    for d_ in comp_list:
+        cols = set(d_["cols"])
+        merged = [g for g in groups if g[0] & cols]
+        for g in merged:
+            groups.remove(g)
+            cols |= g[0]
+        groups.append((cols, [e for g in merged for e in g[1]] + [d_]))
+    return [g[1] for g in groups]
+
+
+def add_fused_columns(comp: Computed, comp_list: Sequence[dict[str, AnyType]]) -> None:
+    for group in _fused_groups(comp_list):
+        base = list(dict.fromkeys(chain.from_iterable(d_["cols"] for d_ in group)))
+        evaluator = FusedEvaluator(base)
+        for d_ in group:
+            evaluator.add(d_["wg_name"], ALL_FUNCS[d_["fname"]], d_["cols"],
+                          d_["map"], np.dtype(d_["wg_dtype"]))
+        for d_ in group:
+            comp.computed[d_["wg_name"]] = MultiColFunc(
+                func=evaluator.column_func(d_["wg_name"]),
+                base=base,
+                dtype=np.dtype(d_["wg_dtype"])
+            )
+
+
 def _s(tpl: tuple[str, ...] | list[str]) -> str:
     assert isinstance(tpl, (tuple, list))
     return ",".join(tpl)
@@ -195,6 +372,8 @@ class ComputedViewW(VBox):
                 ).uid("stored_cols"),
                 checkbox("Select all").uid("keep_all").observe(self._keep_all_cb)
             ),
+            checkbox("Fused evaluation (single pass over shared columns)",
+                     value=False, indent=False).uid("fused"),
             button("Apply").uid("apply_btn").on_click(self._apply_btn_cb)
 
         )
@@ -298,29 +477,48 @@ class ComputedViewW(VBox):
                        )
         return res
 
+    def _is_fused(self) -> bool:
+        assert self._proxy is not None
+        if "fused" not in self._proxy._registry:  # recorded before fused mode existed
+            return False
+        return bool(self._proxy.that.fused.widget.value)
+
     @starter_callback
     def _apply_btn_cb(self, proxy: Proxy, btn: AnyType) -> None:
         assert self._proxy is not None
         comp_list = self._make_computed_list()
         cols = list(self._proxy.that.stored_cols.widget.value)
+        fused = self._is_fused()
         self.record = self._proxy.dump()
-        self.output_module = self.init_modules(comp_list, columns=cols)
+        self.output_module = self.init_modules(comp_list, columns=cols, fused=fused)
 
     @runner
     def run(self) -> None:
         assert self._proxy is not None
         comp_list = self._make_computed_list()
         cols = list(self._proxy.that.stored_cols.widget.value)
-        self.output_module = self.init_modules(comp_list, columns=cols)
+        fused = self._is_fused()
+        self.output_module = self.init_modules(comp_list, columns=cols, fused=fused)
         self.output_slot = "result"
 
+    def consumed_columns(self, comp_list: list[dict[str, list[str]]],
+                         columns: list[str], fused: bool = False) -> list[str]:
+        return list(columns) + [col for d_ in comp_list for col in d_["cols"]]
+
+    def infer_output_dtypes(self, comp_list: list[dict[str, list[str]]],
+                            columns: list[str], fused: bool = False) -> dict[str, str]:
+        return computed_dtypes(columns, comp_list, self.dtypes)
+
     @modules_producer
     def init_modules(self, comp_list: list[dict[str, list[str]]],
-                    columns: list[str]) -> Repeater:
+                    columns: list[str], fused: bool = False) -> Repeater:
         comp = Computed()
         from .custom import CUSTOMER_FNC
         ALL_FUNCS.update(UFUNCS)
         ALL_FUNCS.update(CUSTOMER_FNC)
+        if fused:
+            add_fused_columns(comp, comp_list)
+            comp_list = []
         for d_ in comp_list:
             func = ALL_FUNCS[d_["fname"]]  # type: ignore
             cols = d_["cols"]
@@ -18,23 +18,58 @@ from progressivis.core.api import Sink, Module, asynchronize
 from .._corr_schema import corr_spec_no_data
 from ..vega import VegaWidget
 from .desc_stats import corr_as_vega_dataset
+from .blocked_corr import BlockedCorr
 from ipyprogressivis.ipywel import (
     Proxy,
     button,
     anybox,
     radiobuttons,
     box,
+    checkbox,
     select_multiple,
 )
 from typing import Any as AnyType
 
 WidgetType = AnyType
 
+
+def tile_as_vega_dataset(
+    mod: BlockedCorr, rows: list[str], cols: list[str]
+) -> list[dict[str, AnyType]]:
+    """
+    rows x cols window of the matrix, the values not computed yet are skipped
+    """
+    res = mod.result or {}
+    dataset: list[dict[str, AnyType]] = []
+    for kx in rows:
+        for ky in cols:
+            val = res.get((kx, ky), res.get((ky, kx)))
+            if val is None:
+                continue
+            dataset.append(dict(corr=val, corr_label=f"{val:.2f}", var=kx, var2=ky))
+    return dataset
+
+
+def _tile_options(mod: BlockedCorr) -> list[tuple[str, int]]:
+    return [
+        (f"{cols[0]} .. {cols[-1]}", i)
+        for i in range(mod.n_tiles)
+        if (cols := mod.tile_columns(i))
+    ]
+
+
 class AfterRun(Coro):
     async def action(self, m: Module, run_number: int) -> None:
-        assert isinstance(m, Corr)
-        cols = m.columns
-        dataset = sanitize(corr_as_vega_dataset(m, cols))
+        if isinstance(m, BlockedCorr):
+            assert self.leaf is not None
+            i, j = self.leaf._tile
+            dataset = sanitize(
+                tile_as_vega_dataset(m, m.tile_columns(i), m.tile_columns(j))
+            )
+        else:
+            assert isinstance(m, Corr)
+            cols = m.columns
+            dataset = sanitize(corr_as_vega_dataset(m, cols))
         def _func():
             assert self.leaf is not None
             assert hasattr(self.leaf, "_proxy")
@@ -76,11 +111,14 @@ class CorrelationW(VBox):
                          value="Pearson",
                          style={"description_width": "initial"},
                          ).uid("mode"),
+            checkbox("Blocked (parallel tiles, only the displayed tile is refreshed)",
+                     value=False, indent=False).uid("blocked"),
             button("Start",
                    disabled=True
                    )
             .uid("start_btn")
             .on_click(self._start_btn_cb),
+            box().uid("tiles_box"),
             box().uid("vega_box")
         )
 
@@ -89,7 +127,8 @@ class CorrelationW(VBox):
     def run(self) -> AnyType:
         content = dict(
             selection=self._proxy.that.selection.widget.value,
-            mode=self._proxy.that.mode.widget.value
+            mode=self._proxy.that.mode.widget.value,
+            blocked=self._proxy.that.blocked.widget.value,
             )
         self.init_modules(content)
 
@@ -98,9 +137,14 @@ class CorrelationW(VBox):
         s = self.input_module.scheduler
         mode = content["mode"]
         selection = content["selection"]
+        blocked = content.get("blocked", False)
         with s:
-            corr = Corr(mode=mode, scheduler=s)
-            corr.input.table = self.input_module.output.result[tuple(selection)]
+            if blocked:
+                corr = BlockedCorr(columns=list(selection), mode=mode, scheduler=s)
+                corr.input.table = self.input_module.output.result
+            else:
+                corr = Corr(mode=mode, scheduler=s)
+                corr.input.table = self.input_module.output.result[tuple(selection)]
             sink = Sink(scheduler=s)
             sink.input.inp = corr.output.result
             self.output_module = corr
@@ -112,6 +156,32 @@ class CorrelationW(VBox):
         assert hasattr(vegabox, "children")
         if not vegabox.children:
             vegabox.children = [VegaWidget(spec=corr_spec_no_data)]
+        if blocked:
+            self._init_tiles(corr)
+
+    def _init_tiles(self, corr: BlockedCorr) -> None:
+        self._tile = (0, 0)
+        corr.set_visible([self._tile])
+        options = _tile_options(corr)
+        row_wg = ipw.Dropdown(description="Rows:", options=options, value=0)
+        col_wg = ipw.Dropdown(description="Columns:", options=options, value=0)
+
+        def _tile_cb(change: AnyType) -> None:
+            self._tile = (row_wg.value, col_wg.value)
+            corr.set_visible([self._tile])
+            vega_box = self._proxy.that.vega_box.widget
+            vega_box.children[0].update(
+                "data", remove="true",
+                insert=sanitize(tile_as_vega_dataset(
+                    corr, corr.tile_columns(self._tile[0]),
+                    corr.tile_columns(self._tile[1])
+                ))
+            )
+
+        row_wg.observe(_tile_cb, "value")
+        col_wg.observe(_tile_cb, "value")
+        tiles_box = self._proxy.that.tiles_box.widget
+        tiles_box.children = [ipw.HBox([row_wg, col_wg])]
 
     def _selection_cb(self, proxy: Proxy, change: AnyType) -> None:
         self._proxy.that.start_btn.attrs(disabled = len(change["new"]) < 2)
@@ -120,7 +190,8 @@ class CorrelationW(VBox):
     def _start_btn_cb(self, proxy: Proxy, btn: ipw.Button) -> None:
         content = dict(
             selection=self._proxy.that.selection.widget.value,
-            mode=self._proxy.that.mode.widget.value
+            mode=self._proxy.that.mode.widget.value,
+            blocked=self._proxy.that.blocked.widget.value,
             )
         self.record = self._proxy.dump()
         self.init_modules(content)
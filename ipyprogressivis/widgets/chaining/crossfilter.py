@@ -0,0 +1,301 @@
+"""
+Crossfilter: range filters on several dimensions sharing one selection
+"""
+from __future__ import annotations
+
+import numpy as np
+from progressivis.core.module import Module, ReturnRunStep, def_input, def_output
+from progressivis.core.pintset import PIntSet
+from progressivis.core.utils import fix_loc, indices_len
+from progressivis.table.api import PTable, BasePTable, PTableSelectedView
+from typing import Any
+
+NBINS = 64
+SPAN_MARGIN = 0.25  # extra span added when the bins have to be recomputed
+
+
+def _grow(arr: np.ndarray[Any, Any], size: int, fill: Any = 0) -> np.ndarray[Any, Any]:
+    if len(arr) >= size:
+        return arr
+    res = np.full(max(size, 2 * len(arr)), fill, dtype=arr.dtype)
+    res[: len(arr)] = arr
+    return res
+
+
+class _Dimension:
+    """
+    Values of one column indexed by row id, the sorted (value, id) index,
+    the current range and the histogram bins of each row
+    """
+
+    def __init__(self, column: str, nbins: int) -> None:
+        self.column = column
+        self.nbins = nbins
+        self.values = np.zeros(0, dtype="float64")
+        self.bins = np.zeros(0, dtype="int32")
+        self.sorted_values = np.zeros(0, dtype="float64")
+        self.sorted_ids = np.zeros(0, dtype="int64")
+        self._tail: list[np.ndarray[Any, Any]] = []  # ids not yet in the sorted index
+        self.lower = -np.inf
+        self.upper = np.inf
+        self.bounds: tuple[float, float] | None = None
+
+    def add(self, ids: np.ndarray[Any, Any], values: np.ndarray[Any, Any]) -> bool:
+        """
+        Stores the values of new rows, returns True when the bins had to be
+        recomputed (new values out of the current bounds)
+        """
+        self.values = _grow(self.values, int(ids.max()) + 1, np.nan)
+        self.bins = _grow(self.bins, int(ids.max()) + 1)
+        self.values[ids] = values
+        self._tail.append(ids)
+        lo, hi = np.nanmin(values), np.nanmax(values)
+        if self.bounds is None or lo < self.bounds[0] or hi > self.bounds[1]:
+            b0, b1 = (lo, hi) if self.bounds is None else (
+                min(lo, self.bounds[0]), max(hi, self.bounds[1])
+            )
+            span = (b1 - b0) or 1.0
+            self.bounds = (b0 - span * SPAN_MARGIN, b1 + span * SPAN_MARGIN)
+            return True
+        self.bins[ids] = self.bin_of(values)
+        return False
+
+    def bin_of(self, values: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+        assert self.bounds is not None
+        b0, b1 = self.bounds
+        res = ((values - b0) * (self.nbins / (b1 - b0))).astype("int32")
+        return np.clip(res, 0, self.nbins - 1)
+
+    def rebin(self, ids: np.ndarray[Any, Any]) -> None:
+        self.bins[ids] = self.bin_of(self.values[ids])
+
+    def passes(self, ids: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+        vals = self.values[ids]
+        return (vals >= self.lower) & (vals <= self.upper)
+
+    def remove(self, ids: np.ndarray[Any, Any]) -> None:
+        self._merge_tail()
+        keep = ~np.isin(self.sorted_ids, ids)
+        self.sorted_ids = self.sorted_ids[keep]
+        self.sorted_values = self.sorted_values[keep]
+
+    def _merge_tail(self) -> None:
+        if not self._tail:
+            return
+        ids = np.concatenate(self._tail)
+        self._tail = []
+        vals = self.values[ids]
+        order = np.argsort(vals, kind="stable")
+        ids, vals = ids[order], vals[order]
+        pos = np.searchsorted(self.sorted_values, vals, side="right")
+        self.sorted_values = np.insert(self.sorted_values, pos, vals)
+        self.sorted_ids = np.insert(self.sorted_ids, pos, ids)
+
+    def _ids_in(self, lower: float, upper: float) -> np.ndarray[Any, Any]:
+        start = np.searchsorted(self.sorted_values, lower, side="left")
+        stop = np.searchsorted(self.sorted_values, upper, side="right")
+        return self.sorted_ids[start:stop]
+
+    def set_range(self, lower: float, upper: float) -> tuple[
+        np.ndarray[Any, Any], np.ndarray[Any, Any]
+    ]:
+        """
+        Changes the range, returns the ids entering and leaving it. Only the
+        parts of the sorted index between the old and the new bounds are read.
+        """
+        self._merge_tail()
+        old_lo, old_up = self.lower, self.upper
+        self.lower, self.upper = lower, upper
+        entering: list[np.ndarray[Any, Any]] = []
+        leaving: list[np.ndarray[Any, Any]] = []
+        if lower > old_up or upper < old_lo:  # disjoint ranges
+            return self._ids_in(lower, upper), self._ids_in(old_lo, old_up)
+        if lower < old_lo:
+            entering.append(self._ids_in(lower, np.nextafter(old_lo, -np.inf)))
+        elif lower > old_lo:
+            leaving.append(self._ids_in(old_lo, np.nextafter(lower, -np.inf)))
+        if upper > old_up:
+            entering.append(self._ids_in(np.nextafter(old_up, np.inf), upper))
+        elif upper < old_up:
+            leaving.append(self._ids_in(np.nextafter(upper, np.inf), old_up))
+        empty = np.zeros(0, dtype="int64")
+        return (np.concatenate(entering) if entering else empty,
+                np.concatenate(leaving) if leaving else empty)
+
+
+@def_input("table", PTable)
+@def_output("result", PTableSelectedView)
+class CrossFilter(Module):
+    """
+    Range filters over several numerical columns combined with a logical AND.
+
+    Each dimension keeps its values in a sorted index, so changing one range only
+    visits the rows between the old and the new bounds. For every row the number
+    of dimensions rejecting it is maintained: the shared selection (the `result`
+    view, no row is copied) holds the rows rejected by no dimension.
+
+    Every dimension also maintains the histogram of the rows selected by all the
+    *other* dimensions (the usual crossfilter semantics for linked views) and the
+    histogram of all its rows, available through `histograms()`.
+
+    Args:
+        columns: the filtered dimensions
+        nbins: number of bins of the histograms
+    """
+
+    def __init__(self, columns: list[str], nbins: int = NBINS, **kwds: Any) -> None:
+        super().__init__(**kwds)
+        self.columns = list(columns)
+        self.nbins = nbins
+        self.dims = {col: _Dimension(col, nbins) for col in self.columns}
+        self._fails = np.zeros(0, dtype="int8")
+        self._rejected = {col: np.zeros(0, dtype=bool) for col in self.columns}
+        self._selection = PIntSet()
+        self._all = PIntSet()
+        self._raw = {col: np.zeros(nbins, dtype="int64") for col in self.columns}
+        self._others = {col: np.zeros(nbins, dtype="int64") for col in self.columns}
+        self._pending_ranges: dict[str, tuple[float, float]] = {}
+
+    @property
+    def selection(self) -> PIntSet:
+        return self._selection
+
+    def set_range(self, column: str, lower: float | None, upper: float | None) -> None:
+        """
+        Requests a new range for a dimension (None meaning unbounded),
+        applied at the next run of the module
+        """
+        self._pending_ranges[column] = (
+            -np.inf if lower is None else float(lower),
+            np.inf if upper is None else float(upper),
+        )
+
+    def get_range(self, column: str) -> tuple[float, float]:
+        if column in self._pending_ranges:
+            return self._pending_ranges[column]
+        dim = self.dims[column]
+        return (dim.lower, dim.upper)
+
+    def histograms(self, column: str) -> tuple[np.ndarray[Any, Any], np.ndarray[Any, Any]]:
+        "returns the histogram of all the rows and the one filtered by the other dimensions"
+        return self._raw[column], self._others[column]
+
+    def bounds(self, column: str) -> tuple[float, float] | None:
+        return self.dims[column].bounds
+
+    def is_ready(self) -> bool:
+        if self._pending_ranges and self.result is not None:
+            return True
+        return super().is_ready()
+
+    def _account(self, ids: np.ndarray[Any, Any], sign: int) -> None:
+        """
+        Adds (sign=1) or removes (sign=-1) the contribution of `ids` rows
+        to the histograms and the selection
+        """
+        if not len(ids):
+            return
+        fails = self._fails[ids]
+        for col, dim in self.dims.items():
+            bins = dim.bins[ids]
+            others = (fails - self._rejected[col][ids]) == 0
+            self._others[col] += sign * np.bincount(bins[others], minlength=self.nbins)
+        selected = ids[fails == 0]
+        if len(selected):
+            if sign > 0:
+                self._selection |= PIntSet(selected)
+            else:
+                self._selection -= PIntSet(selected)
+
+    def _apply_range(self, col: str, lower: float, upper: float) -> None:
+        dim = self.dims[col]
+        entering, leaving = dim.set_range(lower, upper)
+        rejected = self._rejected[col]
+        changed = np.unique(np.concatenate([entering, leaving]))
+        now_rejected = ~np.isin(changed, entering)
+        flipped = rejected[changed] != now_rejected
+        changed, now_rejected = changed[flipped], now_rejected[flipped]
+        if not len(changed):
+            return
+        self._account(changed, -1)
+        self._fails[changed] += np.where(now_rejected, 1, -1).astype("int8")
+        rejected[changed] = now_rejected
+        self._account(changed, 1)
+
+    def _add_rows(self, table: BasePTable, ids: np.ndarray[Any, Any]) -> None:
+        size = int(ids.max()) + 1
+        self._fails = _grow(self._fails, size)
+        fails = np.zeros(len(ids), dtype="int8")
+        rebinned = []
+        for col, dim in self.dims.items():
+            values = np.asarray(table[col].loc[ids], dtype="float64")
+            if dim.add(ids, values):
+                rebinned.append(col)
+            self._rejected[col] = _grow(self._rejected[col], size)
+            rej = ~dim.passes(ids)
+            self._rejected[col][ids] = rej
+            fails += rej
+        self._fails[ids] = fails
+        self._all |= PIntSet(ids)
+        if rebinned:  # the bounds changed, the histograms are recomputed from scratch
+            all_ids = np.asarray(self._all.to_array(), dtype="int64")
+            for col in rebinned:
+                self.dims[col].rebin(all_ids)
+            self._recount(all_ids)
+            self._selection |= PIntSet(ids[fails == 0])
+        else:
+            for col, dim in self.dims.items():
+                self._raw[col] += np.bincount(dim.bins[ids], minlength=self.nbins)
+            self._account(ids, 1)
+
+    def _recount(self, all_ids: np.ndarray[Any, Any]) -> None:
+        fails = self._fails[all_ids]
+        for col, dim in self.dims.items():
+            bins = dim.bins[all_ids]
+            self._raw[col] = np.bincount(bins, minlength=self.nbins)
+            others = (fails - self._rejected[col][all_ids]) == 0
+            self._others[col] = np.bincount(bins[others], minlength=self.nbins)
+
+    def _remove_rows(self, ids: np.ndarray[Any, Any]) -> None:
+        ids = ids[ids < len(self._fails)]
+        if not len(ids):
+            return
+        self._account(ids, -1)
+        for col, dim in self.dims.items():
+            self._raw[col] -= np.bincount(dim.bins[ids], minlength=self.nbins)
+            dim.remove(ids)
+        self._all -= PIntSet(ids)
+
+    def run_step(
+        self, run_number: int, step_size: int, quantum: float
+    ) -> ReturnRunStep:
+        slot = self.get_input_slot("table")
+        assert slot is not None
+        table = slot.data()
+        if table is None:
+            return self._return_run_step(self.state_blocked, steps_run=0)
+        if self.result is None:
+            self.result = PTableSelectedView(table, PIntSet([]))
+        steps = 0
+        if slot.deleted.any():
+            deleted = fix_loc(slot.deleted.next(as_slice=False))
+            steps += indices_len(deleted)
+            self._remove_rows(np.asarray(deleted.to_array(), dtype="int64"))
+        if slot.updated.any():  # updated rows are removed then added again
+            updated = fix_loc(slot.updated.next(as_slice=False))
+            steps += indices_len(updated)
+            ids = np.asarray(updated.to_array(), dtype="int64")
+            self._remove_rows(ids)
+            self._add_rows(table, ids)
+        if slot.created.any():
+            created = fix_loc(slot.created.next(length=step_size, as_slice=False))
+            steps += indices_len(created)
+            self._add_rows(table, np.asarray(created.to_array(), dtype="int64"))
+        pending, self._pending_ranges = self._pending_ranges, {}
+        for col, (lower, upper) in pending.items():
+            self._apply_range(col, lower, upper)
+            steps += 1
+        self.result.selection = self._selection
+        if slot.has_buffered():
+            return self._return_run_step(self.state_ready, steps)
+        return self._return_run_step(self.state_blocked, steps)
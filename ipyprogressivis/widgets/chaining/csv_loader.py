@@ -4,6 +4,10 @@ from progressivis.io.api import SimpleCSVLoader
 from progressivis.core.api import Module, Sink
 from progressivis.table.api import PTable, Constant
 from .custom import register_function
+from .projection import ProjectionMixin
+from .block_csv_loader import RandomBlockCSVLoader, has_random_access
+from .cached_loaders import CachedCSVLoader, PrefetchingCSVLoader
+from .storage import StorageOptimizer, Dictionary, sniffed_storage, storage_schema
 from .utils import (
     starter_callback,
     get_schema,
@@ -14,6 +18,9 @@ from .utils import (
     shuffle_urls,
     modules_producer,
     labcommand,
+    is_checked,
+    get_value,
+    Coro,
 )
 from ipyprogressivis.csv_sniffer.sniffer import sniffer, _sniffer
 from ipyprogressivis.csv_sniffer.backend import CSVSniffer
@@ -97,11 +104,111 @@ def combine_filters(
     return None
 
 
+def make_date_parser(
+    parse_dates: list[str], formats: dict[str, str], dayfirst: bool = False
+) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    """
+    Parses the `parse_dates` columns with their fixed (sniffed) format, the
+    values not matching it being parsed one by one ("mixed" format)
+    """
+
+    def parser_(df: pd.DataFrame) -> pd.DataFrame:
+        for col in parse_dates:
+            values = df[col]
+            if fmt := formats.get(col):
+                res = pd.to_datetime(values, format=fmt, errors="coerce")
+                if (failed := res.isna() & values.notna()).any():
+                    res[failed] = pd.to_datetime(
+                        values[failed], format="mixed", dayfirst=dayfirst, errors="coerce"
+                    )
+            else:
+                res = pd.to_datetime(
+                    values, format="mixed", dayfirst=dayfirst, errors="coerce"
+                )
+            df[col] = res
+        return df
+
+    return parser_
+
+
+def split_date_params(
+    params: dict[str, Any],
+) -> tuple[dict[str, Any], Callable[[pd.DataFrame], pd.DataFrame] | None]:
+    """
+    Removes from the `read_csv` parameters the dates having sniffed formats
+    (see `CSVSniffer`), returning them as a parser to be applied to the chunks
+    """
+    formats = params.get("date_format")
+    parse_dates = params.get("parse_dates")
+    if not isinstance(formats, dict) or not isinstance(parse_dates, list):
+        return params, None
+    params = dict(params)
+    del params["parse_dates"], params["date_format"]
+    dayfirst = params.pop("dayfirst", False)
+    return params, make_date_parser(parse_dates, formats, dayfirst)
+
+
+def project_csv_params(
+    params: dict[str, Any],
+    source_columns: list[str],
+    schema: dict[str, str],
+    loaded: dict[str, str],
+) -> dict[str, Any]:
+    """
+    Restricts the `read_csv` parameters to the `loaded` columns
+
+    Args:
+        params: the sniffed parameters
+        source_columns: the names in the file of the `schema` columns (same order)
+        schema: the (normalized) columns to be loaded without projection
+        loaded: the projected schema
+    """
+    source = dict(zip(schema, source_columns))
+    usecols = [source[col] for col in loaded]
+    params = dict(params, usecols=usecols)
+    for key in ("dtype", "na_values"):
+        if isinstance(params.get(key), dict):
+            params[key] = {k: v for (k, v) in params[key].items() if k in usecols}
+    if isinstance(params.get("parse_dates"), list):
+        params["parse_dates"] = [col for col in params["parse_dates"] if col in usecols]
+    if isinstance(params.get("date_format"), dict):
+        params["date_format"] = {
+            k: v for (k, v) in params["date_format"].items() if k in usecols
+        }
+    return params
+
+
+class PrefetchReport(Coro):
+    "footer report of the files read by a `PrefetchingCSVLoader`"
+
+    async def action(self, m: Module, run_number: int) -> None:
+        assert isinstance(m, PrefetchingCSVLoader)
+        stats = m.prefetcher.stats
+        if not stats:
+            return
+        total = sum(st.nbytes for st in stats)
+        mean = sum(st.latency for st in stats) / len(stats)
+        rows = "".join(
+            f"<tr><td>{os.path.basename(st.url)}</td>"
+            f"<td>{st.latency * 1000:.1f} ms</td><td>{st.nbytes:,}</td></tr>"
+            for st in stats[-5:]
+        )
+        self.bar.c_.message.value = (
+            f"<b>{len(stats)}</b> files, {total:,} bytes,"
+            f" mean latency {mean * 1000:.1f} ms"
+            f" ({m.prefetcher.in_flight} in flight)"
+            f"<table><tr><th>last files</th><th>latency</th><th>bytes</th></tr>"
+            f"{rows}</table>"
+        )
+
+
 layout_refresh = ipw.Layout(width="30px", height="30px")
 _ = register_function
 
 
-class CsvLoaderW(VBox):
+class CsvLoaderW(VBox, ProjectionMixin):
+    dictionaries: dict[str, Dictionary] = {}  # of the dictionary encoded columns
+
     def btn_bar(self) -> Proxy:
         return hbox(
             button("Sniff ...", disabled=True)
@@ -163,6 +270,16 @@ class CsvLoaderW(VBox):
                     .layout(width="60%"),
                     int_text("Max rows to sniff:", value=100).uid("n_lines"),
                     checkbox("Shuffle URLs", value=True).uid("shuffle_ck"),
+                    checkbox("Random block order (progressive sampling)").uid("random_ck"),
+                    checkbox("Load only the columns used downstream (on replay)")
+                    .uid("pushdown_ck"),
+                    checkbox("Optimize storage (floats as float32)")
+                    .uid("optimize_ck"),
+                    checkbox("Dictionary encode strings (int32 codes, understood by"
+                             " DescStats and Group by only, not joinable)")
+                    .uid("encode_ck"),
+                    int_text("Prefetch (files in flight, 0: none):", value=0)
+                    .uid("prefetch"),
                     int_text("Throttle:", value=0).uid("throttle"),
                     stack().uid("sniffer"),  # merged later
                     int_text("Stop after:", value=0).uid("n_rows"),
@@ -320,12 +437,24 @@ class CsvLoaderW(VBox):
         assert sniffer is not None
         sniffed_params = clean_nodefault(sniffer.params)
         schema = get_schema(sniffer)
+        source_columns = sniffed_params.get("usecols") or sniffer.get_names()
+        storage = sniffed_storage(
+            sniffer,
+            schema,
+            downcast=is_checked(self_proxy, "optimize_ck"),
+            encode=is_checked(self_proxy, "encode_ck"),
+        )
         return dict(
             urls=urls,
             throttle=throttle,
             shuffle=shuffle,
             sniffed_params=sniffed_params,
-            schema=schema,
+            schema=storage_schema(schema, storage),
+            source_columns=source_columns,
+            storage=storage,
+            pushdown=is_checked(self_proxy, "pushdown_ck"),
+            random_blocks=is_checked(self_proxy, "random_ck"),
+            prefetch=get_value(self_proxy, "prefetch", 0),
             filter_=filter_,
             filter_code=filter_code,
         )
@@ -343,7 +472,7 @@ class CsvLoaderW(VBox):
         csv_module = self.init_modules(**kw)
         self.output_module = csv_module
         self.output_slot = "result"
-        self.output_dtypes = kw["schema"]
+        self.output_dtypes = self.project(kw["schema"], pushdown=False)
 
     def _save_settings_cb(self, proxy: Proxy, btn: ipw.Button) -> None:
         assert self._proxy is not None
@@ -374,6 +503,18 @@ class CsvLoaderW(VBox):
         filter_ = content["filter_"]
         filter_code = content.get("filter_code", "")
         print("content", content)
+        source_columns = content.get("source_columns", [])
+        # a preprocessor may read any column, older records have no source columns
+        pushdown = (
+            content.get("pushdown", False)
+            and not filter_code
+            and len(source_columns) == len(schema)
+        )
+        loaded = self.project(schema, pushdown=pushdown)
+        if loaded is not schema:
+            sniffed_params = project_csv_params(
+                sniffed_params, source_columns, schema, loaded
+            )
         csv_module = self.init_modules(
             urls=urls,
             throttle=throttle,
@@ -381,10 +522,13 @@ class CsvLoaderW(VBox):
             sniffed_params=sniffed_params,
             filter_=filter_,
             filter_code=filter_code,
+            random_blocks=content.get("random_blocks", False),
+            prefetch=content.get("prefetch", 0),
+            storage=content.get("storage", {}),
         )
         self.output_module = csv_module
         self.output_slot = "result"
-        self.output_dtypes = schema
+        self.output_dtypes = loaded
 
     @modules_producer
     def init_modules(
@@ -395,16 +539,24 @@ class CsvLoaderW(VBox):
         sniffed_params: dict[str, Any] = dict(),
         filter_: dict[str, Any] | None = None,
         filter_code: str = "",
+        random_blocks: bool = False,
+        prefetch: int = 0,
+        storage: dict[str, str] = {},
         **kw: Any,
-    ) -> SimpleCSVLoader:
-        filter_fnc = None
+    ) -> SimpleCSVLoader | RandomBlockCSVLoader:
         filter_fnc2 = None
-        params = sniffed_params
+        # the dates are parsed first, as expected by the preprocessor
+        params, filter_fnc = split_date_params(sniffed_params)
         if filter_code:
             from .custom import CUSTOMER_FNC
 
             filter_fnc2 = CUSTOMER_FNC[filter_code]
-        if filter_impl := combine_filters(filter_fnc, filter_fnc2):
+        filter_impl = combine_filters(filter_fnc, filter_fnc2)
+        if storage:  # applied last, the preprocessor seeing the original values
+            optimizer = StorageOptimizer(storage)
+            self.dictionaries = optimizer.dictionaries
+            filter_impl = combine_filters(filter_impl, optimizer)
+        if filter_impl:
             params["filter_"] = filter_impl
         if shuffle:
             urls = shuffle_urls(urls)
@@ -415,7 +567,16 @@ class CsvLoaderW(VBox):
             filenames = pd.DataFrame({"filename": urls})
             cst = Constant(PTable("filenames", data=filenames), scheduler=s)
             #params["throttle"] = 100
-            csv = SimpleCSVLoader(scheduler=s, **params)
+            csv: SimpleCSVLoader | RandomBlockCSVLoader
+            # compressed files or files of unknown size cannot be sampled by
+            # blocks, they are read sequentially
+            if random_blocks and all(has_random_access(url) for url in urls):
+                csv = RandomBlockCSVLoader(scheduler=s, **params)
+            elif prefetch > 0:
+                csv = PrefetchingCSVLoader(prefetch=prefetch, scheduler=s, **params)
+                self.after_run = PrefetchReport(csv)
+            else:
+                csv = CachedCSVLoader(scheduler=s, **params)
             csv.input.filenames = cst.output[0]
             sink = Sink(scheduler=s)
             sink.input.inp = csv.output.result
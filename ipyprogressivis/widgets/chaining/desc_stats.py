@@ -28,6 +28,9 @@ from .._hist2d_schema import hist2d_spec_no_data
 from .._corr_schema import corr_spec_no_data
 from .._bar_schema import bar_spec_no_data
 from .tab_tools import TreeTab
+from .fused_stats import FusedStats, FUSED_FUNCTIONS
+from .categorical import CodesHistogram, TopKHistogram
+from .storage import Dictionary
 from .utils import make_button, VBox, needs_dtypes
 from ..utils import historized_widget, HistorizedBox
 
@@ -49,6 +52,8 @@ GENERAL_TAB_TITLE = "General"
 SETTINGS_TAB_TITLE = "Settings"
 GENERAL_SET_TAB_TITLE = "General"
 HEATMAPS_SET_TAB_TITLE = "Heatmaps"
+BARPLOTS_SET_TAB_TITLE = "Bar charts"
+MAX_TOPK = 1000
 SIMPLE_RESULTS_TAB_TITLE = "Simple results"
 # https://stackoverflow.com/questions/56949504/how-to-lazify-output-in-tabbed-layout-in-jupyter-notebook
 
@@ -243,7 +248,10 @@ def refresh_info_sketch(
 
 @asynchronized
 def refresh_info_barplot(
-    hout: WidgetType, hmod: Histogram1DCategorical, name: str, tab: "TreeTab"
+    hout: WidgetType,
+    hmod: Histogram1DCategorical | CodesHistogram | TopKHistogram,
+    name: str,
+    tab: "TreeTab",
 ) -> None:
     if not tab.is_visible(name) and hmod.updated_once:  # type: ignore
         return
@@ -312,8 +320,11 @@ def refresh_info_corr(cout: WidgetType, cmod: Corr, name: str, tab: "TreeTab") -
 
 
 type_op_mismatches: dict[str, set[str]] = dict(
-    string=set(["min", "max", "var", "corr", "hist2d"])
+    string=set(["min", "max", "mean", "var", "corr", "hist2d"])
 )
+# the dictionary encoded columns are shown as "category" (their codes are not values)
+type_op_mismatches["category"] = type_op_mismatches["string"]
+CATEGORICAL_TYPES = ("string", "category")
 
 
 def get_flag_status(dt: str, op: str) -> bool:
@@ -360,9 +371,13 @@ class DynViewer(TreeTab):
         dtypes: dict[str, AnyType],
         input_module: Module,
         input_slot: str = "result",
+        dictionaries: dict[str, Dictionary] | None = None,
     ):
         super().__init__(upper=None, known_as="")
         self._dtypes = dtypes
+        self._dictionaries = dictionaries or {}
+        self._topk = 0  # bars of the categorical columns, 0: all the categories
+        self._topk_wg: ipw.BoundedIntText | None = None
         self._input_module = input_module
         self._input_slot = input_slot
         self._modgroup = f"group_{id(self)}"
@@ -376,7 +391,14 @@ class DynViewer(TreeTab):
         self.info_cbx: dict[tuple[str, str], ipw.Checkbox] = {}
         self.h2d_cbx: dict[tuple[str, str], ipw.Checkbox] = {}
         self._hdict: dict[
-            str, tuple[Histogram1DPattern | Histogram1DCategorical, WidgetType]
+            str,
+            tuple[
+                Histogram1DPattern
+                | Histogram1DCategorical
+                | CodesHistogram
+                | TopKHistogram,
+                WidgetType,
+            ],
         ] = {}
         self._h2d_dict: dict[str, tuple[Histogram2DPattern, WidgetType]] = {}
         self._hist_tab: TreeTab | None = None
@@ -385,9 +407,13 @@ class DynViewer(TreeTab):
         self._h2d_sel: set[AnyType] = set()
         self._corr_sel: list[str] = []
         self._registry_mod = self.init_factory(input_module, input_slot)
-        self.all_functions = {
-            dec: _get_func_name(dec) for dec in self._registry_mod.func_dict.keys()
-        }
+        self._fused = self.init_fused(input_module, input_slot)
+        funcs = list(self._registry_mod.func_dict.keys())
+        # fused only statistics (not provided by the factory)
+        for func in FUSED_FUNCTIONS:
+            if func not in funcs:
+                funcs.insert(funcs.index("var"), func)
+        self.all_functions = {dec: _get_func_name(dec) for dec in funcs}
         self.scalar_functions = {
             k: v
             for (k, v) in self.all_functions.items()
@@ -407,12 +433,65 @@ class DynViewer(TreeTab):
         s = input_module.scheduler
         with s:
             factory = StatsFactory(input_module=input_module, scheduler=s)
+            factory.func_dict["hist"] = self._bar_chart_func(
+                factory.func_dict["hist"], input_module, input_slot
+            )
             factory.create_dependent_modules()
             factory.input.table = input_module.output[input_slot]
             sink = Sink(scheduler=s)
             sink.input.inp = factory.output.result
             return factory
 
+    def _bar_chart_func(
+        self,
+        hist_func: Callable[[str, StatsFactory], Module],
+        input_module: Module,
+        input_slot: str,
+    ) -> Callable[[str, StatsFactory], Module]:
+        """
+        the bar charts of the dictionary encoded columns count their codes,
+        in top k mode the categorical columns keep only bounded counters
+        """
+
+        def _add_hist_col(col: str, factory: StatsFactory) -> Module:
+            assert factory.types
+            encoded = col in self._dictionaries
+            if not (encoded or (self._topk and factory.types[col] == "string")):
+                return hist_func(col, factory)
+            s = factory.scheduler
+            with s:
+                m: Module
+                if self._topk:
+                    m = TopKHistogram(
+                        column=col,
+                        k=self._topk,
+                        dictionary=self._dictionaries.get(col),
+                        scheduler=s,
+                    )
+                else:
+                    m = CodesHistogram(
+                        column=col, dictionary=self._dictionaries[col], scheduler=s
+                    )
+                m.input.table = input_module.output[input_slot]
+                sink = factory.sink()
+                sink.input.inp = m.output.result
+                return m
+
+        return _add_hist_col
+
+    def init_fused(self, input_module: Module, input_slot: str) -> FusedStats:
+        """
+        min, max, mean and var of all the columns are computed by one module,
+        in one pass, instead of one factory module per cell
+        """
+        s = input_module.scheduler
+        with s:
+            fused = FusedStats(scheduler=s)
+            fused.input.table = input_module.output[input_slot]
+            sink = Sink(scheduler=s)
+            sink.input.inp = fused.output.result
+            return fused
+
     def get_scheduler(self) -> Scheduler:
         return self._registry_mod.scheduler
 
@@ -439,7 +518,7 @@ class DynViewer(TreeTab):
 
     def draw_h2d_matrix(self, ext_df: pd.DataFrame | None = None) -> ipw.GridBox:
         num_cols = sorted(
-            [col for col in self.visible_cols if self.col_types[col] != "string"]
+            [col for col in self.visible_cols if self.col_types[col] not in CATEGORICAL_TYPES]
         )
         lst: list[WidgetType] = [narrow_label("", 150)] + [
             narrow_label(s) for s in num_cols
@@ -470,19 +549,62 @@ class DynViewer(TreeTab):
         settings_tab = TreeTab(upper=self, known_as=SETTINGS_TAB_TITLE)
         settings_tab.set_tab(GENERAL_SET_TAB_TITLE, gb)
         settings_tab.set_tab(HEATMAPS_SET_TAB_TITLE, h2d_gb)
+        settings_tab.set_tab(BARPLOTS_SET_TAB_TITLE, self.draw_topk_box())
         return settings_tab
 
+    def draw_topk_box(self) -> ipw.VBox:
+        # the value being edited is kept when the settings are redrawn
+        value = self._topk if self._topk_wg is None else self._topk_wg.value
+        self._topk_wg = ipw.BoundedIntText(
+            value=value,
+            min=0,
+            max=MAX_TOPK,
+            description="Top k:",
+        )
+        self._topk_wg.observe(self._topk_obs_cb, "value")
+        return ipw.VBox(
+            [
+                self._topk_wg,
+                ipw.Label(
+                    "the k most frequent categories are shown, the others"
+                    " in one bar (0: all the categories, counted exactly)"
+                ),
+            ]
+        )
+
+    def drop_bar_charts(self) -> None:
+        """
+        Deletes the bar charts of the categorical columns, the factory creating
+        them again with the current top k mode
+        """
+        matrix = self._registry_mod._matrix
+        if matrix is None:
+            return
+        names = []
+        for col in matrix.index:
+            if self.col_types.get(col) not in CATEGORICAL_TYPES:
+                continue
+            if mod := matrix.at[col, "hist"]:
+                names.append(cast(Module, mod).name)
+                matrix.at[col, "hist"] = 0
+        if names:
+            with self.get_scheduler() as dataflow:
+                dataflow.delete_modules(*dataflow.collateral_damage(*names))
+        self._hist_sel = set()  # the histograms tab is rebuilt
+
     def lock_conf(self) -> None:
-        assert self._hidden_sel_wg
+        assert self._hidden_sel_wg and self._topk_wg
         self._hidden_sel_wg.disabled = True
+        self._topk_wg.disabled = True
         for cbx in self.info_cbx.values():
             cbx.disabled = True
         for cbx in self.h2d_cbx.values():
             cbx.disabled = True
 
     def unlock_conf(self) -> None:
-        assert self._hidden_sel_wg
+        assert self._hidden_sel_wg and self._topk_wg
         self._hidden_sel_wg.disabled = False
+        self._topk_wg.disabled = False
         for (key, func), cbx in self.info_cbx.items():
             dtype = self.col_types[key]
             cbx.disabled = get_flag_status(dtype, func)
@@ -504,7 +626,7 @@ class DynViewer(TreeTab):
     def matrix_to_h2d_df(self) -> pd.DataFrame | None:
         if not self.h2d_cbx:
             return None
-        cols = [col for col in self.visible_cols if self.col_types[col] != "string"]
+        cols = [col for col in self.visible_cols if self.col_types[col] not in CATEGORICAL_TYPES]
         len_ = len(cols)
         arr = np.zeros((len_, len_), dtype=bool)
         for i, ci in enumerate(cols):
@@ -522,15 +644,22 @@ class DynViewer(TreeTab):
         return self._btn_bar
 
     def set_histogram_widget(
-        self, name: str, hist_mod: Histogram1DPattern | Histogram1DCategorical
+        self,
+        name: str,
+        hist_mod: Histogram1DPattern
+        | Histogram1DCategorical
+        | CodesHistogram
+        | TopKHistogram,
     ) -> None:
         if name in self._hdict and self._hdict[name][0] is hist_mod:
             return  # self._hdict[name][1], None # None means selection unchanged
         type_ = self.col_types[name]
         hout: ipw.VBox
-        if type_ == "string":
+        if type_ in CATEGORICAL_TYPES:
             hout = _VegaWidget(spec=bar_spec_no_data)
-            bp_mod = cast(Histogram1DCategorical, hist_mod)
+            bp_mod = cast(
+                Histogram1DCategorical | CodesHistogram | TopKHistogram, hist_mod
+            )
             bp_mod.updated_once = False  # type: ignore
             selection = bp_mod.path_to_origin()
             bp_mod.on_after_run(
@@ -609,7 +738,10 @@ class DynViewer(TreeTab):
                 disabled=False,
             )
             self._hidden_sel_wg = selm
-            self.col_types = {k: str(t) for (k, t) in self._dtypes.items()}
+            self.col_types = {
+                k: "category" if k in self._dictionaries else str(t)
+                for (k, t) in self._dtypes.items()
+            }
             self.visible_cols = list(self.col_types.keys())
             selm.observe(self._selm_obs_cb, "value")
             gb = self.draw_matrices()
@@ -649,7 +781,11 @@ class DynViewer(TreeTab):
                     if not self.info_cbx[(col, k)].value:
                         lab.value = ""
                         continue
-                    subm = mod_matrix.loc[col, k]
+                    subm = (
+                        self._fused.loc[col, k]
+                        if k in FUSED_FUNCTIONS
+                        else mod_matrix.loc[col, k]
+                    )
                     if subm is None:
                         lab.value = "..."
                         continue
@@ -679,7 +815,11 @@ class DynViewer(TreeTab):
                     self.set_histogram_widget(
                         attr,
                         cast(
-                            Histogram1DPattern | Histogram1DCategorical, hist_mod
+                            Histogram1DPattern
+                            | Histogram1DCategorical
+                            | CodesHistogram
+                            | TopKHistogram,
+                            hist_mod,
                         ),
                     )
                 self._hist_sel = hist_sel
@@ -778,6 +918,9 @@ class DynViewer(TreeTab):
     def _h2d_cbx_obs_cb(self, change: AnyType) -> None:
         self._btn_apply.disabled = False
 
+    def _topk_obs_cb(self, change: AnyType) -> None:
+        self._btn_apply.disabled = False
+
     def _btn_edit_cb(self, btn: ipw.Button) -> None:
         btn.disabled = True
         self.save_for_cancel = (
@@ -798,6 +941,7 @@ class DynViewer(TreeTab):
         self.visible_cols = vcols[:]
         assert self._hidden_sel_wg
         self._hidden_sel_wg.options = self.hidden_cols
+        self._topk_wg = None  # redrawn with the applied value
         gb = self.draw_matrices(df, h2d_df)
         self.lock_conf()
         self.conf_box.children = (
@@ -817,10 +961,22 @@ class DynViewer(TreeTab):
         async def _coro() -> None:
             self._last_df = self.matrix_to_df()
             self._last_h2d_df = self.matrix_to_h2d_df()
+            assert self._topk_wg is not None
+            if self._topk_wg.value != self._topk:
+                self._topk = self._topk_wg.value
+                self.drop_bar_charts()
             self._selection_event = False
+            matrix = self._last_df
+            if matrix is not None:
+                # the fused statistics are not handled by the factory
+                fused_df = matrix.loc[:, list(FUSED_FUNCTIONS)]
+                self._fused.set_columns(
+                    [col for col in fused_df.index if fused_df.loc[col].any()]
+                )
+                matrix = matrix.drop(columns=fused_df.columns)
             await self._registry_mod.variable.from_input(
                 {
-                    "matrix": self._last_df,
+                    "matrix": matrix,
                     "h2d_matrix": self._last_h2d_df,
                     "hidden_cols": self.hidden_cols[:],
                 }
@@ -868,7 +1024,9 @@ class DescStatsW(VBox):
     @needs_dtypes
     def initialize(self) -> None:
         assert isinstance(self.input_module, Module)
-        self._dyn_viewer = DynViewer(self.dtypes, self.input_module, self.input_slot)
+        self._dyn_viewer = DynViewer(
+            self.dtypes, self.input_module, self.input_slot, self.input_dictionaries
+        )
         self.dag.request_attention(self.title, "widget", "PROGRESS_NOTIFICATION", "0")
         self.children = (self._dyn_viewer,)
 
@@ -13,6 +13,11 @@ from .utils import (make_button, VBox, TypedBase, IpyVBoxTyped, starter_callback
                     amend_last_record, is_recording, runner, needs_dtypes,
                     modules_producer)
 from progressivis.io.api import Variable
+from .multi_summary import MultiColumnSummary
+from .crossfilter import CrossFilter
+from .module_registry import get_or_create_module
+from .sketches import (QUANTILE_BACKENDS, DEFAULT_KLL_K, DEFAULT_MEMORY_BUDGET,
+                       column_memory, kll_k, quantile_sketch_factory)
 from ..vega import VegaWidget
 from .._stacked_hist_schema import stacked_hist_spec_no_data
 from typing import Any as AnyType, cast
@@ -61,6 +66,20 @@ def p100_range_slider(
     )
 
 
+class CrossFilterVariable:
+    """
+    Stands for the `Variable` feeding a `RangeQuery` when the filters of all the
+    columns are fused in a `CrossFilter`
+    """
+
+    def __init__(self, cross: CrossFilter, column: str) -> None:
+        self.cross = cross
+        self.column = column
+
+    async def from_input(self, bounds: dict[str, AnyType]) -> None:
+        self.cross.set_range(self.column, bounds["lower"], bounds["upper"])
+
+
 class HistSlider(IpyVBoxTyped):
     sk_mod: KLLSketch | None = None
     var_mod: Variable | None = None
@@ -562,7 +581,8 @@ class DynViewer(TreeTab):
         """
         return self.col_typed_names[tcol][0]
 
-    def run(self, carrier: "FacadeCreatorW") -> None:
+    def run(self, carrier: "FacadeCreatorW", fused: bool = False,
+            sketch: dict[str, AnyType] | None = None) -> None:
         num_bounds = self.get_num_bounds()
         max_num_cols = self.get_checked_num("max")
         min_num_cols = self.get_checked_num("min")
@@ -574,31 +594,93 @@ class DynViewer(TreeTab):
                 max_num_cols=max_num_cols,
                 min_num_cols=min_num_cols,
                 hist1d_cols=hist1d_cols,
-                hist2d_cols=hist2d_cols
+                hist2d_cols=hist2d_cols,
+                fused=fused,
+                sketch=sketch
             )})
-        self._run(carrier, num_bounds, max_num_cols, min_num_cols, hist1d_cols, hist2d_cols)
+        self._run(carrier, num_bounds, max_num_cols, min_num_cols, hist1d_cols, hist2d_cols,
+                  fused, sketch)
 
     def run_batch(self, carrier: "FacadeCreatorW") -> None:
         content = carrier.frozen_kw
         self._run(carrier, **content)
 
+    def _run_fused(self, carrier: "FacadeCreatorW",
+                   num_bounds: dict[str, AnyType], k: int,
+                   sketch_factory: AnyType) -> CrossFilter:
+        """
+        One `CrossFilter` for the filters and one `MultiColumnSummary` for the
+        sketches and the (raw and filtered) histograms of all the columns,
+        instead of 5 modules per column
+        """
+        s = carrier.input_module.scheduler
+        inp = carrier.input_module
+        tcols = list(num_bounds.keys())
+        cols = [self.col_typed_names[tcol][0] for tcol in tcols]
+        cross = CrossFilter(columns=cols, scheduler=s)
+        cross.input.table = inp.output[carrier.input_slot]
+        summary = MultiColumnSummary(columns=cols, nbins=NBINS, k=k,
+                                     sketch_factory=sketch_factory, scheduler=s)
+        summary.input.table = inp.output[carrier.input_slot]
+        summary.input.filtered = cross.output.result
+        sink = Sink(scheduler=s)
+        sink.input.inp = cross.output.result
+        sink.input.inp = summary.output.result
+        assert self.gb_num
+        viz_objs = []
+        for tcol, col in zip(tcols, cols):
+            viz_obj = self.gb_num.df.loc[tcol, DISTR_COL]
+            viz_obj.sk_mod = summary.sketch(col)
+            viz_obj.var_mod = CrossFilterVariable(cross, col)
+            viz_obj.raw_hist_1d = summary.histogram(col)
+            viz_obj.qry_hist_1d = summary.filtered_histogram(col)
+            viz_objs.append(viz_obj)
+
+        def _update(m: Module, run_number: int) -> None:
+            for viz_obj in viz_objs:
+                viz_obj.update()
+
+        summary.on_after_run(_update)
+        return cross
+
     @modules_producer
     def _run(self, carrier: "FacadeCreatorW",
              num_bounds: dict[str, AnyType],
              max_num_cols: list[str],
              min_num_cols: list[str],
              hist1d_cols: list[str],
-             hist2d_cols: list[tuple[str, str]]) -> None:
+             hist2d_cols: list[tuple[str, str]],
+             fused: bool = False,
+             sketch: dict[str, AnyType] | None = None) -> None:
+        """
+        sketch: quantile sketch backend and memory budget (bytes, for all the
+                columns), KLL with k=DEFAULT_KLL_K when not provided
+        """
         s = carrier.input_module.scheduler
+        backend = "kll"
+        k = DEFAULT_KLL_K
+        memory = None
+        if sketch is not None and num_bounds:
+            backend = sketch["backend"]
+            memory = column_memory(sketch["budget"], len(num_bounds))
+            k = kll_k(memory)
         with s:
             inp = carrier.input_module
             assert isinstance(inp, Module)
             raw_hist_1d = None
             raw_hist_index = None
-            for tcol, (lo, up) in num_bounds.items():
+            if backend != "kll":  # only available with the fused modules
+                fused = True
+            if fused and num_bounds:
+                factory = (None if memory is None
+                           else quantile_sketch_factory(backend, memory))
+                inp = self._run_fused(carrier, num_bounds, k, factory)
+            for tcol, (lo, up) in ({} if fused else num_bounds).items():
                 col = self.col_typed_names[tcol][0]
-                kll = KLLSketch(column=col, k=10000, scheduler=s)
-                kll.input[0] = inp.output[carrier.input_slot]
+                kll = get_or_create_module(
+                    carrier, KLLSketch,
+                    dict(table=(inp, carrier.input_slot, None)), column=col, k=k
+                )
                 range_qry = RangeQuery(column=col, scheduler=s)
                 range_qry.params.watched_key_lower = "lower"
                 range_qry.params.watched_key_upper = "upper"
@@ -674,11 +756,24 @@ class FacadeCreatorW(VBox):
         )
         self.dag.request_attention(self.title, "widget", "PROGRESS_NOTIFICATION", "0")
         btn = make_button("Start", cb=self._start_cb)
-        self.children = (self._dyn_viewer, btn)
+        self._fused = ipw.Checkbox(value=True, indent=False,
+                                   description="Single pass sketches and filters")
+        self._backend = ipw.Dropdown(options=QUANTILE_BACKENDS, value="kll",
+                                     description="Quantile sketch:",
+                                     style={"description_width": "initial"})
+        self._budget = ipw.BoundedIntText(value=0, min=0, max=2**14,
+                                          description="Sketch memory (MB, 0: none):",
+                                          style={"description_width": "initial"})
+        self.children = (self._dyn_viewer,
+                         ipw.HBox([self._fused, self._backend, self._budget, btn]))
 
     @starter_callback
     def _start_cb(self, btn: AnyType) -> None:
-        self._dyn_viewer.run(self)
+        backend, budget = self._backend.value, self._budget.value * 2**20
+        sketch = None
+        if budget or backend != "kll":  # the other backends are sized by a budget
+            sketch = dict(backend=backend, budget=budget or DEFAULT_MEMORY_BUDGET)
+        self._dyn_viewer.run(self, fused=self._fused.value, sketch=sketch)
 
     @runner
     def run(self) -> None:
@@ -0,0 +1,187 @@
+"""
+Fused descriptive statistics: all the moments of many columns in one pass
+"""
+from __future__ import annotations
+
+import numpy as np
+from progressivis.core.module import Module, ReturnRunStep, def_input, def_output
+from progressivis.core.utils import fix_loc, indices_len
+from progressivis.table.api import PTable, BasePTable
+from progressivis.utils.psdict import PDict
+from typing import Any, Iterable
+
+FUSED_FUNCTIONS = ("min", "max", "mean", "var")
+
+
+def discard(res: PDict, keys: Iterable[str]) -> None:
+    """
+    Deletes `keys` from `res`. PDict fails to delete the keys added after it
+    was emptied, its ids are then made positional again, as in a new PDict
+    """
+    res.fix_indices()
+    for key in keys:
+        del res[key]
+    if not res:
+        res._index = None
+
+
+class StatCell:
+    """
+    One (column, statistic) cell of a `FusedStats` module, exposes the `result`
+    of the equivalent single statistic module (i.e. `{column: value}`)
+    """
+
+    def __init__(self, owner: "FusedStats", column: str, func: str) -> None:
+        self.owner = owner
+        self.column = column
+        self.func = func
+
+    @property
+    def name(self) -> str:
+        return self.owner.name
+
+    @property
+    def result(self) -> dict[str, float] | None:
+        value = self.owner.get_stat(self.column, self.func)
+        if value is None:
+            return None
+        return {self.column: value}
+
+
+class _CellIndexer:
+    def __init__(self, owner: "FusedStats") -> None:
+        self.owner = owner
+
+    def __getitem__(self, key: tuple[str, str]) -> StatCell:
+        column, func = key
+        if func not in FUSED_FUNCTIONS:
+            raise KeyError(f"'{func}' is not a fused statistic")
+        return StatCell(self.owner, column, func)
+
+
+@def_input("table", PTable)
+@def_output("result", PDict, doc="'{col}_{func}' and '{col}_count' for every column")
+class FusedStats(Module):
+    """
+    Computes min, max, mean and variance of all the `columns` in one pass per chunk.
+    The chunk is read once as a 2D block and every statistic is obtained with
+    a vectorized reduction along the rows, the running moments being merged
+    with the chunk ones (Chan et al. parallel algorithm, population variance).
+
+    `loc[col, func]` returns a per cell object with a `result` attribute, usable
+    where a `StatsFactory` matrix cell (`Min`, `Max`, `Var` ... module) is expected.
+
+    Args:
+        columns: the (numerical) columns, can be changed later with `set_columns()`
+    """
+
+    def __init__(self, columns: list[str] | None = None, **kwds: Any) -> None:
+        super().__init__(**kwds)
+        self.columns: list[str] = list(columns or [])
+        self.default_step_size = 10000
+        self._restart = False
+        self.reset()
+
+    def reset(self) -> None:
+        if self.result is not None:
+            discard(self.result, list(self.result))
+        n_cols = len(self.columns)
+        self._n = np.zeros(n_cols, dtype="int64")
+        self._mean = np.zeros(n_cols, dtype="float64")
+        self._m2 = np.zeros(n_cols, dtype="float64")
+        self._min = np.full(n_cols, np.inf)
+        self._max = np.full(n_cols, -np.inf)
+
+    @property
+    def loc(self) -> _CellIndexer:
+        return _CellIndexer(self)
+
+    def set_columns(self, columns: list[str]) -> None:
+        "changes the columns, the statistics are recomputed from scratch"
+        if list(columns) == self.columns:
+            return
+        self.columns = list(columns)
+        self.reset()  # the accumulators match the columns until the next step
+        self._restart = True
+
+    def get_stat(self, column: str, func: str) -> float | None:
+        if column not in self.columns:
+            return None
+        i = self.columns.index(column)
+        if not self._n[i]:
+            return None
+        if func == "min":
+            return float(self._min[i])
+        if func == "max":
+            return float(self._max[i])
+        if func == "mean":
+            return float(self._mean[i])
+        if func == "var":
+            return float(self._m2[i] / self._n[i])
+        raise KeyError(f"'{func}' is not a fused statistic")
+
+    def is_ready(self) -> bool:
+        if self._restart:
+            return True
+        return super().is_ready()
+
+    def _block(self, table: BasePTable, ids: Any) -> np.ndarray[Any, Any]:
+        "(n_columns, n_rows) float64 block"
+        return np.vstack(
+            [np.asarray(table[col].loc[ids], dtype="float64") for col in self.columns]
+        )
+
+    def _update(self, block: np.ndarray[Any, Any]) -> None:
+        valid = np.isfinite(block)
+        n_b = valid.sum(axis=1)
+        zeros = np.where(valid, block, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(n_b > 0, zeros.sum(axis=1) / n_b, 0.0)
+        m2_b = (np.where(valid, block - mean_b[:, None], 0.0) ** 2).sum(axis=1)
+        self._min = np.minimum(self._min, np.where(valid, block, np.inf).min(axis=1))
+        self._max = np.maximum(self._max, np.where(valid, block, -np.inf).max(axis=1))
+        n = self._n + n_b
+        delta = mean_b - self._mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratio = np.where(n > 0, n_b / n, 0.0)
+        self._mean = self._mean + delta * ratio
+        self._m2 = self._m2 + m2_b + delta * delta * self._n * ratio
+        self._n = n
+
+    def _publish(self) -> None:
+        res: dict[str, Any] = {}
+        for col in self.columns:
+            for func in FUSED_FUNCTIONS:
+                value = self.get_stat(col, func)
+                if value is not None:
+                    res[f"{col}_{func}"] = value
+            res[f"{col}_count"] = int(self._n[self.columns.index(col)])
+        if self.result is None:
+            self.result = PDict(res)
+        else:
+            self.result.update(res)
+
+    def run_step(
+        self, run_number: int, step_size: int, quantum: float
+    ) -> ReturnRunStep:
+        slot = self.get_input_slot("table")
+        assert slot is not None
+        table = slot.data()
+        if table is None:
+            return self._return_run_step(self.state_blocked, steps_run=0)
+        if self._restart or slot.deleted.any() or slot.updated.any():
+            # min and max cannot forget values, restart from scratch
+            self._restart = False
+            slot.reset()
+            slot.update(run_number)
+            self.reset()
+        steps = 0
+        if slot.created.any():
+            ids = fix_loc(slot.created.next(length=step_size, as_slice=False))
+            steps = indices_len(ids)
+            if self.columns and steps:
+                self._update(self._block(table, ids))
+        self._publish()
+        if slot.has_buffered():
+            return self._return_run_step(self.state_ready, steps)
+        return self._return_run_step(self.state_blocked, steps)
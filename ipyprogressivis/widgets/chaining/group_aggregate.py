@@ -0,0 +1,126 @@
+from .utils import (VBox, chaining_widget, runner, needs_dtypes,
+                    modules_producer, starter_callback,
+                    restore_on_replay
+                    )
+import ipywidgets as ipw
+from progressivis.core.api import Sink
+from progressivis.table.api import Aggregate
+from progressivis.table.group_by import UTIME, UTIME_SHORT_D, DT_MAX
+from ipyprogressivis.ipywel import (
+    Proxy,
+    button,
+    anybox,
+    label,
+    hbox,
+    dropdown,
+    select_multiple,
+    int_text,
+    gridbox,
+    checkbox,
+)
+from .aggregate import RECORD, is_disabled
+from .hash_aggregate import HashAggregate
+from .schema import aggregate_dtypes, key_columns
+from typing import Any as AnyType
+
+
+@chaining_widget(label="Group by + aggregate")
+class GroupAggregateW(VBox):
+    """
+    Group by and aggregate in one streaming stage (see `HashAggregate`)
+    """
+    @needs_dtypes
+    @restore_on_replay
+    def initialize(self) -> None:
+        fncs = list(Aggregate.registry.keys())
+        cols = [RECORD] + list(self.dtypes.keys())
+        grid: list[Proxy] = [label("")] + [label(f) for f in fncs]
+        for col in cols:
+            col_type = "_" if col == RECORD else self.dtypes[col]
+            grid.append(label(f"{col}:{col_type}"))
+            grid.extend(
+                checkbox(value=False, indent=False,
+                         disabled=is_disabled(col_type, func)).uid(f"cbx/{col}/{func}")
+                for func in fncs
+            )
+        self._proxy = anybox(
+            self,
+            hbox(
+                select_multiple("By",
+                                options=[(f"{col}:{t}", col) for (col, t) in self.dtypes.items()
+                                         if t != "datetime64"],
+                                value=[],
+                                rows=5,
+                                ).uid("by_cols"),
+                dropdown("or datetime:",
+                         options=[("", "")] + [
+                             (f"{col}:{t}", col) for (col, t) in self.dtypes.items()
+                             if t == "datetime64"
+                         ],
+                         style={"description_width": "initial"},
+                         ).uid("by_dt"),
+                select_multiple(
+                    options=list(zip(UTIME, UTIME_SHORT_D.keys())),
+                    value=[],
+                    rows=DT_MAX,
+                    description="==>",
+                ).uid("by_dt_sub"),
+            ),
+            gridbox(*grid).layout(
+                grid_template_columns=f"200px repeat({len(fncs)}, 70px)"
+            ).uid("grid"),
+            hbox(
+                int_text("Worker threads:", value=4,
+                         style={"description_width": "initial"}).uid("n_partitions"),
+                button("Start").uid("start_btn").on_click(self._start_btn_cb)
+            )
+        )
+
+    def get_parameters(self) -> dict[str, AnyType]:
+        assert self._proxy is not None
+        by: AnyType
+        if dt_col := self._proxy.that.by_dt.widget.value:
+            by = dict(col=dt_col, subcols="".join(self._proxy.that.by_dt_sub.widget.value))
+        else:
+            by = list(self._proxy.that.by_cols.widget.value)
+            by = by[0] if len(by) == 1 else by
+        compute = [
+            ("" if col == RECORD else col, func)
+            for (key, px) in self._proxy._registry.items()
+            if key.startswith("cbx/") and px.widget.value
+            for (_, col, func) in [key.split("/")]
+        ]
+        return dict(by=by, compute=compute,
+                    n_partitions=self._proxy.that.n_partitions.widget.value)
+
+    def consumed_columns(self, by: AnyType, compute: list[tuple[str, str]],
+                         n_partitions: int) -> list[str]:
+        return key_columns(by) + [col for (col, _) in compute if col]
+
+    def infer_output_dtypes(self, by: AnyType, compute: list[tuple[str, str]],
+                            n_partitions: int) -> dict[str, str] | None:
+        return aggregate_dtypes(by, compute, self.dtypes)
+
+    @modules_producer
+    def init_modules(self, by: AnyType, compute: list[tuple[str, str]],
+                     n_partitions: int) -> HashAggregate:
+        s = self.input_module.scheduler
+        with s:
+            aggr = HashAggregate(by=by, compute=compute,
+                                 n_partitions=n_partitions, scheduler=s)
+            aggr.input.table = self.input_module.output[self.input_slot]
+            sink = Sink(scheduler=s)
+            sink.input.inp = aggr.output.result
+            return aggr
+
+    @starter_callback
+    def _start_btn_cb(self, proxy: Proxy, btn: ipw.Button) -> None:
+        assert self._proxy is not None
+        self.record = self._proxy.dump()
+        self.output_module = self.init_modules(**self.get_parameters())
+        self.output_slot = "result"
+
+    @runner
+    def run(self) -> AnyType:
+        self.output_module = self.init_modules(**self.get_parameters())
+        self.output_slot = "result"
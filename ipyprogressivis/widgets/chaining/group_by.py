@@ -18,18 +18,20 @@ from ipyprogressivis.ipywel import (
 import ipywidgets as ipw
 from progressivis.core.api import Sink
 from progressivis.table.group_by import (
-    GroupBy,
     UTIME,
     DT_MAX,
     SubPColumn as SC,
     UTIME_SHORT_D,
 )
 
+from .schema import key_columns
+from .categorical import CodesGroupBy
 from typing import Any as AnyType
 
 
 @chaining_widget(label="Group by")
 class GroupByW(VBox):
+    _forwards_columns = True  # the groups are defined on the input table
     @needs_dtypes
     @restore_on_replay
     def initialize(self) -> None:
@@ -48,7 +50,8 @@ class GroupByW(VBox):
             ).uid("grouping_mode_stack"),
             stack(
                 select_multiple("By",
-                                options=[(f"{col}:{t}", col) for (col, t) in self.dtypes.items()],
+                                options=[(f"{col}:{self._key_type(col, t)}", col)
+                                         for (col, t) in self.dtypes.items()],
                                 value=[],
                                 rows=5,
                                 ).uid("by_box_selm").observe(self.selm_cb),
@@ -77,13 +80,24 @@ class GroupByW(VBox):
                    ).uid("start_btn").on_click(self._add_group_by_cb)
             )
 
+    def _key_type(self, col: str, dtype: str) -> str:
+        # the dictionary encoded columns are grouped by their codes
+        return "category" if col in self.input_dictionaries else dtype
+
+    def consumed_columns(self, by: AnyType) -> list[str]:
+        return key_columns(by)
+
+    def infer_output_dtypes(self, by: AnyType) -> dict[str, str]:
+        # the result is a view on the input table
+        return self.dtypes
+
     @modules_producer
-    def init_modules(self, by: AnyType) -> GroupBy:
+    def init_modules(self, by: AnyType) -> CodesGroupBy:
         if isinstance(by, dict):
             by = SC(by["col"]).dt[by["subcols"]]
         s = self.input_module.scheduler
         with s:
-            grby = GroupBy(by=by, keepdims=True, scheduler=s)
+            grby = CodesGroupBy(by=by, keepdims=True, scheduler=s)
             grby.input.table = self.input_module.output[self.input_slot]
             sink = Sink(scheduler=s)
             sink.input.inp = grby.output.result
@@ -0,0 +1,283 @@
+"""
+Streaming hash aggregation (group by + aggregate in a single module)
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from progressivis.core.module import Module, ReturnRunStep, def_input, def_output
+from progressivis.core.slot import Slot
+from progressivis.core.decorators import process_slot, run_if_any
+from progressivis.core.utils import fix_loc
+from progressivis.table.api import PTable, BasePTable
+from progressivis.table.group_by import UTIME_SHORT_D
+from progressivis.stats.online import Univariate, aggr_registry
+from typing import Any, Type
+
+# aggregates maintained with vectorized (bincount) updates, the others
+# fall back to one Univariate instance per group
+VECTORIZED = {"count", "sum", "mean", "variance", "stddev"}
+
+By = str | list[str] | dict[str, str]
+
+# the key of the missing values, a single object so that the group is found
+# again by the dict lookups (NaN is not equal to itself)
+MISSING = float("nan")
+
+
+def _grow(arr: np.ndarray[Any, Any], size: int) -> np.ndarray[Any, Any]:
+    if len(arr) >= size:
+        return arr
+    res = np.zeros(max(size, 2 * len(arr)), dtype=arr.dtype)
+    res[: len(arr)] = arr
+    return res
+
+
+def _key_part(value: Any) -> Any:
+    return MISSING if pd.isna(value) else value
+
+
+def _column(values: list[Any]) -> np.ndarray[Any, Any]:
+    "strings are kept as objects, the tables do not store fixed width strings"
+    arr = np.array(values)
+    return arr.astype(object) if arr.dtype.kind in "US" else arr
+
+
+class _Moments:
+    """
+    Per group count, sum and M2 (Chan et al. pairwise combination), indexed by group id
+    """
+    def __init__(self) -> None:
+        self.n = np.zeros(0, dtype="int64")
+        self.sum = np.zeros(0, dtype="float64")
+        self.m2 = np.zeros(0, dtype="float64")
+
+    def update(self, codes: np.ndarray[Any, Any], values: np.ndarray[Any, Any] | None,
+               n_groups: int) -> None:
+        self.n = _grow(self.n, n_groups)
+        self.sum = _grow(self.sum, n_groups)
+        self.m2 = _grow(self.m2, n_groups)
+        n_b = np.bincount(codes, minlength=n_groups)
+        if values is None:  # count only
+            self.n[:n_groups] += n_b
+            return
+        values = values.astype("float64")
+        s_b = np.bincount(codes, weights=values, minlength=n_groups)
+        nz = n_b > 0
+        mean_b = np.zeros(n_groups)
+        mean_b[nz] = s_b[nz] / n_b[nz]
+        dev = values - mean_b[codes]
+        m2_b = np.bincount(codes, weights=dev * dev, minlength=n_groups)
+        n_a = self.n[:n_groups]
+        mean_a = np.zeros(n_groups)
+        nza = n_a > 0
+        mean_a[nza] = self.sum[:n_groups][nza] / n_a[nza]
+        n_ab = n_a + n_b
+        delta = mean_b - mean_a
+        corr = np.zeros(n_groups)
+        both = nza & nz
+        corr[both] = delta[both] ** 2 * n_a[both] * n_b[both] / n_ab[both]
+        self.m2[:n_groups] += m2_b + corr
+        self.sum[:n_groups] += s_b
+        self.n[:n_groups] = n_ab
+
+    def get(self, fname: str, gids: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+        n = self.n[gids]
+        if fname == "count":
+            return n
+        if fname == "sum":
+            return self.sum[gids]
+        safe_n = np.maximum(n, 1)
+        if fname == "mean":
+            return self.sum[gids] / safe_n
+        var = self.m2[gids] / safe_n
+        return var if fname == "variance" else np.sqrt(var)
+
+
+@def_input("table", PTable)
+@def_output("result", PTable)
+class HashAggregate(Module):
+    """
+    Single pass group by + aggregate: each chunk of the input table is hashed on the
+    `by` key, then per group accumulators are updated directly (no group membership is
+    materialized). Only the groups affected by a chunk are written back to the result.
+
+    Args:
+        by: column, list of columns or `dict(col=..., subcols="YMD...")` for datetime
+            subcolumns
+        compute: list of (column, aggregate name or `Univariate` subclass) as
+            accepted by `Aggregate`, the "" column meaning the row count
+        n_partitions: number of worker threads used to update the non vectorized
+                      aggregates, groups are partitioned on their id
+    """
+
+    def __init__(
+        self,
+        by: By,
+        compute: list[tuple[str, str | Type[Univariate]]],
+        n_partitions: int = 4,
+        **kwds: Any,
+    ) -> None:
+        super().__init__(**kwds)
+        self.by = by
+        self._compute = [
+            (col, aggr_registry[f] if isinstance(f, str) else f) for (col, f) in compute
+        ]
+        self._aggr_cols = {f"{col}_{f.name}": (col, f) for (col, f) in self._compute}
+        self.n_partitions = max(1, n_partitions)
+        self._executor: ThreadPoolExecutor | None = None
+        self.reset()
+
+    def reset(self) -> None:
+        if self.result is not None:
+            self.result.resize(0)
+        self._gids: dict[Any, int] = {}
+        self._keys: list[Any] = []
+        self._moments: dict[str, _Moments] = {}
+        self._generic: dict[str, list[Univariate]] = {}
+        self._n_written = 0  # groups are appended in id order, so row id == group id
+
+    @property
+    def n_groups(self) -> int:
+        return len(self._keys)
+
+    @property
+    def by_columns(self) -> list[str]:
+        by = self.by
+        if isinstance(by, str):
+            return [by]
+        if isinstance(by, dict):
+            return [f"{by['col']}_{sub}" for sub in by["subcols"]]
+        return list(by)
+
+    def _key_arrays(self, table: BasePTable, ids: Any) -> list[np.ndarray[Any, Any]]:
+        by = self.by
+        if isinstance(by, str):
+            return [np.asarray(table[by].loc[ids])]
+        if isinstance(by, dict):
+            vec = np.asarray(table[by["col"]].loc[ids])
+            return [vec[:, UTIME_SHORT_D[sub]] for sub in by["subcols"]]
+        return [np.asarray(table[col].loc[ids]) for col in by]
+
+    def _encode(self, keys: list[np.ndarray[Any, Any]]) -> tuple[np.ndarray[Any, Any], int]:
+        """
+        Returns the global group id of each row, registering the new groups.
+        The missing values form their own group.
+        """
+        factorized = [pd.factorize(key, use_na_sentinel=False) for key in keys]
+        local_keys: list[Any]
+        if len(keys) == 1:
+            codes, uniques = factorized[0]
+            local_keys = [_key_part(u) for u in uniques]
+        else:
+            combined, codes = np.unique(
+                np.stack([c for (c, _) in factorized], axis=1), axis=0, return_inverse=True
+            )
+            codes = codes.ravel()
+            local_keys = [
+                tuple(_key_part(u[i]) for ((_, u), i) in zip(factorized, row))
+                for row in combined
+            ]
+        gids = self._gids
+        mapping = np.empty(len(local_keys), dtype="int64")
+        for i, k in enumerate(local_keys):
+            gid = gids.get(k)
+            if gid is None:
+                gid = gids[k] = len(self._keys)
+                self._keys.append(k)
+            mapping[i] = gid
+        return mapping[codes], len(self._keys)
+
+    def _update_generic(self, name: str, cls: Type[Univariate],
+                        codes: np.ndarray[Any, Any], values: np.ndarray[Any, Any],
+                        n_groups: int) -> None:
+        computers = self._generic.setdefault(name, [])
+        computers.extend(cls() for _ in range(n_groups - len(computers)))
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+        starts = np.concatenate([[0], bounds])
+        stops = np.concatenate([bounds, [len(codes)]])
+        groups = sorted_codes[starts]
+
+        def _process(part: int) -> None:
+            for gid, start, stop in zip(groups, starts, stops):
+                if gid % self.n_partitions == part:
+                    computers[gid].update_many(values[order[start:stop]])
+
+        if self.n_partitions == 1 or len(groups) < 2 * self.n_partitions:
+            for part in range(self.n_partitions):
+                _process(part)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.n_partitions)
+        list(self._executor.map(_process, range(self.n_partitions)))
+
+    def _write(self, changed: np.ndarray[Any, Any]) -> None:
+        data: dict[str, Any] = {}
+        by_cols = self.by_columns
+        keys = [self._keys[g] for g in changed]
+        if len(by_cols) == 1:
+            data[by_cols[0]] = _column(keys)
+        else:
+            for i, col in enumerate(by_cols):
+                data[col] = _column([k[i] for k in keys])
+        for name, (_, cls) in self._aggr_cols.items():
+            if name in self._moments:
+                data[name] = self._moments[name].get(cls.name, changed)
+            else:
+                computers = self._generic[name]
+                data[name] = _column([computers[g].get() for g in changed])
+        new = changed >= self._n_written
+        if self.result is None:
+            self.result = PTable(
+                self.generate_table_name("hash_aggr"),
+                data=pd.DataFrame(data),
+                create=True,
+            )
+        else:
+            old = ~new
+            if np.any(old):
+                ids = changed[old]
+                for name in self._aggr_cols.keys():
+                    self.result.loc[ids, name] = data[name][old]
+            if np.any(new):
+                self.result.append({k: v[new] for (k, v) in data.items()})
+        self._n_written += int(new.sum())
+
+    @process_slot("table", reset_cb="reset")
+    @run_if_any
+    def run_step(
+        self, run_number: int, step_size: int, quantum: float
+    ) -> ReturnRunStep:
+        assert self.context
+        with self.context as ctx:
+            dfslot: Slot = ctx.table
+            indices = fix_loc(dfslot.created.next(length=step_size, as_slice=False))
+            steps = len(indices)
+            if steps == 0:
+                return self._return_run_step(self.state_blocked, steps_run=0)
+            table = dfslot.data()
+            if table is None:
+                return self._return_run_step(self.state_blocked, steps_run=0)
+            codes, n_groups = self._encode(self._key_arrays(table, indices))
+            for name, (col, cls) in self._aggr_cols.items():
+                values = np.asarray(table[col].loc[indices]) if col else None
+                if cls.name in VECTORIZED:
+                    moments = self._moments.setdefault(name, _Moments())
+                    moments.update(codes, None if cls.name == "count" else values,
+                                   n_groups)
+                else:
+                    if values is None:
+                        values = np.ones(len(codes))
+                    self._update_generic(name, cls, codes, values, n_groups)
+            # sorted, so the new groups come last in their creation order
+            self._write(np.unique(codes))
+        return self._return_run_step(self.next_state(dfslot), steps_run=steps)
+
+    async def ending(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        await super().ending()
@@ -27,6 +27,7 @@ import ipywidgets as ipw
 from progressivis.core.api import Module, asynchronize
 from progressivis.vis.heatmap import Heatmap
 from progressivis.stats.api import Histogram2D, Min, Max
+from .module_registry import get_or_create_module
 from progressivis import Quantiles
 from typing import Any as AnyType
 
@@ -181,6 +182,9 @@ class HeatmapW(VBox):
         xy = self.fetch_parameters()
         self.output_module = self.init_modules(xy)
 
+    def consumed_columns(self, ctx: dict[str, AnyType]) -> list[str]:
+        return [ctx["X"], ctx["Y"]]
+
     @modules_producer
     def init_modules(self, ctx: dict[str, AnyType]) -> Heatmap:
         col_x = ctx["X"]
@@ -197,10 +201,10 @@ class HeatmapW(VBox):
                 histogram2d.input.max = quantiles.output.result[ctx["max_q"]]
             else:
                 histogram2d.input.table = query.output.result
-                min_ = Min(scheduler=s)
-                min_.input.table = query.output.result[col_x, col_y]
-                max_ = Max(scheduler=s)
-                max_.input.table = query.output.result[col_x, col_y]
+                # shared with the other stages computing the same bounds
+                bounds_input = dict(table=(query, "result", [col_x, col_y]))
+                min_ = get_or_create_module(self, Min, bounds_input)
+                max_ = get_or_create_module(self, Max, bounds_input)
                 histogram2d.input.min = min_.output.result
                 histogram2d.input.max = max_.output.result
             # histogram2d.input.min = query.output.min
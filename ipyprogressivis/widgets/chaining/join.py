@@ -5,12 +5,20 @@ from .utils import (
     runner,
     needs_dtypes,
     modules_producer,
+    GuestWidget,
 )
 import ipywidgets as ipw
 import json
-from progressivis.table.group_by import UTIME_SHORT_D
+import sys
+from dataclasses import dataclass
+from progressivis.table.group_by import UTIME_SHORT_D, GroupBy, SubPColumn as SC
+from progressivis.table.unique_index import UniqueIndex
+from progressivis.core.pintset import PIntSet
 from progressivis.table.api import Join
-from progressivis.core.api import Sink, Module
+from progressivis.core.api import Sink, Module, Scheduler
+from .asof_join import AsofJoin
+from .module_registry import SHARED_MODULES, SharedModule
+from .schema import join_dtypes
 from ipyprogressivis.ipywel import (
     Proxy,
     button,
@@ -33,6 +41,94 @@ WidgetType = AnyType
 _l = ipw.Label
 
 
+@dataclass
+class SharedJoinIndex(SharedModule):
+    """
+    Key index module (`UniqueIndex` on the primary side, `GroupBy` on the related side)
+    maintained once for a given (module, slot, key) and consumed by every join using it.
+    It is registered with the other shared modules, so it is kept while a stage uses it
+    and forgotten when the last one is deleted.
+    """
+    module: UniqueIndex | GroupBy
+
+    @property
+    def n_keys(self) -> int:
+        return len(self.module.index)
+
+    def memory_usage(self) -> int:
+        """
+        Approximate size (in bytes) of the key index, the keys size being estimated
+        from a sample
+        """
+        index = self.module.index
+        if not index:
+            return 0
+        size = sys.getsizeof(index)
+        if isinstance(self.module, UniqueIndex):
+            size += sys.getsizeof(self.module._inverse)
+        sample = [k for (k, _) in zip(index.keys(), range(100))]
+        key_size = sum(sys.getsizeof(k) for k in sample) / len(sample)
+        size += int(key_size * len(index))
+        if isinstance(self.module, GroupBy):
+            # at most 4 bytes per id
+            size += sum(len(v) for v in index.values() if isinstance(v, PIntSet)) * 4
+        return size
+
+
+def _key_of(on: str | list[str]) -> str | tuple[str, ...]:
+    return tuple(on) if isinstance(on, list) else on
+
+
+def get_or_create_join_index(
+    owner: GuestWidget,
+    kind: Literal["primary", "related"],
+    module: Module,
+    slot: str,
+    on: str | list[str],
+    inv_mask: str | None = None,
+) -> SharedJoinIndex:
+    """
+    Returns the key index of the `kind` side of a join on `module.output[slot]`,
+    creating it only if no living join already maintains an identical one, and
+    registers `owner` (a join stage) as one of its users
+    """
+    s = module.scheduler
+    key = ("join_index", kind, module.name, slot, _key_of(on), inv_mask)
+    entry = SHARED_MODULES.get(key)
+    if isinstance(entry, SharedJoinIndex) and entry.alive(s):
+        entry.users.add(owner.title)
+        return entry
+    with s:
+        idx: UniqueIndex | GroupBy
+        if kind == "primary":
+            idx = UniqueIndex(on=on, scheduler=s)
+        elif inv_mask is None:
+            idx = GroupBy(by=on, scheduler=s)
+        else:
+            assert isinstance(on, str)
+            idx = GroupBy(by=SC(on).dt[inv_mask], keepdims=True, scheduler=s)
+        idx.input.table = module.output[slot]
+    entry = SharedJoinIndex(module=idx, users={owner.title})
+    SHARED_MODULES[key] = entry
+    return entry
+
+
+def shared_index_info(title: str, scheduler: Scheduler) -> str:
+    "the shared key indexes used by the join stage `title`"
+    lines = []
+    for entry in SHARED_MODULES.values():
+        if not isinstance(entry, SharedJoinIndex) or title not in entry.users:
+            continue
+        if not entry.alive(scheduler):
+            continue
+        lines.append(
+            f"{entry.module.name}: {entry.n_keys} keys, "
+            f"~{entry.memory_usage() / 2**20:.2f} MB, "
+            f"shared by {len(entry.users)} join stage(s)"
+        )
+    return "<br>".join(lines)
+
+
 def get_dt(proxy: Proxy, col: str) -> str:
     return "".join(
         [sym * proxy.lookup(f"{sym}/{col}").widget.value for sym in UTIME_SHORT_D]
@@ -103,12 +199,19 @@ class JoinW(VBox):
             hbox(
                 dropdown(
                     "How",
-                    options=["inner", "outer"],
+                    options=["inner", "outer", "as-of"],
                     value="inner",
                     style={"description_width": "initial"},
                 ).uid("how_dd"),
+                text(
+                    "Tolerance",
+                    placeholder="as-of only (seconds for dates)",
+                    style={"description_width": "initial"},
+                ).uid("tolerance"),
+                checkbox("Share key indexes", value=True, indent=False).uid("share_ck"),
                 button("Start").uid("start_btn").on_click(self._start_btn_cb),
             ),
+            html().uid("index_info"),
         )
         self._primary_wg: VBox | None = None
         self._related_wg: VBox | None = None
@@ -182,6 +285,16 @@ class JoinW(VBox):
             related_inp=json.loads(self._proxy.that.related_wg_frozen.widget.value),
             inv_mask=inv_mask,
             how=self._proxy.that.how_dd.widget.value,
+            share_index=(
+                "share_ck" in self._proxy._registry  # absent from older records
+                and self._proxy.that.share_ck.widget.value
+            ),
+            tolerance=(
+                float(tol)
+                if "tolerance" in self._proxy._registry
+                and (tol := self._proxy.that.tolerance.widget.value.strip())
+                else None
+            ),
         )
 
     @starter_callback
@@ -229,6 +342,46 @@ class JoinW(VBox):
         self.output_module = self.init_modules(**content)
         self.output_slot = "result"
 
+    def consumed_columns(
+        self,
+        primary_cols: list[str],
+        related_cols: list[str],
+        primary_on: str | list[str],
+        related_on: str | list[str],
+        **kw: Any,
+    ) -> list[str]:
+        # both inputs get the whole demand, every loader keeps its own columns
+        keys = [on for on in (primary_on, related_on) if isinstance(on, str)]
+        keys += [col for on in (primary_on, related_on) if isinstance(on, list) for col in on]
+        return primary_cols + related_cols + keys
+
+    def infer_output_dtypes(
+        self,
+        primary_cols: list[str],
+        related_cols: list[str],
+        primary_on: str | list[str],
+        related_on: str | list[str],
+        primary_inp: str | tuple[str, int],
+        related_inp: tuple[str, int],
+        inv_mask: str,
+        how: Literal["inner", "outer", "as-of"],
+        share_index: bool = False,
+        tolerance: float | None = None,
+    ) -> dict[str, str] | None:
+        if primary_inp == "parent":
+            primary_wg = self.parent
+            related_wg = self.get_widget_by_key(tuple(related_inp))  # type: ignore
+        else:
+            primary_wg = self.get_widget_by_key(tuple(primary_inp))  # type: ignore
+            related_wg = self.parent
+        if primary_wg.output_dtypes is None or related_wg.output_dtypes is None:
+            return None
+        return join_dtypes(
+            primary_cols, related_cols,
+            primary_wg.output_dtypes, related_wg.output_dtypes,
+            suffix="_primary" if how == "as-of" else None,  # see AsofJoin
+        )
+
     @modules_producer
     def init_modules(
         self,
@@ -239,8 +392,10 @@ class JoinW(VBox):
         primary_inp: str | tuple[str, int],
         related_inp: tuple[str, int],
         inv_mask: str,
-        how: Literal["inner", "outer"],
-    ) -> Join:
+        how: Literal["inner", "outer", "as-of"],
+        share_index: bool = False,
+        tolerance: float | None = None,
+    ) -> Join | AsofJoin:
         if primary_inp == "parent":
             primary_wg = self.parent
             related_wg = self.get_widget_by_key(tuple(related_inp))  # type: ignore
@@ -252,19 +407,106 @@ class JoinW(VBox):
         with s:
             assert primary_wg is not None
             assert related_wg is not None
+            if how == "as-of":
+                return self._init_asof_join(
+                    primary_wg, related_wg, primary_cols, related_cols,
+                    primary_on, related_on, tolerance
+                )
             join = Join(how=how, inv_mask=inv_mask, scheduler=s)
-            join.create_dependent_modules(
-                related_module=cast(Module, related_wg.output_module),
-                primary_module=cast(Module, primary_wg.output_module),
-                related_on=related_on,
+            if share_index:
+                self._connect_shared_indexes(
+                    join,
+                    related_module=cast(Module, related_wg.output_module),
+                    primary_module=cast(Module, primary_wg.output_module),
+                    related_slot=related_wg.output_slot,
+                    primary_slot=primary_wg.output_slot,
+                    related_on=related_on,
+                    primary_on=primary_on,
+                    related_cols=related_cols,
+                    primary_cols=primary_cols,
+                )
+            else:
+                join.create_dependent_modules(
+                    related_module=cast(Module, related_wg.output_module),
+                    primary_module=cast(Module, primary_wg.output_module),
+                    related_on=related_on,
+                    primary_on=primary_on,
+                    related_cols=related_cols,
+                    primary_cols=primary_cols,
+                )
+            sink = Sink(scheduler=s)
+            sink.input.inp = join.output.result
+        if share_index and "index_info" in self._proxy._registry:  # type: ignore
+            join.on_after_run(self._update_index_info)
+        return join
+
+    def _init_asof_join(
+        self,
+        primary_wg: VBox,
+        related_wg: VBox,
+        primary_cols: list[str],
+        related_cols: list[str],
+        primary_on: str | list[str],
+        related_on: str | list[str],
+        tolerance: float | None,
+    ) -> AsofJoin:
+        if not isinstance(primary_on, str) or not isinstance(related_on, str):
+            raise ValueError("as-of join requires a single (timestamp) key column")
+        s = self.input_module.scheduler
+        with s:
+            join = AsofJoin(
                 primary_on=primary_on,
-                related_cols=related_cols,
+                related_on=related_on,
                 primary_cols=primary_cols,
+                related_cols=related_cols,
+                tolerance=tolerance,
+                scheduler=s,
             )
+            join.input.primary = primary_wg.output_module.output[primary_wg.output_slot]
+            join.input.related = related_wg.output_module.output[related_wg.output_slot]
             sink = Sink(scheduler=s)
             sink.input.inp = join.output.result
         return join
 
+    def _connect_shared_indexes(
+        self,
+        join: Join,
+        *,
+        primary_module: Module,
+        related_module: Module,
+        primary_slot: str,
+        related_slot: str,
+        primary_on: str | list[str],
+        related_on: str | list[str],
+        primary_cols: list[str],
+        related_cols: list[str],
+    ) -> None:
+        """
+        Same wiring as `Join.create_dependent_modules()` but the key indexes
+        are reused when another join already maintains them
+        """
+        related = get_or_create_join_index(
+            self, "related", related_module, related_slot, related_on, join._inv_mask
+        )
+        primary = get_or_create_join_index(
+            self, "primary", primary_module, primary_slot, primary_on
+        )
+        join.related_on = related_on
+        join.primary_on = primary_on
+        join.on = related_on
+        join._related_cols = related_cols
+        join._virtual_cols = primary_cols
+        join.input.related = related.module.output.result
+        join.input.primary = primary.module.output.result
+        join.dep.unique_index = primary.module
+        join.dep.group_by = related.module
+
+    def _update_index_info(self, m: Module, run_number: int) -> None:
+        assert self._proxy is not None
+        if run_number % 10:  # cheap enough but not worth doing on every run
+            return
+        self._proxy.that.index_info.attrs(value=shared_index_info(self.title, m.scheduler))
+
     def _ok_btn_cb(self, proxy: Proxy, b: Any) -> None:
         assert self._proxy is not None
         input_2 = proxy.that.input_2
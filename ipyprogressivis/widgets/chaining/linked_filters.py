@@ -0,0 +1,167 @@
+from .utils import (VBox, chaining_widget, runner, needs_dtypes,
+                    modules_producer, starter_callback,
+                    restore_on_replay, Coro
+                    )
+import ipywidgets as ipw
+import numpy as np
+import pandas as pd
+from progressivis.core.api import Module, Sink, asynchronize
+from ipyprogressivis.ipywel import (
+    Proxy,
+    button,
+    anybox,
+    select_multiple,
+    box,
+)
+from ..vega import VegaWidget
+from .._stacked_hist_schema import stacked_hist_spec_no_data
+from .crossfilter import CrossFilter
+from ._filter_controller import FilterController
+from typing import Any as AnyType
+
+
+def _range_slider(col: str) -> ipw.FloatRangeSlider:
+    return ipw.FloatRangeSlider(
+        value=[0.0, 0.0], min=0.0, max=0.0, step=0.0, description=col,
+        continuous_update=True, readout_format=".2f",
+        style={"description_width": "initial"}, layout={"width": "400px"},
+    )
+
+
+class AfterRun(Coro):
+    widget: "CrossFilterW | None" = None
+
+    async def action(self, m: Module, run_number: int) -> None:
+        assert isinstance(m, CrossFilter)
+        assert self.widget is not None
+        await asynchronize(self.widget.refresh_views, m)
+
+
+@chaining_widget(label="Crossfilter")
+class CrossFilterW(VBox):
+    """
+    Linked range filters: all the dimensions share one selection (see `CrossFilter`),
+    each histogram shows the rows selected by the other dimensions
+    """
+    @needs_dtypes
+    @restore_on_replay
+    def initialize(self) -> None:
+        self.output_dtypes = self.dtypes
+        num_cols = [col for (col, t) in self.dtypes.items()
+                    if str(t).startswith("float") or str(t).startswith("int")]
+        self._sliders: dict[str, ipw.FloatRangeSlider] = {}
+        self._hists: dict[str, VegaWidget] = {}
+        # last (raw, filtered) histograms drawn by column
+        self._last_hists: dict[
+            str, tuple[np.ndarray[AnyType, AnyType], np.ndarray[AnyType, AnyType]]
+        ] = {}
+        self._controller: FilterController | None = None
+        self._crossfilter: CrossFilter | None = None
+        self._info = ipw.Label("")
+        self._proxy = anybox(
+            self,
+            select_multiple("Dimensions",
+                            options=num_cols, value=[], rows=5).uid("columns"),
+            button("Start").uid("start_btn").on_click(self._start_btn_cb),
+            box().uid("views"),
+        )
+
+    def get_parameters(self) -> dict[str, AnyType]:
+        assert self._proxy is not None
+        return dict(columns=list(self._proxy.that.columns.widget.value))
+
+    @modules_producer
+    def init_modules(self, columns: list[str]) -> CrossFilter:
+        assert self._proxy is not None
+        s = self.input_module.scheduler
+        with s:
+            cross = CrossFilter(columns=columns, scheduler=s)
+            cross.input.table = self.input_module.output[self.input_slot]
+            sink = Sink(scheduler=s)
+            sink.input.inp = cross.output.result
+            self._crossfilter = cross
+            self._controller = FilterController(self._apply_sliders,
+                                                on_latency=self._show_latency)
+            self._controller.watch_result(cross)
+            rows = []
+            for col in columns:
+                self._sliders[col] = _range_slider(col)
+                self._hists[col] = VegaWidget(stacked_hist_spec_no_data)
+                rows.append(ipw.HBox([self._sliders[col], self._hists[col]]))
+            views = self._proxy.that.views.widget
+            assert hasattr(views, "children")
+            views.children = rows + [self._info]
+            self.after_run = AfterRun()
+            self.after_run.widget = self
+            cross.on_after_run(self.after_run)
+            return cross
+
+    async def _apply_sliders(self) -> None:
+        cross = self._crossfilter
+        assert cross is not None
+        for col, slider in self._sliders.items():
+            lower, upper = slider.value
+            # the slider ends mean "unbounded" (new rows may lie beyond them)
+            cross.set_range(col,
+                            None if lower <= slider.min else lower,
+                            None if upper >= slider.max else upper)
+
+    def _show_latency(self, latency: float) -> None:
+        assert self._crossfilter is not None
+        self._show_info(self._crossfilter)
+
+    def _show_info(self, cross: CrossFilter) -> None:
+        assert self._controller is not None
+        info = f"{len(cross.selection)} selected rows"
+        if (latency := self._controller.last_latency) is not None:
+            info += f", filter latency: {latency * 1000:.0f} ms"
+        self._info.value = info
+
+    def refresh_views(self, cross: CrossFilter) -> None:
+        assert self._controller is not None
+        for col, slider in self._sliders.items():
+            bounds = cross.bounds(col)
+            if bounds is None:
+                continue
+            lo, hi = bounds
+            full = tuple(slider.value) == (slider.min, slider.max)
+            if (slider.min, slider.max) != (lo, hi):
+                if lo > slider.max:
+                    slider.max = hi
+                    slider.min = lo
+                else:
+                    slider.min = lo
+                    slider.max = hi
+                slider.step = (hi - lo) / cross.nbins
+                if full:
+                    slider.value = [lo, hi]
+            self._controller.watch(slider)
+            raw, others = cross.histograms(col)
+            last = self._last_hists.get(col)
+            if last is not None and all(map(np.array_equal, last, (raw, others))):
+                continue
+            self._last_hists[col] = (raw.copy(), others.copy())
+            nbins = len(raw)
+            raw_max = raw.max() or 1
+            source = pd.DataFrame({
+                "nbins": list(range(nbins)) * 2,
+                "level": np.concatenate([np.cbrt(raw / raw_max),
+                                         np.cbrt(others / raw_max)]),
+                "Origin": ["raw"] * nbins + ["qry"] * nbins,
+            })
+            hist_wg = self._hists[col]
+            hist_wg._displayed = True
+            hist_wg.update("data", remove="true", insert=source)
+        self._show_info(cross)
+
+    @starter_callback
+    def _start_btn_cb(self, proxy: Proxy, btn: ipw.Button) -> None:
+        assert self._proxy is not None
+        self.record = self._proxy.dump()
+        self.output_module = self.init_modules(**self.get_parameters())
+        self.output_slot = "result"
+
+    @runner
+    def run(self) -> AnyType:
+        self.output_module = self.init_modules(**self.get_parameters())
+        self.output_slot = "result"
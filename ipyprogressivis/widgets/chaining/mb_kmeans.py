@@ -15,8 +15,6 @@ import ipywidgets as ipw
 from progressivis.core.api import Module, asynchronize, Sink
 from progressivis.vis import MCScatterPlot
 from progressivis.cluster import MBKMeans, MBKMeansFilter
-from progressivis.core.api import JSONEncoderNp as JS
-from ipytablewidgets import NumpyAdapter  # type: ignore
 from ..scatterplot import Scatterplot
 from ipyprogressivis.ipywel import (
     Proxy,
@@ -42,28 +40,13 @@ class AfterRun(Coro):
         wg = self.widget.children[0]
         assert wg is not None
         val = m.to_json()
-        data_ = {
-            k: v
-            for (k, v) in val.items()
-            if k not in ("hist_tensor", "sample_tensor")
-        }
         def from_input_move_point(_val: AnyType) -> None:
             aio.create_task(m.move_point.from_input(wg.move_point))  # type:ignore
 
-        ht = val.get("hist_tensor")
         def _func() -> None:
             if wg.modal:  # type: ignore
                 return
-            arrays = dict()
-            if ht is not None:
-                for i, arr in enumerate(ht):
-                    arrays[f"hist_{i}"] = arr
-                wg.histograms = NumpyAdapter(arrays, touch_mode=False)  # type: ignore
-            st = val.get("sample_tensor")
-            if st is not None:
-                vectors = {f"v{i}": vec for (i, vec) in enumerate(st)}
-                wg.samples = NumpyAdapter(vectors, touch_mode=False)  # type: ignore
-            wg.data = JS.dumps(data_)  # type: ignore
+            wg.update_from_json(val)  # type: ignore
             if not hasattr(wg, "first_time"):
                 wg.observe(from_input_move_point, "move_point")
                 wg.first_time = True  # type: ignore
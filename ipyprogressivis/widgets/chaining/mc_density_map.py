@@ -16,8 +16,6 @@ from collections import defaultdict
 from itertools import chain, batched
 from progressivis.core.api import Module, asynchronize
 from progressivis.vis import MCScatterPlot
-from progressivis.core.api import JSONEncoderNp as JS
-from ipytablewidgets import NumpyAdapter  # type: ignore
 from ..scatterplot import Scatterplot
 from ipyprogressivis.ipywel import (
     Proxy,
@@ -41,22 +39,9 @@ class AfterRun(Coro):
         wg = self.widget.children[0]
         assert isinstance(wg, Scatterplot)
         val = m.to_json()
-        data_ = {
-            k: v for (k, v) in val.items() if k not in ("hist_tensor", "sample_tensor")
-        }
-        ht = val.get("hist_tensor")
 
         def _func() -> None:
-            arrays = dict()
-            if ht is not None:
-                for i, arr in enumerate(ht):
-                    arrays[f"hist_{i}"] = arr
-                wg.histograms = NumpyAdapter(arrays, touch_mode=False)
-            st = val.get("sample_tensor")
-            if st is not None:
-                vectors = {f"v{i}": vec for (i, vec) in enumerate(st)}
-                wg.samples = NumpyAdapter(vectors, touch_mode=False)
-            wg.data = JS.dumps(data_)  # type: ignore
+            wg.update_from_json(val)
 
         await asynchronize(_func)
 
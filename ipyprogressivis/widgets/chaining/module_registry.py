@@ -0,0 +1,119 @@
+"""
+Stage level registry of shared (deduplicated) derived modules
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from progressivis.core.api import Module, Scheduler
+from progressivis.core.module_facade import ModuleFacade
+from typing import Any, Sequence, TypeVar, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .utils import GuestWidget
+
+M = TypeVar("M", bound=Module)
+#: an input connection: (producer module or facade, output slot, columns or None)
+InputSpec = tuple[Module | ModuleFacade, str, Sequence[str] | None]
+
+
+@dataclass
+class SharedModule:
+    """
+    Derived module (`Min`, `Max`, `KLLSketch` ...) created once for a given
+    (class, parameters, inputs) and used by every stage asking for it
+    """
+    module: Module
+    users: set[str] = field(default_factory=set)  # titles of the stages using it
+
+    def alive(self, scheduler: Scheduler) -> bool:
+        # modules created in the current dataflow are not yet known by the scheduler
+        modules = scheduler.dataflow.modules() if scheduler.dataflow else scheduler.modules()
+        return modules.get(self.module.name) is self.module
+
+
+SHARED_MODULES: dict[tuple[Any, ...], SharedModule] = {}
+
+
+def _freeze(value: Any) -> Any:
+    "hashable version of a parameter value"
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for (k, v) in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        frozen = tuple(_freeze(v) for v in value)
+        return tuple(sorted(frozen, key=repr)) if isinstance(value, (set, frozenset)) else frozen
+    return value
+
+
+def _producer(src: Module | ModuleFacade, slot: str) -> tuple[Module, str]:
+    "the module and slot actually producing `src.output[slot]` (facades are resolved)"
+    out = src.output[slot]
+    return out.output_module, out.output_name
+
+
+def module_key(
+    cls: type[Module], inputs: dict[str, InputSpec], params: dict[str, Any]
+) -> tuple[Any, ...]:
+    """
+    Structural identity of a module: same class, parameters, input slots and columns
+    """
+    connections = []
+    for name, (src, slot, cols) in sorted(inputs.items()):
+        producer, out_slot = _producer(src, slot)
+        connections.append(
+            (name, producer.name, out_slot, None if cols is None else tuple(cols))
+        )
+    return (f"{cls.__module__}.{cls.__qualname__}", _freeze(params), tuple(connections))
+
+
+def get_or_create_module(
+    owner: GuestWidget,
+    cls: type[M],
+    inputs: dict[str, InputSpec],
+    **params: Any,
+) -> M:
+    """
+    Returns the living module structurally identical to `cls(**params)` fed by
+    `inputs`, creating it if needed, and registers `owner` (a stage) as one of its
+    users. Shared modules must not be reconfigured by their users.
+
+    Args:
+        owner: the stage using the module
+        cls: module class
+        inputs: input slot name -> (producer module, output slot, columns or None)
+        params: constructor parameters (the scheduler excepted)
+    """
+    s = owner.input_module.scheduler
+    key = module_key(cls, inputs, params)
+    entry = SHARED_MODULES.get(key)
+    if entry is None or not entry.alive(s):
+        with s:
+            mod = cls(scheduler=s, **params)
+            for name, (src, slot, cols) in inputs.items():
+                out = src.output[slot]
+                setattr(mod.input, name, out if cols is None else out[tuple(cols)])
+        entry = SharedModule(module=mod)
+        SHARED_MODULES[key] = entry
+    entry.users.add(owner.title)
+    return entry.module  # type: ignore
+
+
+def shared_modules_kept(titles: set[str], scheduler: Scheduler) -> set[str]:
+    """
+    Names of the living shared modules still used by stages not in `titles`
+    (i.e. to be kept when these stages are deleted)
+    """
+    return {
+        entry.module.name
+        for entry in SHARED_MODULES.values()
+        if entry.alive(scheduler) and entry.users - titles
+    }
+
+
+def release_shared_modules(titles: set[str]) -> None:
+    """
+    Removes the deleted stages `titles` from the users, forgets the unused entries
+    """
+    for key, entry in list(SHARED_MODULES.items()):
+        entry.users -= titles
+        if not entry.users:
+            del SHARED_MODULES[key]
@@ -0,0 +1,242 @@
+"""
+Single pass summaries (quantile sketch, bounds, histograms) of many columns
+"""
+from __future__ import annotations
+
+import numpy as np
+from progressivis.core.module import Module, ReturnRunStep, def_input, def_output
+from progressivis.core.pintset import PIntSet
+from progressivis.core.utils import fix_loc, indices_len
+from progressivis.table.api import PTable, BasePTable
+from progressivis.utils.psdict import PDict
+from .sketches import QuantileSketch, KLLQuantiles
+from typing import Any, Callable
+
+NBINS = 4096
+KLL_K = 10000
+SPAN_MARGIN = 0.25  # extra span added when the histograms have to be recomputed
+
+
+class ColumnSketch:
+    """
+    Per column view of a `MultiColumnSummary`, exposes the attributes read from a
+    `KLLSketch` module (`_kll`, `result`), whatever the quantile sketch backend
+    """
+
+    def __init__(self, owner: "MultiColumnSummary", column: str) -> None:
+        self.owner = owner
+        self.column = column
+
+    @property
+    def _kll(self) -> QuantileSketch:
+        return self.owner.sketches[self.column]
+
+    @property
+    def result(self) -> dict[str, Any] | None:
+        sk = self._kll
+        if sk.is_empty():
+            return None
+        return dict(min=sk.get_min_value(), max=sk.get_max_value())
+
+
+class ColumnHistogram:
+    """
+    Per column view of a `MultiColumnSummary`, exposes the `result` of a
+    `Histogram1D` module (`array`, `min`, `max`)
+    """
+
+    def __init__(self, owner: "MultiColumnSummary", column: str, filtered: bool) -> None:
+        self.owner = owner
+        self.column = column
+        self.filtered = filtered
+
+    @property
+    def result(self) -> dict[str, Any] | None:
+        bounds = self.owner.bounds.get(self.column)
+        if bounds is None:
+            return None
+        hists = self.owner.filtered_hists if self.filtered else self.owner.hists
+        return dict(array=hists[self.column], min=bounds[0], max=bounds[1])
+
+
+@def_input("table", PTable)
+@def_input("filtered", PTable, required=False,
+           doc="subset (view) of the table, histogrammed with the same bins")
+@def_output("result", PDict, doc="min, max and count of each column")
+class MultiColumnSummary(Module):
+    """
+    Updates, for all the `columns` and in one pass per chunk, a quantile sketch,
+    the bounds and a histogram. The chunk is read once as a 2D block, the bins of
+    all the columns are computed with a few vectorized operations and counted
+    with a single `bincount`.
+
+    When the optional `filtered` input is connected (e.g. a query result on the
+    same table), its histograms are maintained with the same bins.
+
+    `sketch(col)`, `histogram(col)` and `filtered_histogram(col)` return per column
+    objects usable where the facade expects `KLLSketch` and `Histogram1D` modules.
+
+    Args:
+        columns: the (numerical) summarized columns
+        nbins: number of bins of the histograms
+        k: accuracy parameter of the KLL sketches
+        sketch_factory: builds the quantile sketch of a column (see
+                        `sketches.quantile_sketch_factory`), KLL(k) by default
+    """
+
+    def __init__(
+        self,
+        columns: list[str],
+        nbins: int = NBINS,
+        k: int = KLL_K,
+        sketch_factory: Callable[[], QuantileSketch] | None = None,
+        **kwds: Any,
+    ) -> None:
+        super().__init__(**kwds)
+        self.columns = list(columns)
+        self.nbins = nbins
+        self.k = k
+        self.sketch_factory = sketch_factory or (lambda: KLLQuantiles(k))
+        self.default_step_size = 10000
+        self.reset()
+
+    def reset(self) -> None:
+        if self.result is not None:
+            self.result.clear()
+        self.sketches = {col: self.sketch_factory() for col in self.columns}
+        self.bounds: dict[str, tuple[float, float]] = {}
+        self.hists = {col: np.zeros(self.nbins, dtype="int64") for col in self.columns}
+        self.filtered_hists = {col: np.zeros(self.nbins, dtype="int64")
+                               for col in self.columns}
+        self._counts = {col: 0 for col in self.columns}
+        self._seen = PIntSet()
+
+    def sketch(self, column: str) -> ColumnSketch:
+        return ColumnSketch(self, column)
+
+    def histogram(self, column: str) -> ColumnHistogram:
+        return ColumnHistogram(self, column, filtered=False)
+
+    def filtered_histogram(self, column: str) -> ColumnHistogram:
+        return ColumnHistogram(self, column, filtered=True)
+
+    def _block(self, table: BasePTable, ids: Any) -> np.ndarray[Any, Any]:
+        "(n_columns, n_rows) float64 block"
+        return np.vstack(
+            [np.asarray(table[col].loc[ids], dtype="float64") for col in self.columns]
+        )
+
+    def _count(self, block: np.ndarray[Any, Any]) -> np.ndarray[Any, Any]:
+        "(n_columns, nbins) histograms of a block, with the current bounds"
+        n_cols = len(self.columns)
+        bounds = np.array([self.bounds.get(c, (0.0, 1.0)) for c in self.columns])
+        lo, hi = bounds[:, :1], bounds[:, 1:]
+        with np.errstate(invalid="ignore"):
+            bins = ((block - lo) * (self.nbins / (hi - lo))).astype("int64")
+        valid = np.isfinite(block)
+        np.clip(bins, 0, self.nbins - 1, out=bins)
+        flat = (bins + np.arange(n_cols)[:, None] * self.nbins)[valid]
+        return np.bincount(flat, minlength=n_cols * self.nbins).reshape(n_cols, self.nbins)
+
+    def _fit_bounds(self, block: np.ndarray[Any, Any]) -> bool:
+        "extends the bounds to the block, returns True if some bounds changed"
+        changed = False
+        with np.errstate(invalid="ignore"):
+            lows = np.nanmin(block, axis=1)
+            highs = np.nanmax(block, axis=1)
+        for col, lo, hi in zip(self.columns, lows, highs):
+            if np.isnan(lo):
+                continue
+            old = self.bounds.get(col)
+            if old is not None and lo >= old[0] and hi <= old[1]:
+                continue
+            if old is not None:
+                lo, hi = min(lo, old[0]), max(hi, old[1])
+            span = (hi - lo) or 1.0
+            self.bounds[col] = (lo - span * SPAN_MARGIN, hi + span * SPAN_MARGIN)
+            changed = True
+        return changed
+
+    def _recount(self, table: BasePTable, filtered: BasePTable | None) -> None:
+        """
+        The bounds changed: the histograms are recomputed over all the rows seen so far
+        """
+        for hists, tbl in ((self.hists, table), (self.filtered_hists, filtered)):
+            if tbl is None:
+                continue
+            counts = np.zeros((len(self.columns), self.nbins), dtype="int64")
+            rows = self._seen if tbl is table else tbl.index
+            ids = np.asarray(rows.to_array(), dtype="int64")
+            chunk = 10 * self.default_step_size
+            for start in range(0, len(ids), chunk):
+                counts += self._count(self._block(tbl, ids[start:start + chunk]))
+            for col, hist in zip(self.columns, counts):
+                hists[col] = hist
+
+    def _publish(self) -> None:
+        res: dict[str, Any] = {}
+        for col, sk in self.sketches.items():
+            if sk.is_empty():
+                continue
+            res[f"{col}_min"] = sk.get_min_value()
+            res[f"{col}_max"] = sk.get_max_value()
+            res[f"{col}_count"] = self._counts[col]
+        if self.result is None:
+            self.result = PDict(res)
+        else:
+            self.result.update(res)
+
+    def run_step(
+        self, run_number: int, step_size: int, quantum: float
+    ) -> ReturnRunStep:
+        slot = self.get_input_slot("table")
+        assert slot is not None
+        table = slot.data()
+        if table is None:
+            return self._return_run_step(self.state_blocked, steps_run=0)
+        f_slot = self.get_input_slot("filtered")
+        filtered = f_slot.data() if f_slot is not None else None
+        steps = 0
+        if slot.deleted.any() or slot.updated.any():
+            # sketches cannot forget values, restart from scratch
+            for sl in (slot, f_slot):
+                if sl is not None:
+                    sl.reset()
+                    sl.update(run_number)
+            self.reset()
+        if slot.created.any():
+            ids = fix_loc(slot.created.next(length=step_size, as_slice=False))
+            steps += indices_len(ids)
+            self._seen |= ids if isinstance(ids, PIntSet) else PIntSet(ids)
+            block = self._block(table, ids)
+            for col, values in zip(self.columns, block):
+                values = values[np.isfinite(values)]
+                if len(values):
+                    self.sketches[col].update(values)
+                self._counts[col] += len(values)
+            if self._fit_bounds(block):
+                # the rows of this chunk are counted by the recount
+                self._recount(table, filtered if f_slot is not None else None)
+                if f_slot is not None:
+                    f_slot.created.next()  # already counted
+                    f_slot.deleted.next()
+            else:
+                for col, hist in zip(self.columns, self._count(block)):
+                    self.hists[col] += hist
+        if f_slot is not None and filtered is not None and self.bounds:
+            f_slot.updated.next()
+            if f_slot.deleted.any():
+                ids = fix_loc(f_slot.deleted.next(as_slice=False))
+                steps += indices_len(ids)
+                base = filtered.base if filtered.base is not None else filtered
+                for col, hist in zip(self.columns, self._count(self._block(base, ids))):
+                    self.filtered_hists[col] -= hist
+            if f_slot.created.any():
+                ids = fix_loc(f_slot.created.next(length=step_size, as_slice=False))
+                steps += indices_len(ids)
+                for col, hist in zip(self.columns, self._count(self._block(filtered, ids))):
+                    self.filtered_hists[col] += hist
+        self._publish()
+        if slot.has_buffered() or (f_slot is not None and f_slot.has_buffered()):
+            return self._return_run_step(self.state_ready, steps)
+        return self._return_run_step(self.state_blocked, steps)
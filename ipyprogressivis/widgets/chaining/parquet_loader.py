@@ -17,8 +17,11 @@ from .utils import (
     shuffle_urls,
     relative_urls,
     modules_producer,
+    is_checked,
 )
 
+from .projection import ProjectionMixin
+from .cached_loaders import CachedParquetLoader
 from .parquet_sniffer import (
     sniffer,
     _sniffer,
@@ -64,7 +67,7 @@ def _cleanup(raw: str) -> list[str]:
 ROWS = 20
 
 
-class ParquetLoaderW(VBox):
+class ParquetLoaderW(VBox, ProjectionMixin):
 
     def btn_bar(self) -> Proxy:
         return hbox(
@@ -126,6 +129,8 @@ class ParquetLoaderW(VBox):
                     .observe(self._to_sniff_cb)
                     .uid("to_sniff"),
                     checkbox("Shuffle URLs", value=True).uid("shuffle_ck"),
+                    checkbox("Load only the columns used downstream (on replay)")
+                    .uid("pushdown_ck"),
                     int_text("Throttle:", value=0).uid("throttle"),
                     stack().uid("sniffer"),  # merged later
                     self.btn_bar(),
@@ -228,13 +233,19 @@ class ParquetLoaderW(VBox):
         throttle = self_proxy.that.throttle.widget.value
         shuffle = self_proxy.that.shuffle_ck.widget.value
         dtypes = get_dtypes(self_proxy)
-        kw = dict(urls=urls, throttle=throttle, shuffle=shuffle, dtypes=dtypes)
+        kw = dict(
+            urls=urls,
+            throttle=throttle,
+            shuffle=shuffle,
+            dtypes=dtypes,
+            pushdown=is_checked(self_proxy, "pushdown_ck"),
+        )
         if is_recording():
             amend_last_record({"frozen": kw})
         pq_module = self.init_modules(**kw)
         self.output_module = pq_module
         self.output_slot = "result"
-        self.output_dtypes = dtypes
+        self.output_dtypes = self.project(dtypes, pushdown=False)
 
     def _save_cb(self, proxy: Proxy, btn: ipw.Button) -> None:
         assert self._proxy is not None
@@ -251,7 +262,7 @@ class ParquetLoaderW(VBox):
         urls = content["urls"]
         throttle = content["throttle"]
         shuffle = content.get("shuffle", False)
-        dtypes = content["dtypes"]
+        dtypes = self.project(content["dtypes"], content.get("pushdown", False))
         pq_module = self.init_modules(
             urls=urls, throttle=throttle, shuffle=shuffle, dtypes=dtypes
         )
@@ -282,7 +293,7 @@ class ParquetLoaderW(VBox):
             filenames = pd.DataFrame({"filename": urls})
             cst = Constant(PTable("filenames", data=filenames), scheduler=s)
             cols = list(dtypes.keys())
-            pql = ParquetLoader(columns=cols, throttle=throttle, scheduler=s)
+            pql = CachedParquetLoader(columns=cols, throttle=throttle, scheduler=s)
             pql.input.filenames = cst.output[0]
             sink = Sink(scheduler=s)
             sink.input.inp = pql.output.result
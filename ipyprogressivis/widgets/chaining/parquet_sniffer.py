@@ -12,6 +12,7 @@ from ipyprogressivis.ipywel import (
     label,
 )
 from progressivis.table.dshape import ExtensionDtype
+from ipyprogressivis.block_cache import CachedFile, is_cached
 import numpy as np
 import pyarrow.parquet as pq
 from typing import Any
@@ -44,7 +45,7 @@ class ColInfo:
 
 class ParquetSniffer:
     def __init__(self, url: str) -> None:
-        pqfile = pq.ParquetFile(url)
+        pqfile = pq.ParquetFile(CachedFile(url) if is_cached(url) else url)
         schema = pqfile.schema.to_arrow_schema()
         self.names = names = schema.names
         types = [t.to_pandas_dtype() for t in schema.types]
@@ -0,0 +1,55 @@
+"""
+Projection pushdown: the loaders read only the columns consumed downstream
+"""
+from __future__ import annotations
+
+import logging
+from .utils import GuestWidget, amend_nth_record
+from .schema import project_schema
+
+logger = logging.getLogger(__name__)
+
+
+class ProjectionMixin(GuestWidget):
+    """
+    Projection pushdown for the loaders: the columns consumed by the stages
+    downstream are kept up to date in the loader record (see
+    `update_column_demand()`), so a replayed loader having the "pushdown" option
+    set reads only these columns
+    """
+    source_dtypes: dict[str, str] | None = None  # the schema before projection
+    loaded_columns: list[str] | None = None  # None: all the columns are loaded
+
+    def set_column_demand(self, demand: set[str] | None) -> None:
+        if self.source_dtypes is None:
+            return
+        columns = None
+        if demand is not None:
+            columns = list(project_schema(self.source_dtypes, list(demand))) or None
+        if columns == self.carrier.projection:
+            return
+        self.carrier.projection = columns
+        if self._record_index is not None:  # None: not recorded (replay)
+            amend_nth_record(self._record_index, {"projection": columns})
+        if self.loaded_columns is None:
+            return
+        if missing := set(columns or self.source_dtypes) - set(self.loaded_columns):
+            # the running loader cannot widen its table, the next run will
+            logger.warning(
+                "%s: columns %s not loaded, replay to load them",
+                self.title, sorted(missing)
+            )
+
+    def project(self, dtypes: dict[str, str], pushdown: bool) -> dict[str, str]:
+        """
+        Sets `dtypes` as the source schema and returns the schema to be loaded,
+        i.e. restricted to the recorded projection when `pushdown` is set
+        """
+        self.source_dtypes = dtypes
+        projection = self.carrier.projection
+        if not pushdown or projection is None:
+            self.loaded_columns = None
+            return dtypes
+        projected = project_schema(dtypes, projection)
+        self.loaded_columns = list(projected)
+        return projected
@@ -19,9 +19,9 @@ from progressivis import (
     RangeQuery2D,
     Variable,
 )
-import progressivis.core.aio as aio
 from progressivis.core.api import Sink, Module
 from ..df_grid import DataFrameGrid
+from ._filter_controller import FilterController
 from typing import Any as AnyType
 
 WidgetType = AnyType
@@ -51,6 +51,8 @@ class RangeQuery2DW(VBoxTyped):
         self._unfilter_btn = make_button(
             "Unfilter", cb=self._unfilter_btn_cb, disabled=True
         )
+        self._latency_lbl = ipw.Label("")
+        self._controller: FilterController | None = None
 
     @needs_dtypes
     def initialize(self) -> None:
@@ -106,7 +108,8 @@ class RangeQuery2DW(VBoxTyped):
         self._freeze_btn.disabled = not is_recording()
         self.child.grid.observe_col("Column", self.obs_columns)
         self.child.buttons = ipw.HBox([self._freeze_btn, self._unfreeze_btn,
-                                       self._start_btn, self._unfilter_btn])
+                                       self._start_btn, self._unfilter_btn,
+                                       self._latency_lbl])
         self.reset_buttons()
 
     def reset_buttons(self) -> None:
@@ -160,20 +163,22 @@ class RangeQuery2DW(VBoxTyped):
             slider_y.step = (max_y - min_y) / 10
             self._unfilter_btn.disabled = False
 
-        def observer(_):
-            async def _coro():
-                x_min, x_max = slider_x.value
-                y_min, y_max = slider_y.value
-                await self.var_min.from_input({col_x: x_min, col_y: y_min})
-                await self.var_max.from_input({col_x: x_max, col_y: y_max})
+        controller = self._controller
+        controller.watch(slider_x, slider_y)  # no-op after the first update
+        if not self.var_min.result and not controller.pending:
+            controller.trigger(delay=0)
 
-            aio.create_task(_coro())
+    async def _apply_sliders(self) -> None:
+        df = self.child.grid.df
+        x_min, x_max = df.loc["X", "Filter"].value
+        y_min, y_max = df.loc["Y", "Filter"].value
+        col_x = self.column_x
+        col_y = self.column_y
+        await self.var_min.from_input({col_x: x_min, col_y: y_min})
+        await self.var_max.from_input({col_x: x_max, col_y: y_max})
 
-        slider_x.observe(observer, "value")
-        slider_y.observe(observer, "value")
-        # slidex
-        if not self.var_min.result:
-            observer(slider_x)
+    def _show_latency(self, latency: float) -> None:
+        self._latency_lbl.value = f"Filter latency: {latency * 1000:.0f} ms"
 
     @modules_producer
     def init_min_max(self, ctx) -> None:
@@ -206,6 +211,9 @@ class RangeQuery2DW(VBoxTyped):
             self.output_module = query
             self.output_slot = "result"
             self.output_dtypes = self.dtypes
+            self._controller = FilterController(self._apply_sliders,
+                                                on_latency=self._show_latency)
+            self._controller.watch_result(query)
             if self.column_x:
                 self.index.on_after_run(self.grid_update)
             return query
@@ -1,10 +1,13 @@
 from .utils import make_button, VBoxTyped, TypedBase, needs_dtypes, chaining_widget
 from ..utils import historized_widget
 from ._multi_series import scatterplot_no_data
+from ._raster import IncrementalRaster
 import ipywidgets as ipw
 from ..vega import VegaWidget
+import numpy as np
 import pandas as pd
 from progressivis.core.api import Scheduler
+from progressivis.core.pintset import PIntSet
 from typing import Any as AnyType, cast, Type
 from typing_extensions import TypeAlias
 import copy
@@ -13,6 +16,7 @@ WidgetType = AnyType
 _l = ipw.Label
 
 N = 4  # 1X + 3Y
+RAW_POINTS_LIMIT = 5000  # rasterized mode shows raw points below this count
 
 
 HVegaWidget: TypeAlias = cast(Type[AnyType],
@@ -22,8 +26,11 @@ HVegaWidget: TypeAlias = cast(Type[AnyType],
 class ScatterplotW(VBoxTyped):
     class Typed(TypedBase):
         grid: ipw.GridBox
+        raster_ck: ipw.Checkbox
         btn_apply: ipw.Button
         vega: HVegaWidget
+        raster: ipw.Image
+        zoom: ipw.VBox
 
     @needs_dtypes
     def initialize(self) -> None:
@@ -38,6 +45,16 @@ class ScatterplotW(VBoxTyped):
             lst,
             layout=ipw.Layout(grid_template_columns="5% 40% 40%"),
         )
+        self.child.raster_ck = ipw.Checkbox(
+            value=False,
+            description="Rasterize (bin points server side, raw points when zoomed in)",
+            indent=False,
+        )
+        self._raster: IncrementalRaster | None = None
+        # raw points mode: the zoom window shown, the rows scanned and those inside
+        self._raw_zoom: tuple[float, float, float, float] | None = None
+        self._raw_seen = PIntSet()
+        self._raw_ids = PIntSet()
         self.child.btn_apply = self._btn_ok = make_button(
             "Apply", disabled=True, cb=self._btn_apply_cb
         )
@@ -73,6 +90,90 @@ class ScatterplotW(VBoxTyped):
         df = pd.DataFrame(df_dict)
         self.child.vega.update("data", remove="true", insert=df)
 
+    def _zoom_region(self) -> tuple[float, float, float, float] | None:
+        zx = self.child.zoom.children[0]
+        zy = self.child.zoom.children[1]
+        assert isinstance(zx, ipw.FloatRangeSlider)
+        assert isinstance(zy, ipw.FloatRangeSlider)
+        if zx.value == (zx.min, zx.max) and zy.value == (zy.min, zy.max):
+            return None
+        return (*zx.value, *zy.value)
+
+    def _sync_zoom_bounds(self) -> None:
+        assert self._raster is not None and self._raster.bounds is not None
+        x0, x1, y0, y1 = self._raster.bounds
+        for slider, (lo, hi) in zip(self.child.zoom.children, [(x0, x1), (y0, y1)]):
+            assert isinstance(slider, ipw.FloatRangeSlider)
+            if (slider.min, slider.max) == (lo, hi):
+                continue
+            full = slider.value == (slider.min, slider.max)
+            with slider.hold_trait_notifications():
+                slider.max = max(hi, slider.min)
+                slider.min = lo
+                slider.max = hi
+                slider.step = (hi - lo) / 1000
+                if full:
+                    slider.value = (lo, hi)
+
+    def _update_raster(self, s: Scheduler | None = None, run_number: int = 0,
+                       force: bool = False) -> None:
+        assert hasattr(self.input_module, "result")
+        tbl = self.input_module.result
+        if tbl is None or self._raster is None:
+            return
+        changed = self._raster.update(tbl)
+        if self._raster.bounds is None:
+            return
+        if changed:
+            self._sync_zoom_bounds()
+        zoom = self._zoom_region()
+        if zoom is not None and self._raster.count_in(zoom) <= RAW_POINTS_LIMIT:
+            self._show_raw_points(tbl, zoom)
+            return
+        self._raw_zoom = None
+        if not (changed or force) and self.child.raster.layout.display != "none":
+            return
+        self.child.raster.value = self._raster.to_png(zoom)
+        self.child.raster.layout.display = None
+        self.child.vega.layout.display = "none"
+
+    def _show_raw_points(self, tbl: AnyType,
+                         zoom: tuple[float, float, float, float]) -> None:
+        """
+        Sends the points of the zoom window, only when the window changed or
+        when new rows fall inside it (the rows already scanned are not read again)
+        """
+        index = tbl.index
+        send = zoom != self._raw_zoom or not (self._raw_seen <= index)
+        if send:
+            self._raw_zoom, self._raw_seen, self._raw_ids = zoom, PIntSet(), PIntSet()
+        new = index - self._raw_seen
+        if new:
+            ids = np.asarray(new.to_array(), dtype=np.int64)
+            x_arr = np.asarray(tbl[self._x_col].loc[ids])
+            y_arr = np.asarray(tbl[self._y_col].loc[ids])
+            x0, x1, y0, y1 = zoom
+            mask = (x_arr >= x0) & (x_arr <= x1) & (y_arr >= y0) & (y_arr <= y1)
+            if np.any(mask):
+                self._raw_ids |= PIntSet(ids[mask])
+                send = True
+            self._raw_seen |= new
+        if not send:
+            return
+        ids = np.asarray(self._raw_ids.to_array(), dtype=np.int64)
+        df_dict = {self._x_sym: np.asarray(tbl[self._x_col].loc[ids]),
+                   self._y_sym: np.asarray(tbl[self._y_col].loc[ids])}
+        if self._color_col:
+            df_dict[self._color_sym] = np.asarray(tbl[self._color_col].loc[ids])
+        if self._shape_col:
+            df_dict[self._shape_sym] = np.asarray(tbl[self._shape_col].loc[ids])
+        self.child.vega.update("data", remove="true", insert=pd.DataFrame(df_dict))
+        self.child.vega.layout.display = None
+        self.child.raster.layout.display = "none"
+
+    def _zoom_cb(self, change: dict[str, AnyType]) -> None:
+        self._update_raster(force=True)
+
     def _col_xy_cb(self, change: dict[str, AnyType]) -> None:
         self._x_col = self._axis["X"]["col"].value
         self._y_col = self._axis["Y"]["col"].value
@@ -97,5 +198,28 @@ class ScatterplotW(VBoxTyped):
             self._shape_sym = shape_sym or self._shape_col
             sc_json["encoding"]["shape"] = {"field": self._shape_sym, "type": "nominal"}
         self.child.vega = HVegaWidget(spec=sc_json)
-        self.input_module.scheduler.on_tick(self._update_vw)
+        if self.child.raster_ck.value:
+            self._raster = IncrementalRaster(
+                self._x_col, self._y_col, self._color_col or None
+            )
+            self.child.raster = ipw.Image(
+                format="png",
+                width=self._raster.width,
+                height=self._raster.height,
+            )
+            zoom_x, zoom_y = [
+                ipw.FloatRangeSlider(description=f"Zoom {axis}:",
+                                     min=0.0, max=1.0, value=(0.0, 1.0),
+                                     continuous_update=False,
+                                     layout={"width": "500px"})
+                for axis in "XY"
+            ]
+            zoom_x.observe(self._zoom_cb, "value")
+            zoom_y.observe(self._zoom_cb, "value")
+            self.child.zoom = ipw.VBox([zoom_x, zoom_y])
+            self.child.vega.layout.display = "none"
+            self.input_module.scheduler.on_tick(self._update_raster)
+        else:
+            self.input_module.scheduler.on_tick(self._update_vw)
+        self.child.raster_ck.disabled = True
         self.dag_running()
@@ -0,0 +1,125 @@
+"""
+Static schema inference: output dtypes of the stages derived from their input
+dtypes and parameters, without waiting for a module to run
+"""
+from __future__ import annotations
+
+import numpy as np
+from progressivis.table.dshape import dshape_fields
+from typing import Any, Sequence
+
+Dtypes = dict[str, str]
+
+#: dtypes of the `HashAggregate` results, by aggregate name
+AGGREGATE_DTYPES: Dtypes = {
+    "count": "int64",
+    "nunique": "int64",
+    "sum": "float64",
+    "mean": "float64",
+    "variance": "float64",
+    "stddev": "float64",
+}
+
+
+def table_dtypes(table: Any) -> Dtypes:
+    "dtypes of an existing table, as provided to the stages"
+    return {
+        k: "datetime64" if str(v)[0] == "6" else str(v)
+        for (k, v) in dshape_fields(table.dshape)
+    }
+
+
+def key_columns(by: Any) -> list[str]:
+    "input columns of the group by keys (a column, a list or a datetime subcolumn)"
+    if isinstance(by, str):
+        return [by]
+    if isinstance(by, dict):
+        return [by["col"]]
+    return list(by)
+
+
+def _row_dtype(dtype: str) -> str | None:
+    "dtype of a value stored from a python row (see `dshape_from_dict`)"
+    if dtype.startswith("int") or dtype.startswith("uint") or dtype == "bool":
+        return "int32"
+    if dtype.startswith("float"):
+        return "float64"
+    if dtype == "string":
+        return dtype
+    return None
+
+
+def aggregate_dtypes(
+    by: Any,
+    compute: Sequence[tuple[str, Any]],
+    input_dtypes: Dtypes,
+    from_rows: bool = False,
+) -> Dtypes | None:
+    """
+    Schema of a group by + aggregate result: the key columns then one
+    `{col}_{func}` column per aggregate. None if some type cannot be inferred
+    (datetime subcolumn keys, custom or approximate aggregates ...)
+
+    Args:
+        from_rows: the result table is created from a python row (`Aggregate`),
+                   all the integers being then stored as int32, else from arrays
+                   (`HashAggregate`), the keys keeping their dtype
+    """
+    if isinstance(by, str):
+        by = [by]
+    if not isinstance(by, (list, tuple)):
+        return None
+    res: Dtypes = {}
+    for col in by:
+        dtype: str | None = input_dtypes.get(col, "datetime64")
+        if from_rows:
+            dtype = _row_dtype(dtype)  # type: ignore
+        if dtype is None or dtype.startswith("datetime"):
+            return None
+        res[col] = dtype
+    for col, func in compute:
+        name = func if isinstance(func, str) else getattr(func, "name", None)
+        if name not in AGGREGATE_DTYPES:
+            return None
+        dtype = AGGREGATE_DTYPES[name]
+        res[f"{col}_{name}"] = _row_dtype(dtype) if from_rows else dtype  # type: ignore
+    return res
+
+
+def computed_dtypes(
+    columns: Sequence[str], computed: Sequence[dict[str, Any]], input_dtypes: Dtypes
+) -> Dtypes:
+    "Schema of a computed view: the kept columns then the computed ones"
+    res = {col: input_dtypes[col] for col in columns}
+    for d_ in computed:
+        dtype = str(np.dtype(d_["wg_dtype"]))
+        res[d_["wg_name"]] = "datetime64" if dtype.startswith("datetime64") else dtype
+    return res
+
+
+def join_dtypes(
+    primary_cols: Sequence[str],
+    related_cols: Sequence[str],
+    primary_dtypes: Dtypes,
+    related_dtypes: Dtypes,
+    suffix: str | None = None,
+) -> Dtypes | None:
+    """
+    Schema of a join result: the related columns then the primary ones, these
+    being renamed with `suffix` when their name is already used (None if the
+    join does not rename them)
+    """
+    res = {col: related_dtypes[col] for col in related_cols}
+    for col in primary_cols:
+        name = col
+        if col in res:
+            if suffix is None:
+                return None
+            name = f"{col}{suffix}"
+        res[name] = primary_dtypes[col]
+    return res
+
+
+def project_schema(dtypes: Dtypes, columns: Sequence[str]) -> Dtypes:
+    "Schema restricted to `columns`, in the original order"
+    return {col: dtype for (col, dtype) in dtypes.items() if col in columns}
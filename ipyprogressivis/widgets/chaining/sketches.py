@@ -0,0 +1,423 @@
+"""
+Memory bounded sketches usable as `Aggregate` functions.
+Each sketch class reads its size from the `memory` class attribute (in bytes),
+`bounded_aggregates()` provides variants built for a given budget.
+
+Quantile sketch backends (KLL, t-digest, DDSketch) sharing the KLL interface
+are built from a memory budget by `quantile_sketch_factory()`.
+"""
+from __future__ import annotations
+
+import abc
+import numpy as np
+import pandas as pd
+import datasketches as dsk
+from progressivis.stats.online import Univariate, Column, aggr_registry
+from typing import Any, Callable, Sequence, Type
+
+DEFAULT_SKETCH_MEMORY = 4096  # bytes per group and per function
+TOPK_DISPLAY = 5
+TOPK_COUNTERS = 32  # heavy hitters counters per item kept by a top k (see topk_memory)
+QUANTILE_BACKENDS = ("kll", "tdigest", "ddsketch")
+DEFAULT_KLL_K = 10000  # KLL size used when no memory budget is given
+DEFAULT_MEMORY_BUDGET = 4 * 2**20  # bytes, shared by all the columns of a stage
+MIN_COLUMN_MEMORY = 1024
+MAX_COLUMN_MEMORY = 12 * DEFAULT_KLL_K  # more does not improve the displayed quantiles
+DDSKETCH_ACCURACY = 0.01
+
+
+def _hash64(values: Any) -> np.ndarray[Any, Any]:
+    values = np.asarray(values)
+    obj = pd.DataFrame(values) if values.ndim > 1 else pd.Series(values)
+    return pd.util.hash_pandas_object(obj, index=False).to_numpy(dtype=np.uint64)
+
+
+class ApproxNUnique(Univariate):
+    """
+    HyperLogLog distinct count, registers are updated in a vectorized way
+    """
+    name = "approx_nunique"
+    memory = DEFAULT_SKETCH_MEMORY
+
+    def __init__(self) -> None:
+        self.p = int(np.clip(np.log2(self.memory), 4, 18))
+        self.m = 1 << self.p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def reset(self) -> None:
+        self.registers[:] = 0
+
+    def clone(self) -> Any:
+        return self.__class__()
+
+    def update_many(self, col: Column) -> None:
+        if not len(col):  # type: ignore
+            return
+        h = _hash64(col)
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h & np.uint64((1 << (64 - self.p)) - 1)
+        # bit_length(rest) from the binary exponent, rank of the leftmost 1-bit
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rho = (64 - self.p - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+
+    @property
+    def error(self) -> float:
+        "relative standard error"
+        return 1.04 / float(np.sqrt(self.m))
+
+    def get(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        est = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if est <= 2.5 * m and zeros:  # small range correction (linear counting)
+            est = m * float(np.log(m / zeros))
+        return float(round(est))
+
+
+class ApproxTopK(Univariate):
+    """
+    Heavy hitters (Misra-Gries / SpaceSaving family) with a bounded number of counters
+    """
+    name = "top_k"
+    memory = DEFAULT_SKETCH_MEMORY
+    _counter_size = 48  # bytes, rough cost of one counter and its item
+
+    def __init__(self) -> None:
+        self.lg_size = int(np.clip(np.log2(self.memory / self._counter_size), 3, 20))
+        self.sketch = dsk.frequent_strings_sketch(self.lg_size)
+
+    def reset(self) -> None:
+        self.sketch = dsk.frequent_strings_sketch(self.lg_size)
+
+    def clone(self) -> Any:
+        return self.__class__()
+
+    def update_many(self, col: Column) -> None:
+        self.update_counts(pd.Series(np.asarray(col).astype(str)).value_counts(sort=False))
+
+    def update_counts(self, counts: pd.Series[Any]) -> None:
+        "adds the `counts` of the items (the index)"
+        for item, count in counts.items():
+            self.sketch.update(str(item), int(count))
+
+    def items(self, k: int | None = None) -> list[tuple[str, int]]:
+        "most frequent items with their (upper bound) estimated counts"
+        res = self.sketch.get_frequent_items(dsk.frequent_items_error_type.NO_FALSE_NEGATIVES)
+        return [(item, int(est)) for (item, est, _, _) in res[:k]]
+
+    def heavy_hitters(self, k: int | None = None) -> list[tuple[str, int]]:
+        "most frequent items, only the ones surely more frequent than the error"
+        res = self.sketch.get_frequent_items(dsk.frequent_items_error_type.NO_FALSE_POSITIVES)
+        return [(item, int(est)) for (item, est, _, _) in res[:k]]
+
+    @property
+    def error(self) -> float:
+        "maximum error on any count"
+        return float(self.sketch.get_apriori_error(self.lg_size, self.sketch.total_weight))
+
+    def get(self) -> Any:
+        return ", ".join(f"{item}:{count}" for (item, count) in self.items(TOPK_DISPLAY))
+
+
+class ApproxMedian(Univariate):
+    """
+    KLL quantile sketch
+    """
+    name = "approx_median"
+    memory = DEFAULT_SKETCH_MEMORY
+    quantile = 0.5
+
+    def __init__(self) -> None:
+        # a KLL sketch retains about 3*k floats
+        self.k = int(np.clip(self.memory // 12, 8, 65535))
+        self.sketch = dsk.kll_floats_sketch(self.k)
+
+    def reset(self) -> None:
+        self.sketch = dsk.kll_floats_sketch(self.k)
+
+    def clone(self) -> Any:
+        return self.__class__()
+
+    def update_many(self, col: Column) -> None:
+        self.sketch.update(np.asarray(col, dtype=np.float32))
+
+    @property
+    def error(self) -> float:
+        "normalized rank error"
+        return float(self.sketch.normalized_rank_error(False))
+
+    def get(self) -> float:
+        if self.sketch.is_empty():
+            return float("nan")
+        return float(self.sketch.get_quantile(self.quantile))
+
+
+def topk_memory(k: int) -> int:
+    "memory of an `ApproxTopK` estimating well the counts of its `k` most frequent items"
+    return ApproxTopK._counter_size * TOPK_COUNTERS * k
+
+
+APPROX_AGGREGATES: dict[str, Type[Univariate]] = {
+    cls.name: cls for cls in (ApproxNUnique, ApproxTopK, ApproxMedian)
+}
+aggr_registry.update(APPROX_AGGREGATES)
+
+
+def bounded_aggregates(memory: int) -> dict[str, Type[Univariate]]:
+    """
+    Returns variants of the approximate aggregates using at most
+    (roughly) `memory` bytes per group
+    """
+    return {
+        name: type(cls.__name__, (cls,), dict(memory=memory))
+        for (name, cls) in APPROX_AGGREGATES.items()
+    }
+
+
+def resolve_compute(
+    compute: list[tuple[str, str]], memory: int | None
+) -> list[tuple[str, str | Type[Univariate]]]:
+    """
+    Replaces the approximate aggregate names in an `Aggregate` compute list with
+    their variants bounded to `memory` bytes (if provided)
+    """
+    if memory is None:
+        return list(compute)
+    bounded = bounded_aggregates(memory)
+    return [(col, bounded.get(fnc, fnc)) for (col, fnc) in compute]
+
+
+def error_bounds(memory: int) -> dict[str, str]:
+    """
+    Human readable error of each approximate aggregate for a given memory budget
+    """
+    aggs = {name: cls() for (name, cls) in bounded_aggregates(memory).items()}
+    nunique = aggs[ApproxNUnique.name]
+    median = aggs[ApproxMedian.name]
+    topk = aggs[ApproxTopK.name]
+    assert isinstance(nunique, ApproxNUnique) and isinstance(median, ApproxMedian)
+    assert isinstance(topk, ApproxTopK)
+    return {
+        ApproxNUnique.name: f"±{nunique.error:.1%} (std)",
+        ApproxMedian.name: f"±{median.error:.1%} rank",
+        ApproxTopK.name: f"counts ±{dsk.frequent_strings_sketch.get_epsilon_for_lg_size(topk.lg_size):.2%} of N",
+    }
+
+
+class QuantileSketch(abc.ABC):
+    """
+    Common interface of the quantile backends (the subset of `kll_floats_sketch`
+    used by the stages)
+    """
+    name = ""
+
+    @abc.abstractmethod
+    def update(self, values: np.ndarray[Any, Any]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def is_empty(self) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def get_min_value(self) -> float:
+        ...
+
+    @abc.abstractmethod
+    def get_max_value(self) -> float:
+        ...
+
+    @abc.abstractmethod
+    def get_quantile(self, rank: float) -> float:
+        ...
+
+    def get_quantiles(self, ranks: Sequence[float]) -> list[float]:
+        return [self.get_quantile(r) for r in ranks]
+
+    @property
+    @abc.abstractmethod
+    def error(self) -> str:
+        "human readable error guarantee"
+
+
+class KLLQuantiles(QuantileSketch):
+    "KLL sketch, bounded rank error"
+    name = "kll"
+
+    def __init__(self, k: int) -> None:
+        self.k = k
+        self.sketch = dsk.kll_floats_sketch(k)
+
+    def update(self, values: np.ndarray[Any, Any]) -> None:
+        self.sketch.update(np.asarray(values, dtype=np.float32))
+
+    def is_empty(self) -> bool:
+        return bool(self.sketch.is_empty())
+
+    def get_min_value(self) -> float:
+        return float(self.sketch.get_min_value())
+
+    def get_max_value(self) -> float:
+        return float(self.sketch.get_max_value())
+
+    def get_quantile(self, rank: float) -> float:
+        return float(self.sketch.get_quantile(rank))
+
+    def get_quantiles(self, ranks: Sequence[float]) -> list[float]:
+        return [float(q) for q in self.sketch.get_quantiles(list(ranks))]
+
+    @property
+    def error(self) -> str:
+        return f"±{self.sketch.normalized_rank_error(False):.2%} rank"
+
+
+class TDigestQuantiles(QuantileSketch):
+    "t-digest, accurate on the tails"
+    name = "tdigest"
+
+    def __init__(self, k: int) -> None:
+        self.k = k
+        self.sketch = dsk.tdigest_float(k)
+
+    def update(self, values: np.ndarray[Any, Any]) -> None:
+        self.sketch.update(np.asarray(values, dtype=np.float32))
+
+    def is_empty(self) -> bool:
+        return bool(self.sketch.is_empty())
+
+    def get_min_value(self) -> float:
+        return float(self.sketch.get_min_value())
+
+    def get_max_value(self) -> float:
+        return float(self.sketch.get_max_value())
+
+    def get_quantile(self, rank: float) -> float:
+        return float(self.sketch.get_quantile(rank))
+
+    @property
+    def error(self) -> str:
+        return f"compression {self.k} (no strict bound)"
+
+
+class DDSketchQuantiles(QuantileSketch):
+    """
+    DDSketch: logarithmic buckets, quantiles within a relative error
+    `relative_accuracy`. When more than `max_buckets` are needed the lowest
+    buckets (in magnitude) are collapsed.
+    """
+    name = "ddsketch"
+
+    def __init__(self, relative_accuracy: float = DDSKETCH_ACCURACY,
+                 max_buckets: int = 2048) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max(16, max_buckets // 2)  # one store per sign
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = float(np.log(self.gamma))
+        # per sign: (offset of the first bucket, counts)
+        self._stores = {s: (0, np.zeros(0, dtype=np.int64)) for s in (1, -1)}
+        self.zeros = 0
+        self.count = 0
+        self._min = np.inf
+        self._max = -np.inf
+
+    def _add(self, sign: int, values: np.ndarray[Any, Any]) -> None:
+        if not len(values):
+            return
+        keys = np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+        offset, counts = self._stores[sign]
+        lo, hi = int(keys.min()), int(keys.max())
+        if len(counts):
+            lo, hi = min(lo, offset), max(hi, offset + len(counts) - 1)
+        store = np.zeros(hi - lo + 1, dtype=np.int64)
+        if len(counts):
+            store[offset - lo: offset - lo + len(counts)] = counts
+        store += np.bincount(keys - lo, minlength=len(store))
+        if len(store) > self.max_buckets:  # collapse the lowest buckets
+            extra = len(store) - self.max_buckets
+            store[extra] += store[:extra].sum()
+            store = store[extra:]
+            lo += extra
+        self._stores[sign] = (lo, store)
+
+    def update(self, values: np.ndarray[Any, Any]) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self._min = min(self._min, float(values.min()))
+        self._max = max(self._max, float(values.max()))
+        self._add(1, values[values > 0])
+        self._add(-1, -values[values < 0])
+        self.zeros += int(np.count_nonzero(values == 0))
+
+    def is_empty(self) -> bool:
+        return self.count == 0
+
+    def get_min_value(self) -> float:
+        return self._min
+
+    def get_max_value(self) -> float:
+        return self._max
+
+    def _value(self, key: int) -> float:
+        return float(2 * self.gamma ** key / (self.gamma + 1))
+
+    def get_quantile(self, rank: float) -> float:
+        if not self.count:
+            return float("nan")
+        if rank <= 0:
+            return self._min
+        if rank >= 1:
+            return self._max
+        target = rank * (self.count - 1)
+        n_offset, n_counts = self._stores[-1]
+        n_total = int(n_counts.sum())
+        if target < n_total:  # negative values, largest magnitudes first
+            cum = np.cumsum(n_counts[::-1])
+            i = int(np.searchsorted(cum, target, side="right"))
+            return -self._value(n_offset + len(n_counts) - 1 - i)
+        target -= n_total
+        if target < self.zeros:
+            return 0.0
+        target -= self.zeros
+        p_offset, p_counts = self._stores[1]
+        cum = np.cumsum(p_counts)
+        i = min(int(np.searchsorted(cum, target, side="right")), len(p_counts) - 1)
+        return float(np.clip(self._value(p_offset + i), self._min, self._max))
+
+    @property
+    def error(self) -> str:
+        return f"±{self.relative_accuracy:.1%} relative"
+
+
+def column_memory(budget: int, n_columns: int) -> int:
+    "memory allowed to the sketch of each column for a stage budget"
+    return int(np.clip(budget // max(1, n_columns), MIN_COLUMN_MEMORY, MAX_COLUMN_MEMORY))
+
+
+def kll_k(memory: int) -> int:
+    # a KLL sketch retains about 3*k floats
+    return int(np.clip(memory // 12, 8, DEFAULT_KLL_K))
+
+
+def quantile_sketch_factory(
+    backend: str, memory: int, relative_accuracy: float = DDSKETCH_ACCURACY
+) -> Callable[[], QuantileSketch]:
+    """
+    Returns a constructor of quantile sketches of the given `backend` using
+    roughly `memory` bytes each
+    """
+    if backend == KLLQuantiles.name:
+        k = kll_k(memory)
+        return lambda: KLLQuantiles(k)
+    if backend == TDigestQuantiles.name:
+        # centroids (mean, weight) plus the buffer of pending values
+        compression = int(np.clip(memory // 64, 10, 10000))
+        return lambda: TDigestQuantiles(compression)
+    if backend == DDSketchQuantiles.name:
+        max_buckets = max(32, memory // 8)
+        return lambda: DDSketchQuantiles(relative_accuracy, max_buckets)
+    raise ValueError(f"Unknown quantile sketch backend '{backend}'")
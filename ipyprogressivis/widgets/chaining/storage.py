@@ -0,0 +1,135 @@
+"""
+Compact storage of the loaded tables: the floats are stored as float32 and,
+on demand, the low cardinality strings are dictionary encoded, the candidate
+columns being chosen from the values sampled by the sniffer.
+
+The integers are never downcast: the sampled head of a file says nothing of
+the range of the next rows (e.g. of an increasing id), and the type of a
+table column cannot be widened once created.
+
+The dictionary codes are understood by the DescStats and Group by stages
+only, the other stages see int32 codes: two loaders encode the same strings
+with unrelated codes, so encoded columns must not be joined.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from progressivis.core.utils import force_valid_id_columns, normalize_columns
+from typing import Any, Literal, cast, get_args
+
+StorageType = Literal["float32", "category"]
+STORAGE_TYPES: tuple[StorageType, ...] = get_args(StorageType)
+CATEGORY_RATIO = 0.5  # maximum unique/count ratio of the sampled strings to encode
+CODES_DTYPE = "int32"  # dtype of the dictionary codes, -1 for the missing values
+
+
+def compact_dtype(
+    sample: pd.Series[Any], dtype: str, downcast: bool = True, encode: bool = False
+) -> str | None:
+    """
+    Compact storage type of a column of type `dtype`: "float32" if `downcast`
+    and the sampled values are kept, or "category" for the low cardinality
+    strings if `encode`. None if there is none
+    """
+    values = sample.dropna()
+    if not len(values):
+        return None
+    if downcast and dtype == "float64" and pd.api.types.is_float_dtype(values.dtype):
+        arr = values.to_numpy()
+        # the shortest float32 representations give back the sampled values
+        if (arr.astype("float32").astype(str).astype("float64") == arr).all():
+            return "float32"
+        return None
+    if encode and dtype in ("string", "object") and pd.api.types.is_string_dtype(values.dtype):
+        if values.nunique() <= CATEGORY_RATIO * len(values):
+            return "category"
+    return None
+
+
+def sniffed_storage(
+    sniffer: Any, schema: dict[str, str], downcast: bool = True, encode: bool = False
+) -> dict[str, str]:
+    """
+    Compact storage types of the `schema` columns (see `compact_dtype`)
+    from the sniffer samples
+    """
+    names = sniffer.get_names()
+    norm_cols = dict(zip(names, normalize_columns(names)))
+    res = {}
+    for info in sniffer.column.values():
+        col = norm_cols.get(info.rename)
+        if col not in schema:  # not loaded
+            continue
+        if dtype := compact_dtype(info.series, schema[col], downcast, encode):
+            res[col] = dtype
+    return res
+
+
+def storage_schema(schema: dict[str, str], storage: dict[str, str]) -> dict[str, str]:
+    "the schema of the table stored with `storage`"
+    res = dict(schema)
+    for col, dtype in storage.items():
+        if col in res and dtype in STORAGE_TYPES:
+            res[col] = CODES_DTYPE if dtype == "category" else dtype
+    return res
+
+
+class Dictionary:
+    """
+    Codes of a dictionary encoded column, assigned in the order of appearance
+    of the values (-1 for the missing values)
+    """
+
+    def __init__(self) -> None:
+        self.labels: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    def _code(self, label: Any) -> int:
+        label = str(label)
+        if (code := self._codes.get(label)) is None:
+            code = self._codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def encode(self, values: pd.Series[Any]) -> np.ndarray[Any, Any]:
+        local, uniques = pd.factorize(values)
+        mapping = np.array([self._code(u) for u in uniques] + [-1], dtype=CODES_DTYPE)
+        return mapping[local]  # local -1 (missing) -> -1
+
+    def decode(self, codes: Any) -> np.ndarray[Any, Any]:
+        labels = np.array(self.labels + [""], dtype=object)
+        return labels[np.asarray(codes)]  # type: ignore
+
+
+class StorageOptimizer:
+    """
+    Chunk filter casting the columns to their compact storage type, the
+    columns being renamed first like the loaders do (`force_valid_ids`)
+
+    Args:
+        storage: the compact type of the columns (see `compact_dtype`), the
+            other types (integers of the older settings) are ignored
+    """
+
+    def __init__(self, storage: dict[str, str]) -> None:
+        self.storage: dict[str, StorageType] = {
+            col: cast(StorageType, dtype)
+            for (col, dtype) in storage.items()
+            if dtype in STORAGE_TYPES
+        }
+        self.dictionaries = {
+            col: Dictionary() for (col, dtype) in storage.items() if dtype == "category"
+        }
+
+    def __call__(self, df: pd.DataFrame) -> pd.DataFrame:
+        force_valid_id_columns(df)
+        for col, dtype in self.storage.items():
+            if col not in df.columns:  # not loaded
+                continue
+            values = df[col]
+            if dtype == "category":
+                df[col] = self.dictionaries[col].encode(values)
+            else:
+                df[col] = values.astype(dtype)
+        return df
@@ -37,7 +37,10 @@ class AfterRun(Coro):
                 return
             def _func() -> None:
                 assert self.widget is not None
-                self.widget.child.image.update(m.result)
+                if self.widget.grid_mode:
+                    self.widget.child.image.update_grid(m.result)
+                else:
+                    self.widget.child.image.update(m.result)
                 info = self.widget.child.info
                 assert info is not None
                 info.child.rows.value = len(self.widget.input_module.result)
@@ -54,6 +57,7 @@ class TSNE2DW(VBoxTyped):
         col_choice: ipw.Dropdown
         max_iter: ipw.IntText
         qual_lim: ipw.FloatText
+        grid_mode: ipw.Checkbox
         start_btn: ipw.Button
         image: ContourDensity
         info: InfoBar
@@ -62,6 +66,7 @@ class TSNE2DW(VBoxTyped):
         super().__init__()
         self.array_column: str = ""
         self._init_max_iter = 0
+        self.grid_mode = False
 
     @needs_dtypes
     def initialize(self) -> None:
@@ -89,6 +94,10 @@ class TSNE2DW(VBoxTyped):
             value=2., description="Quality to reach:", disabled=False,
             style={"description_width": "initial"},
         )
+        self.child.grid_mode = ipw.Checkbox(
+            value=False, description="Density grid (computed in the kernel)",
+            indent=False,
+        )
 
         self.child.start_btn = make_button(
             "Start", cb=self._start_btn_cb, disabled=True
@@ -107,7 +116,8 @@ class TSNE2DW(VBoxTyped):
         assert self.array_column
         params = dict(array=self.array_column,
                       max_iter=self.child.max_iter.value,
-                      qual_lim=self.child.qual_lim.value)
+                      qual_lim=self.child.qual_lim.value,
+                      grid=self.child.grid_mode.value)
         if is_recording():
             amend_last_record({"frozen": params})
         self.init_module(params)
@@ -117,6 +127,7 @@ class TSNE2DW(VBoxTyped):
         array = ctx["array"]
         self._init_max_iter = ctx["max_iter"]
         qual_lim = ctx["qual_lim"]
+        self.grid_mode = ctx.get("grid", False)
         self.child.image = ContourDensity()
         self.child.info = InfoBar()
         self.child.info.child.rows = ipw.IntText(description="Rows:")
@@ -15,7 +15,6 @@ import random
 from functools import wraps, partial
 from progressivis.table.dshape import dataframe_dshape
 from progressivis.vis import DataShape
-from progressivis.table.dshape import dshape_fields
 from progressivis.core.api import Sink, Module, Scheduler
 from progressivis.table.api import TableFacade
 from progressivis.core.utils import normalize_columns
@@ -29,6 +28,9 @@ from .. import DagWidgetController  # type: ignore
 from ..quality_visualization import QualityVisualization
 from ..psboard import PsBoard
 from ..json_editor import JsonEditor
+from .module_registry import shared_modules_kept, release_shared_modules
+from .schema import table_dtypes
+from .storage import CODES_DTYPE, Dictionary
 from ipyprogressivis.ipywel import Proxy, restore
 from pathlib import Path
 import copy
@@ -186,9 +188,12 @@ def _process_trash(b: AnyType, *, box: ipw.HBox, obj: "NodeCarrier") -> None:
             _aux(sw)  # type: ignore
 
     _aux(obj)
+    titles = {obj_.title for obj_ in objects}
+    # shared modules are kept while some other stage uses them
+    kept = shared_modules_kept(titles, obj._input_module.scheduler)
     modules: list[str] = []
     for obj_ in objects:
-        modules.extend(obj_.managed_modules)
+        modules.extend(set(obj_.managed_modules) - kept)
     with obj._input_module.scheduler as dataflow:
         deps = dataflow.collateral_damage(*modules)
     others = set()
@@ -211,6 +216,10 @@ def _process_trash(b: AnyType, *, box: ipw.HBox, obj: "NodeCarrier") -> None:
         sio.write("<li><b>Others:&nbsp;</b>")
         sio.write(" ,".join(others))
         sio.write("</li>\n")
+    if shared := kept & set().union(*[obj_.managed_modules for obj_ in objects]):
+        sio.write("<li><b>Shared (kept):&nbsp;</b>")
+        sio.write(", ".join(sorted(shared)))
+        sio.write("</li>\n")
     sio.write(end)
 
     def _cancel(b: AnyType) -> None:
@@ -227,11 +236,13 @@ def _process_trash(b: AnyType, *, box: ipw.HBox, obj: "NodeCarrier") -> None:
         if obj.parent is not None and obj in obj.parent.subwidgets:
             obj.parent.subwidgets.remove(obj)
         i = obj.children[IGUEST]._record_index  # type: ignore
-        assert i is not None
-        amend_nth_record(i, {"deleted": True})
+        if i is not None:  # None: not recorded (replay)
+            amend_nth_record(i, {"deleted": True})
         tags = [obj_.title for obj_ in objects]
         with obj._input_module.scheduler as dataflow:
             dataflow.delete_modules(*deps)
+        release_shared_modules(titles)
+        update_column_demand()
         for tag in tags:
             labcommand("progressivis:remove_tagged_cells", tag=tag)
         for obj_ in objects:
@@ -802,6 +813,17 @@ def set_dag(dag: DAGWidget) -> None:
 WidgetType = AnyType
 
 
+def get_value(proxy: Proxy, uid: str, default: AnyType = None) -> AnyType:
+    "value of the `uid` widget, `default` if absent (i.e. settings saved before it existed)"
+    wg = proxy.get_root()._registry.get(uid)
+    return default if wg is None else wg.widget.value
+
+
+def is_checked(proxy: Proxy, uid: str) -> bool:
+    "value of the `uid` checkbox, False if absent"
+    return bool(get_value(proxy, uid, False))
+
+
 def get_param(d: dict[str, list[str]], key: str, default: list[str]) -> list[str]:
     "normalized missing or null value"
     if key not in d:
@@ -1015,6 +1037,10 @@ def create_loader_widget(
     if frozen is not None:
         loader.frozen_kw = frozen
     stage = NodeCarrier(ctx, loader)
+    # no record to amend when replaying (see ProjectionMixin.set_column_demand)
+    loader._record_index = (
+        cast(int, get_last_record_index()) + 1 if is_recording() else None
+    )
     loader.add_class("progressivis_guest_widget")
     widget_numbers[key] += 1
     obj.subwidgets.append(stage)
@@ -1030,6 +1056,58 @@ def create_loader_widget(
     return stage
 
 
+def column_demand(obj: "NodeCarrier") -> set[str] | None:
+    """
+    Projection pushdown: the input columns read by the stage `obj` and, when it
+    forwards its input columns (see `GuestWidget._forwards_columns`), by its sub-stages
+
+    Returns:
+        the column names, None meaning all the columns
+    """
+    if obj.used_columns is None:
+        return None
+    demand = set(obj.used_columns)
+    if getattr(obj.children[IGUEST], "_forwards_columns", False):
+        for sw in obj.subwidgets:
+            sub = column_demand(sw)  # type: ignore
+            if sub is None:
+                return None
+            demand |= sub
+    return demand
+
+
+def column_dictionaries(obj: "NodeCarrier") -> dict[str, Dictionary]:
+    """
+    The dictionaries of the encoded columns read by the stage `obj`, kept by
+    the nearest upstream stage storing them (see `storage.StorageOptimizer`)
+    """
+    carrier = obj.parent
+    while isinstance(carrier, NodeCarrier):
+        if dictionaries := getattr(carrier.children[IGUEST], "dictionaries", None):
+            return cast(dict[str, Dictionary], dictionaries)
+        carrier = carrier.parent
+    return {}
+
+
+def update_column_demand() -> None:
+    """
+    Recomputes the columns demanded to every loader (i.e. read by its sub-stages)
+    and notifies it. Called when a stage creates its modules or is deleted
+    """
+    for obj in {id(obj_): obj_ for obj_ in widget_by_key.values()}.values():
+        loader = obj.children[IGUEST]
+        if not hasattr(loader, "set_column_demand"):
+            continue
+        demand: set[str] | None = set()
+        for sw in obj.subwidgets:
+            sub = column_demand(sw)  # type: ignore
+            if sub is None:
+                demand = None
+                break
+            demand |= sub  # type: ignore
+        loader.set_column_demand(demand or None)
+
+
 def get_widget_by_id(key: int) -> "NodeCarrier":
     return widget_by_id[key]
 
@@ -1066,7 +1144,13 @@ def replay_start_loader(
     set_parent_widget(obj)
     assert parent_widget
     add_new_loader(
-        obj, ftype, alias, frozen=frozen, number=number, markdown=kw.get("markdown", "")
+        obj,
+        ftype,
+        alias,
+        frozen=frozen,
+        number=number,
+        markdown=kw.get("markdown", ""),
+        projection=kw.get("projection"),
     )
 
 
@@ -1338,12 +1422,15 @@ def add_new_loader(
     frozen: AnyType = None,
     number: int | None = None,
     markdown: str = "",
+    projection: list[str] | None = None,
 ) -> None:
     """
-    Same tasks as `add_new_stage()` for loaders
+    Same tasks as `add_new_stage()` for loaders. `projection` holds the columns
+    consumed downstream, as recorded by a previous run (see `update_column_demand()`)
     """
     title = f"{ftype.upper()} loader"
     stage = create_loader_widget(title, ftype, alias, frozen=frozen, number=number)
+    stage.projection = projection
     n = stage.number
     end = ""
     if frozen is not None and is_replay():
@@ -1381,6 +1468,7 @@ def add_new_loader(
             alias=alias,
             frozen=frozen,
             markdown=markdown,
+            projection=projection,
         )
     )
 
@@ -1405,6 +1493,11 @@ class ChainingWidget:
         self._dag = kw["dag"]
         self.subwidgets: list[ChainingWidget] = []
         self.managed_modules: set[str] = set()
+        # input columns read by the stage, known when its modules are created by a
+        # @modules_producer, None (all the columns) until then and for the others
+        self.used_columns: Optional[set[str]] = None
+        # loaders only: columns consumed downstream (None: all)
+        self.projection: Optional[list[str]] = None
 
     def dag_register(self) -> None:
         assert self.parent is not None
@@ -1445,12 +1538,14 @@ class GuestWidget:
     _show_progress: bool = True
     _show_quality: bool = True
     _is_chainable: bool = True
+    # the output has the input columns, the sub-stages demand is then forwarded upstream
+    _forwards_columns: bool = False
 
     def __init__(self) -> None:
         self.__carrier: Union[int, ReferenceType["NodeCarrier"]] = 0
         self.frozen_kw: dict[str, Any]
         self._do_replay_next: bool = False
-        self._record_index: int = 0
+        self._record_index: int | None = 0
         self._proxy: Proxy | None = None
 
     def process_replay(self) -> None:
@@ -1487,6 +1582,16 @@ class GuestWidget:
     def input_dtypes(self) -> dict[str, str]:
         return self.carrier._dtypes
 
+    @property
+    def input_dictionaries(self) -> dict[str, Dictionary]:
+        "the dictionaries of the input columns still holding their codes"
+        dictionaries = column_dictionaries(self.carrier)
+        return {
+            col: dct
+            for (col, dct) in dictionaries.items()
+            if self.input_dtypes.get(col) == CODES_DTYPE
+        }
+
     @property
     def input_module(self) -> ModuleOrFacade:
         return self.carrier._input_module
@@ -1577,22 +1682,51 @@ class GuestWidget:
             assert hasattr(m, "result")
             if m.result is None:
                 return
-            self.output_dtypes = {
+            dtypes = {
                 k: "datetime64" if str(v)[0] == "6" else v
                 for (k, v) in m.result.items()
             }
-            if hasattr(fun, "__self__"):  # i.e. fun is a bound method
-                self_ = fun.__self__
-            else:
-                self_ = args[0]  # type: ignore
-            self_.carrier._dtypes = self.output_dtypes
-            fun(*args, **kw)
+            self._set_dtypes_then_call(dtypes, fun, args, kw)
             with m.scheduler as dataflow:
                 deps = dataflow.collateral_damage(m.name)
                 dataflow.delete_modules(*deps)
 
         return _guess2
 
+    def _set_dtypes_then_call(
+        self,
+        dtypes: dict[str, str],
+        fun: Callable[..., None],
+        args: Iterable[Any],
+        kw: dict[str, Any],
+    ) -> None:
+        self.output_dtypes = dtypes
+        if hasattr(fun, "__self__"):  # i.e. fun is a bound method
+            self_ = fun.__self__
+        else:
+            self_ = args[0]  # type: ignore
+        self_.carrier._dtypes = self.output_dtypes
+        fun(*args, **kw)
+
+    def infer_output_dtypes(self, *args: Any, **kwargs: Any) -> Optional[dict[str, str]]:
+        """
+        Static schema inference: stages whose output schema is derived from their
+        input dtypes and parameters override this method. It gets the arguments of
+        the `@modules_producer` decorated method and returns the output dtypes,
+        None meaning unknown (the schema is then probed on the output module
+        after its first run)
+        """
+        return None
+
+    def consumed_columns(self, *args: Any, **kwargs: Any) -> Optional[Iterable[str]]:
+        """
+        Projection pushdown: stages reading only some of their input columns
+        override this method. It gets the arguments of the `@modules_producer`
+        decorated method and returns these columns, None meaning all of them
+        (see `update_column_demand()`)
+        """
+        return None
+
     def compute_dtypes_then_call(
         self,
         func: Callable[..., None],
@@ -1601,7 +1735,8 @@ class GuestWidget:
     ) -> None:
         """
         When `func` (in practice `initialize()`) ask for dtypes (via @need_dtypes) this function
-        may be called (as a last resort). In order to "catch" the parent output table structure it
+        may be called (as a last resort). If the parent output table already exists, its dtypes
+        are read directly. Otherwise, in order to "catch" the parent output table structure it
         create an ephemeral module (DataShape) chained to the same parent module with an on_after_run
         callback which sets dtypes when available then call `func()` and delete the DataShape module.
 
@@ -1614,6 +1749,10 @@ class GuestWidget:
         if is_replay_batch():
             self.output_dtypes = {}
             return
+        res = getattr(self.output_module, self.output_slot, None)
+        if hasattr(res, "dshape"):  # the output table exists, no probe needed
+            self._set_dtypes_then_call(table_dtypes(res), func, args, kw)
+            return
         s = self.output_module.scheduler
         with s:
             ds = DataShape(scheduler=s)
@@ -1962,29 +2101,34 @@ def output_dtypes_proc_factory(guest: GuestWidget) -> Callable[..., AnyType]:
         res = getattr(m, guest.output_slot, None)
         if res is None:
             return
-        dtypes = {
-            k: "datetime64" if str(v)[0] == "6" else str(v)
-            for (k, v) in  dshape_fields(res.dshape)
-        }
-        guest.output_dtypes = dtypes
+        set_output_dtypes(guest, table_dtypes(res))
         for fnc in m._after_run:
             if fnc.__name__ == "dtype_proc_cb":
                 m._after_run.remove(fnc)
                 break
-        carrier = guest.carrier
-        if carrier._chain_it_btn is not None and carrier._chain_it_sel is not None and carrier._chain_it_sel.value:
-            carrier._chain_it_btn.disabled = False
-
 
     return dtype_proc_cb
 
+
+def set_output_dtypes(guest: GuestWidget, dtypes: dict[str, str]) -> None:
+    """
+    Sets the output dtypes of a stage then enables chaining (if requested)
+    """
+    guest.output_dtypes = dtypes
+    carrier = guest.carrier
+    if carrier._chain_it_btn is not None and carrier._chain_it_sel is not None and carrier._chain_it_sel.value:
+        carrier._chain_it_btn.disabled = False
+
+
 def modules_producer(to_decorate: Callable[..., AnyType]) -> Callable[..., AnyType]:
     """
     Decorator for method which create modules (usually named `init_modules()`)
-    Serves two purposes:
+    Serves three purposes:
 
     1. Determine the list of modules created by the current stage (useful on stage deletion)
-    2. Compute triggers output_dtypes_proc_factory (see above)
+    2. Record the input columns it reads (see `GuestWidget.consumed_columns()`)
+    3. Set the output dtypes, statically (see `GuestWidget.infer_output_dtypes()`)
+       or via output_dtypes_proc_factory (see above)
     """
 
     @wraps(to_decorate)
@@ -2000,8 +2144,15 @@ def modules_producer(to_decorate: Callable[..., AnyType]) -> Callable[..., AnyTy
         else:
             mods_after = set(s.modules().keys())
         self_.carrier.managed_modules = mods_after.difference(mods_before)
+        used = self_.consumed_columns(*args, **kwargs)
+        self_.carrier.used_columns = None if used is None else set(used)
+        update_column_demand()
         if ret_m is not None and self_.output_dtypes is None:
-            ret_m.on_after_run(output_dtypes_proc_factory(self_))
+            dtypes = self_.infer_output_dtypes(*args, **kwargs)
+            if dtypes is not None:
+                set_output_dtypes(self_, dtypes)
+            else:
+                ret_m.on_after_run(output_dtypes_proc_factory(self_))
         return ret_m
 
     return _wrapper
@@ -1,14 +1,21 @@
 # type: ignore
 
+import numpy as np
 import ipywidgets as widgets
-from traitlets import Unicode
+from traitlets import Unicode, Any
 from .. _frontend import NPM_PACKAGE, NPM_PACKAGE_RANGE
 
 from ipytablewidgets import (serialization,
                              SourceAdapter,
                              PandasAdapter,
+                             NumpyAdapter,
                              TableType)
 
+GRID_SIZE = 128
+N_LEVELS = 20
+BANDWIDTH = 1.5  # gaussian smoothing, in grid cells
+SAMPLE_BUDGET = 1000
+
 class ProgressiVisAdapter(SourceAdapter):
     """
     Actually this adapter requires a dict of ndarrays
@@ -36,6 +43,74 @@ class ProgressiVisAdapter(SourceAdapter):
         return self._source.equals(other)
 
 
+def _gaussian_blur(grid, sigma):
+    radius = max(1, int(3 * sigma))
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    kernel /= kernel.sum()
+    for axis in (0, 1):
+        grid = np.apply_along_axis(np.convolve, axis, grid, kernel, mode="same")
+    return grid
+
+
+class DensityGrid:
+    """
+    Kernel side density of a 2D embedding: points are binned on a
+    `size` x `size` grid, smoothed, and the contour levels are computed here,
+    so only the grid and a bounded sample of the points are sent to the browser.
+    The sampled rows are kept between updates to avoid flickering.
+    """
+
+    def __init__(self, size=GRID_SIZE, bandwidth=BANDWIDTH, n_levels=N_LEVELS,
+                 sample_budget=SAMPLE_BUDGET, seed=None):
+        self.size = size
+        self.bandwidth = bandwidth
+        self.n_levels = n_levels
+        self.sample_budget = sample_budget
+        self._rng = np.random.default_rng(seed)
+        self._sample = np.empty(0, dtype="int64")
+        self._n_rows = 0
+
+    def _update_sample(self, n_rows):
+        if n_rows < self._n_rows:  # the table shrank
+            self._sample = self._sample[self._sample < n_rows]
+        missing = self.sample_budget - len(self._sample)
+        if missing > 0 and n_rows > self._n_rows:
+            candidates = np.setdiff1d(np.arange(n_rows), self._sample)
+            picked = self._rng.choice(candidates, min(missing, len(candidates)),
+                                      replace=False)
+            self._sample = np.sort(np.concatenate([self._sample, picked]))
+        self._n_rows = n_rows
+        return self._sample
+
+    def update(self, x, y):
+        """
+        Returns the smoothed grid (`size` x `size`, row major on y),
+        the extent, the contour levels and the sampled points
+        """
+        x = np.asarray(x, dtype="float64")
+        y = np.asarray(y, dtype="float64")
+        ok = np.isfinite(x) & np.isfinite(y)
+        x, y = x[ok], y[ok]
+        size = self.size
+        if not len(x):
+            extent = [0.0, 1.0, 0.0, 1.0]
+            grid = np.zeros((size, size))
+        else:
+            x0, x1, y0, y1 = x.min(), x.max(), y.min(), y.max()
+            x1 = x1 if x1 > x0 else x0 + 1.0
+            y1 = y1 if y1 > y0 else y0 + 1.0
+            extent = [float(x0), float(x1), float(y0), float(y1)]
+            ix = np.minimum(((x - x0) / (x1 - x0) * size).astype("int64"), size - 1)
+            iy = np.minimum(((y - y0) / (y1 - y0) * size).astype("int64"), size - 1)
+            grid = np.bincount(iy * size + ix, minlength=size * size).reshape(size, size)
+            grid = _gaussian_blur(grid.astype("float64"), self.bandwidth)
+        top = float(grid.max())
+        levels = (np.linspace(0, top, self.n_levels + 1)[1:].tolist() if top > 0 else [])
+        sample = self._update_sample(len(x))
+        return dict(grid=grid.astype("float32"), extent=extent, levels=levels,
+                    sample_x=x[sample], sample_y=y[sample], count=len(x))
+
+
 @widgets.register
 class ContourDensity(widgets.DOMWidget):
     """Contour density"""
@@ -60,6 +135,10 @@ class ContourDensity(widgets.DOMWidget):
     #data = Any("{}").tag(sync=True)
     compression = None
     _df = TableType(None).tag(sync=True, **serialization)
+    # density grid mode: the grid is computed in the kernel
+    _grid = TableType(None).tag(sync=True, **serialization)
+    _points = TableType(None).tag(sync=True, **serialization)
+    _grid_info = Any({}).tag(sync=True)
     # hack to save image in notebooks
     _img_url = Unicode('null').tag(sync=True)
 
@@ -72,3 +151,22 @@ class ContourDensity(widgets.DOMWidget):
             self._df = df
         self._df.touch()
 
+
+    def update_grid(self, df, x_col=None, y_col=None):
+        """
+        Density grid mode: sends the kernel computed density grid, its contour
+        levels and a bounded points sample instead of the whole table
+        """
+        if not hasattr(self, "_density"):
+            self._density = DensityGrid()
+        x_col = x_col or df.columns[0]
+        y_col = y_col or df.columns[1]
+        res = self._density.update(df[x_col].values, df[y_col].values)
+        self._grid = NumpyAdapter(dict(density=res["grid"]), touch_mode=True)
+        self._grid.touch()
+        self._points = NumpyAdapter(dict(x=res["sample_x"], y=res["sample_y"]),
+                                    touch_mode=True)
+        self._points.touch()
+        # set last, it triggers the drawing
+        self._grid_info = dict(extent=res["extent"], levels=res["levels"],
+                               shape=list(res["grid"].shape), count=res["count"])
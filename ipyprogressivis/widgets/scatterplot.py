@@ -4,7 +4,9 @@ from __future__ import annotations
 import ipywidgets as widgets
 from ipytablewidgets import (serialization,  # type: ignore
                              NumpyAdapter, TableType)
-from traitlets import Unicode, Any, Bool  # type: ignore
+from traitlets import Unicode, Any, Bool, List  # type: ignore
+import hashlib
+import numpy as np
 from progressivis.core.api import JSONEncoderNp as JS, asynchronize
 import progressivis.core.aio as aio
 from .. _frontend import NPM_PACKAGE, NPM_PACKAGE_RANGE
@@ -16,6 +18,32 @@ if TYPE_CHECKING:
 WidgetType = AnyType
 
 DISPLAY_RATE = 2
+DEFAULT_COMPRESSION = "lz4"
+
+
+def _digest(arr: np.ndarray[AnyType, AnyType]) -> bytes:
+    return hashlib.blake2b(
+        np.ascontiguousarray(arr).tobytes(), digest_size=16,
+        person=str(arr.shape).encode()[:16]
+    ).digest()
+
+
+def compact_histogram(arr: np.ndarray[AnyType, AnyType]) -> np.ndarray[AnyType, AnyType]:
+    """
+    Lossless downcast of a histogram holding counts to the smallest
+    unsigned type able to represent it, other histograms are sent as float32
+    """
+    if not arr.size:
+        return arr
+    if np.issubdtype(arr.dtype, np.floating) and not np.array_equal(arr, np.rint(arr)):
+        return arr.astype(np.float32)
+    top = arr.max()
+    if arr.min() < 0:
+        return arr.astype(np.float32)
+    for dt in (np.uint8, np.uint16, np.uint32):
+        if top <= np.iinfo(dt).max:
+            return arr.astype(dt)
+    return arr.astype(np.float32)
 
 
 
@@ -40,7 +68,6 @@ class Scatterplot(widgets.DOMWidget):
     # Version of the front-end module containing widget model
     _model_module_version = Unicode(NPM_PACKAGE_RANGE).tag(sync=True)
 
-    compression = None
     histograms = TableType(None).tag(sync=True, **serialization)
     samples = TableType(None).tag(sync=True, **serialization)
     data = Unicode("{}").tag(sync=True)
@@ -49,36 +76,95 @@ class Scatterplot(widgets.DOMWidget):
     move_point = Any("{}").tag(sync=True)
     modal = Bool(False).tag(sync=True)
     to_hide = Any([]).tag(sync=True)
+    # codecs the frontend is able to decode, set by the view when rendered
+    _codecs: list[str] = List([]).tag(sync=True)
     display_counter = 0
 
-    def __init__(self, *, enable_centroids: bool = False, **kw: AnyType) -> None:
+    def __init__(self, *, enable_centroids: bool = False,
+                 compression: str | None = DEFAULT_COMPRESSION,
+                 compact: bool = True, **kw: AnyType) -> None:
+        """
+        Args:
+            compression: codec ("lz4" or "zlib") used for histograms and samples
+                         when the frontend supports it, None disables compression
+            compact: send the histograms with the smallest lossless dtype
+        """
         super().__init__(**kw)
         if not enable_centroids:
             self.to_hide = cast(Any, ["init_centroids_view_"])
+        self.requested_compression = compression
+        self.compact = compact
+        self._hist_digests: dict[str, bytes] = {}
+        self._samples_digest: bytes | None = None
+        self.on_msg(self._handle_frontend_msg)
+
+    def _handle_frontend_msg(self, _wg: AnyType, content: AnyType,
+                             buffers: AnyType) -> None:
+        if isinstance(content, dict) and content.get("event") == "rendered":
+            # a new view (or a reloaded page) knows nothing about the previous updates
+            self.resend_all()
+
+    @property
+    def compression(self) -> str | None:  # read by the ipytablewidgets serializer
+        if self.requested_compression in self._codecs:
+            return self.requested_compression
+        return None
+
+    def resend_all(self) -> None:
+        "forgets the change detection state, the next update sends everything"
+        self._hist_digests = {}
+        self._samples_digest = None
+
+    @staticmethod
+    def _touched_adapter(arrays: dict[str, AnyType]) -> NumpyAdapter:
+        # change detection is done with digests, the (column wise) equality test
+        # of TableType is bypassed by touching the adapter
+        adapter = NumpyAdapter(arrays, touch_mode=True)
+        adapter.touch()
+        return adapter
+
+    def update_from_json(self, val: dict[str, AnyType]) -> None:
+        """
+        Sends a `MCScatterPlot.to_json()` result to the frontend.
+        Only the class histograms which changed since the previous call are sent,
+        the view keeps the others. Samples are sent only when they changed.
+        """
+        data_ = {
+            k: v
+            for (k, v) in val.items()
+            if k not in ("hist_tensor", "sample_tensor")
+        }
+        ht = val.get("hist_tensor")
+        if ht is not None:
+            if len(ht) != len(self._hist_digests):
+                self._hist_digests = {}
+            arrays = dict()
+            for i, arr in enumerate(ht):
+                name = f"hist_{i}"
+                digest = _digest(arr)
+                if self._hist_digests.get(name) == digest:
+                    continue
+                self._hist_digests[name] = digest
+                arrays[name] = compact_histogram(arr) if self.compact else arr
+            if arrays:
+                self.histograms = self._touched_adapter(arrays)
+        st = val.get("sample_tensor")
+        if st is not None:
+            samples_hash = hashlib.blake2b(digest_size=16)
+            for vec in st:
+                samples_hash.update(_digest(np.asarray(vec)))
+            if samples_hash.digest() != self._samples_digest:
+                self._samples_digest = samples_hash.digest()
+                vectors = {f"v{i}": vec for (i, vec) in enumerate(st)}
+                self.samples = self._touched_adapter(vectors)
+        self.data = JS.dumps(data_)
 
 
     def link_module(
         self, module: MCScatterPlot, refresh: bool = True
     ) -> Callable[[], None]:  # -> List[Coroutine[Any, Any, None]]:
         def _feed_widget(wg: WidgetType, m: MCScatterPlot) -> None:
-            val = m.to_json()
-            data_ = {
-                k: v
-                for (k, v) in val.items()
-                if k not in ("hist_tensor", "sample_tensor")
-            }
-            ht = val.get("hist_tensor")
-            arrays = dict()
-            if ht is not None:
-                for i, arr in enumerate(ht):
-                    arrays[f"hist_{i}"] = arr
-                wg.histograms = NumpyAdapter(arrays, touch_mode=False)
-            st = val.get("sample_tensor", None)
-            if st is not None:
-                vectors = {f"v{i}": vec for (i, vec) in enumerate(st)}
-                wg.samples = NumpyAdapter(vectors, touch_mode=False)
-
-            wg.data = JS.dumps(data_)
+            wg.update_from_json(m.to_json())
 
         async def _after_run(
             m: Module, run_number: int
@@ -111,6 +197,7 @@ class Scatterplot(widgets.DOMWidget):
 
         self.observe(from_input_move_point, "move_point")
         def feed() -> None:
+            self.resend_all()
             aio.create_task(asynchronize(_feed_widget, self, module))
 
         def awake(_val: Any) -> None:
@@ -118,6 +205,7 @@ class Scatterplot(widgets.DOMWidget):
                 return
             dummy = module._json_cache.get("dummy", 555)
             module._json_cache["dummy"] = -dummy
+            self.resend_all()
             aio.create_task(asynchronize(_feed_widget, self, module))  # TODO: improve
 
         self.observe(awake, "modal")
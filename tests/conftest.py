@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+import progressivis.core.aio as aio
+from progressivis.core.api import Module, Scheduler, Sink
+from progressivis.table.api import Constant, PTable
+from typing import Any, Callable
+
+
+@pytest.fixture
+def run_module() -> Callable[..., Module]:
+    """
+    Runs until termination a module fed by constant tables, the `inputs` being
+    the dataframes of its input slots
+    """
+
+    def _run(
+        factory: Callable[[Scheduler], Module], **inputs: pd.DataFrame
+    ) -> Any:
+        s = Scheduler()
+        with s:
+            mod = factory(s)
+            for slot, df in inputs.items():
+                cst = Constant(PTable(f"t_{slot}", data=df, create=True), scheduler=s)
+                setattr(mod.input, slot, cst.output.result)
+            sink = Sink(scheduler=s)
+            sink.input.inp = mod.output.result
+        aio.run(s.start())
+        return mod
+
+    return _run
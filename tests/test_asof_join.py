@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from progressivis.core.api import Scheduler
+from progressivis.core.pintset import PIntSet
+from progressivis.table.api import PTable
+from ipyprogressivis.widgets.chaining.asof_join import ROW_BATCH, AsofJoin
+
+
+def _asof(run_module, primary, related, tolerance=None):
+    mod = run_module(
+        lambda s: AsofJoin(
+            primary_on="t",
+            related_on="t",
+            primary_cols=["v"],
+            related_cols=["t", "w"],
+            tolerance=tolerance,
+            scheduler=s,
+        ),
+        primary=primary,
+        related=related,
+    )
+    return mod, mod.result.to_df()
+
+
+def test_duplicate_matches(run_module):
+    # many related rows match the same primary row
+    primary = pd.DataFrame({"t": [0, 10, 20], "v": [1.0, 2.0, 3.0]})
+    related = pd.DataFrame({"t": [1, 2, 3, 11, 12, 25], "w": np.arange(6)})
+    _, res = _asof(run_module, primary, related)
+    expected = pd.merge_asof(related, primary, on="t")
+    assert list(res["v"]) == list(expected["v"])
+    assert list(res["w"]) == list(expected["w"])
+
+
+def test_tolerance(run_module):
+    primary = pd.DataFrame({"t": np.arange(0, 1000, 10), "v": np.arange(100.0)})
+    related = pd.DataFrame({"t": np.arange(3, 1000, 7), "w": np.arange(143)})
+    for tolerance in (5, 500):
+        mod, res = _asof(run_module, primary, related, tolerance=tolerance)
+        expected = pd.merge_asof(related, primary, on="t", tolerance=tolerance)
+        expected = expected.dropna()
+        assert list(res["w"]) == list(expected["w"])
+        assert list(res["v"]) == list(expected["v"])
+        # only the last primary row can still match, whatever the tolerance
+        assert mod.window_size == 1
+
+
+def test_batches(run_module):
+    # more pending rows than a batch, the primary stream being still open
+    n = 2 * ROW_BATCH + 500
+    primary_df = pd.DataFrame({"t": [0, 10 * n], "v": [1.0, 2.0]})
+    related_df = pd.DataFrame({"t": np.arange(1, n + 1), "w": np.arange(n)})
+    primary = PTable("asof_primary", data=primary_df, create=True)
+    related = PTable("asof_related", data=related_df, create=True)
+    mod = AsofJoin(primary_on="t", related_on="t", primary_cols=["v"],
+                   related_cols=["t", "w"], scheduler=Scheduler())
+    mod.result = PTable("asof_res", dshape="{t: int64, w: int64, v: float64}", create=True)
+    mod._add_primary(primary, PIntSet(range(2)))
+    mod._pending = PIntSet(range(n))
+    batches = []
+    while True:
+        matched, more = mod._match(related, primary, flush=False)
+        batches.append(matched)
+        if not more:
+            break
+    assert batches == [ROW_BATCH, ROW_BATCH, 500]
+    assert mod.pending_size == 0
+    assert list(mod.result.to_df()["w"]) == list(range(n))
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+from ipyprogressivis.block_cache import BlockCache, CacheSettings, CachedFile
+
+
+@pytest.fixture
+def remote(tmp_path):
+    "a file read through an fsspec url, like the remote ones"
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)) * 1000)
+    return path
+
+
+def _cache(tmp_path, **kw):
+    kw = dict(dict(block_size=4096, read_ahead=2), **kw)
+    return BlockCache(CacheSettings(directory=str(tmp_path / "cache"), **kw))
+
+
+def test_read_and_seek(tmp_path, remote):
+    data = remote.read_bytes()
+    f = CachedFile(f"file://{remote}", cache=_cache(tmp_path))
+    assert f.size() == len(data)
+    assert f.read(10000) == data[:10000]
+    f.seek(-100, os.SEEK_END)
+    assert f.read() == data[-100:]
+    f.seek(5000)
+    assert f.tell() == 5000 and f.read(3000) == data[5000:8000]
+
+
+def test_offline(tmp_path, remote):
+    url = f"file://{remote}"
+    data = remote.read_bytes()
+    assert CachedFile(url, cache=_cache(tmp_path)).read() == data
+    remote.unlink()
+    # the cached blocks and the manifest are enough
+    assert CachedFile(url, cache=_cache(tmp_path, offline=True)).read() == data
+    with pytest.raises(FileNotFoundError):
+        CachedFile(f"file://{tmp_path}/other.bin", cache=_cache(tmp_path, offline=True))
+
+
+def test_changed_file(tmp_path, remote):
+    url = f"file://{remote}"
+    cache = _cache(tmp_path)
+    assert CachedFile(url, cache=cache).read(10) == bytes(range(10))
+    remote.write_bytes(b"changed" * 1000)
+    os.utime(remote, (1, 1))  # another version
+    assert CachedFile(url, cache=cache).read(7) == b"changed"
+
+
+def test_eviction(tmp_path, remote):
+    cache = _cache(tmp_path, max_size=5 * 4096, read_ahead=0)
+    data = CachedFile(f"file://{remote}", cache=cache).read()
+    assert data == remote.read_bytes()
+    sizes = [os.path.getsize(os.path.join(root, name))
+             for root, _, files in os.walk(cache.directory)
+             for name in files if len(name) == 64]
+    assert len(sizes) == 5 and sum(sizes) <= 5 * 4096
+    # the cached size is restored from the directory
+    assert _cache(tmp_path, max_size=5 * 4096)._size == sum(sizes)
@@ -0,0 +1,45 @@
+import pandas as pd
+from ipyprogressivis.widgets.chaining import block_csv_loader
+from ipyprogressivis.widgets.chaining.block_csv_loader import RandomBlockCSVLoader, _Source
+
+
+def test_random_blocks(run_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(block_csv_loader, "MAX_OPEN_FILES", 3)
+    urls = []
+    for i in range(10):
+        df = pd.DataFrame({"f": i, "x": range(i * 1000, (i + 1) * 1000)})
+        path = tmp_path / f"part{i}.csv"
+        df.to_csv(path, index=False)
+        urls.append(str(path))
+    sources: list[_Source] = []
+    max_open = 0
+    open_ = _Source.open
+
+    def _open(self: _Source) -> None:
+        nonlocal max_open
+        sources.append(self)
+        open_(self)
+        max_open = max(max_open, sum(src.file is not None for src in set(sources)))
+
+    monkeypatch.setattr(_Source, "open", _open)
+    mod = run_module(
+        lambda s: RandomBlockCSVLoader(block_size=1024, seed=0, scheduler=s),
+        filenames=pd.DataFrame({"filename": urls}),
+    )
+    res = mod.result.to_df()
+    assert sorted(res["x"]) == list(range(10000))
+    assert len(set(sources)) == 10 and max_open == 3
+    # closed after their last block
+    assert all(src.file is None for src in mod._sources) and not mod._open
+    # the rows arriving first come from many files
+    assert res["f"][:1000].nunique() > 3
+
+
+def test_random_access(tmp_path, monkeypatch):
+    path = tmp_path / "data.csv"
+    path.write_text("a\n1\n")
+    assert block_csv_loader.has_random_access(str(path))
+    assert not block_csv_loader.has_random_access(str(tmp_path / "data.csv.gz"))
+    # e.g. a HTTP server without Content-Length
+    monkeypatch.setattr(block_csv_loader, "file_size", lambda url: None)
+    assert not block_csv_loader.has_random_access(str(path))
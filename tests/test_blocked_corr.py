@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+from ipyprogressivis.widgets.chaining.blocked_corr import BlockedCorr
+
+
+def test_corr(run_module):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(30000, 5)), columns=list("abcde"))
+    df["f"] = df["a"] * 2 + rng.normal(size=len(df))
+    mod = run_module(
+        lambda s: BlockedCorr(columns=list(df.columns), tile_size=2, scheduler=s),
+        table=df,
+    )
+    expected = df.corr()
+    for (x, y), val in mod.result.items():
+        assert abs(val - expected.loc[x, y]) < 1e-6
+    assert len(mod.result) == 6 * 7 // 2
+    assert mod._pool is None  # shut down when the module ends
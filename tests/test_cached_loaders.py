@@ -0,0 +1,29 @@
+import lzma
+
+import pandas as pd
+from ipyprogressivis.widgets.chaining import cached_loaders
+from ipyprogressivis.widgets.chaining.cached_loaders import PrefetchingCSVLoader
+
+
+def test_prefetched_sequential_codec(run_module, tmp_path, monkeypatch):
+    # xz has no parallel decoder, the prefetched bytes are decompressed as is
+    urls = []
+    for i in range(3):
+        df = pd.DataFrame({"f": i, "x": range(i * 100, (i + 1) * 100)})
+        path = tmp_path / f"part{i}.csv.xz"
+        path.write_bytes(lzma.compress(df.to_csv(index=False).encode()))
+        urls.append(str(path))
+    opened = []
+    open_url = cached_loaders.open_url
+
+    def _open_url(url, *args, **kwds):
+        opened.append(url)
+        return open_url(url, *args, **kwds)
+
+    monkeypatch.setattr(cached_loaders, "open_url", _open_url)
+    mod = run_module(
+        lambda s: PrefetchingCSVLoader(prefetch=2, compression="infer", scheduler=s),
+        filenames=pd.DataFrame({"filename": urls}),
+    )
+    assert sorted(mod.result.to_df()["x"]) == list(range(300))
+    assert sorted(opened) == urls  # every file read once, by the prefetcher
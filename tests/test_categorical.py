@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from ipyprogressivis.widgets.chaining.categorical import OTHER_LABEL, TopKHistogram
+from ipyprogressivis.widgets.chaining.storage import Dictionary
+
+
+def _values() -> np.ndarray:
+    # 5 frequent values over a noise of 300 values
+    rng = np.random.default_rng(0)
+    values = np.concatenate([
+        rng.integers(5, 300, 200000),
+        np.repeat(np.arange(5), [9000, 8000, 7000, 6000, 5000]),
+    ])
+    return rng.permutation(values)
+
+
+def test_top_k(run_module):
+    df = pd.DataFrame({"v": _values().astype(str).astype(object)})
+    mod = run_module(lambda s: TopKHistogram(column="v", k=5, scheduler=s), table=df)
+    res = dict(mod.result)
+    assert set(res) == {"0", "1", "2", "3", "4", OTHER_LABEL}
+    assert sum(res.values()) <= len(df) + 5 * mod.topk.error
+
+
+def test_top_k_codes(run_module):
+    values = _values()
+    dictionary = Dictionary()
+    df = pd.DataFrame({"v": dictionary.encode(pd.Series([f"c{v}" for v in values]))})
+    mod = run_module(
+        lambda s: TopKHistogram(column="v", k=3, dictionary=dictionary, scheduler=s),
+        table=df,
+    )
+    res = dict(mod.result)
+    # k named values, the last ones being ranked within the sketch error
+    assert len(res) == 4 and {"c0", "c1", OTHER_LABEL} <= set(res)
+    assert 0 <= res["c0"] - np.count_nonzero(values == 0) <= mod.topk.error
@@ -0,0 +1,70 @@
+import bz2
+import gzip
+
+import numpy as np
+import pytest
+from ipyprogressivis.block_cache import SETTINGS, configure_cache
+from ipyprogressivis.decompress import (
+    PARALLEL_CODECS,
+    DecompressedFile,
+    load_gzip_index,
+    open_decompressed,
+)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    old = SETTINGS.directory
+    configure_cache(directory=str(tmp_path / "cache"))
+    yield tmp_path
+    configure_cache(directory=old)
+
+
+def _csv(n: int = 400_000) -> bytes:
+    rng = np.random.default_rng(0)
+    rows = [f"{i},{x:.6f}\n" for i, x in enumerate(rng.random(n))]
+    return ("i,x\n" + "".join(rows)).encode()
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "bz2":
+        return bz2.compress(data, 1)  # 100k blocks
+    if compression == "gzip":  # several members, like bgzip
+        step = 1 << 19
+        return b"".join(gzip.compress(data[i: i + step]) for i in range(0, len(data), step))
+    import zstandard
+
+    step = 1 << 19
+    cctx = zstandard.ZstdCompressor()
+    return b"".join(cctx.compress(data[i: i + step]) for i in range(0, len(data), step))
+
+
+def _read(f: DecompressedFile) -> tuple[bytes, list[int]]:
+    "the content of `f` and its positions after each read"
+    chunks, positions = [], []
+    while chunk := f.read(1 << 16):
+        chunks.append(chunk)
+        positions.append(f.tell())
+    return b"".join(chunks), positions
+
+
+@pytest.mark.parametrize("compression", sorted(PARALLEL_CODECS))
+def test_content_and_progress(cache_dir, compression):
+    data = _csv()
+    path = cache_dir / f"data.csv.{compression}"
+    path.write_bytes(_compress(data, compression))
+    size = path.stat().st_size
+    for _ in range(2):  # gzip: sequential then indexed
+        f = open_decompressed(str(path), compression, workers=4)
+        content, positions = _read(f)
+        f.close()
+        assert content == data
+        # the progress is measured in compressed bytes, like the total size
+        assert f.size() == size
+        assert positions == sorted(positions)
+        assert 0 < positions[0] < size  # more than one compressed chunk
+        assert positions[-1] == size
+    if compression == "gzip":
+        index = load_gzip_index(f"{path}:{size}:{path.stat().st_mtime}")
+        assert index is not None and index[-1] == (size, len(data))
+
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import progressivis.core.aio as aio
+from progressivis.core.api import Scheduler, Sink
+from progressivis.table.api import Constant, PTable
+from ipyprogressivis.widgets.chaining.fused_stats import FusedStats
+
+DF = pd.DataFrame({"a": np.arange(100.0), "b": np.arange(100.0) * 2, "c": -np.arange(100.0)})
+
+
+def test_stats(run_module):
+    mod = run_module(lambda s: FusedStats(columns=["a", "b"], scheduler=s), table=DF)
+    assert mod.get_stat("a", "min") == 0.0
+    assert mod.get_stat("b", "max") == 198.0
+    assert np.isclose(mod.get_stat("a", "mean"), DF["a"].mean())
+    assert np.isclose(mod.get_stat("b", "var"), DF["b"].var(ddof=0))
+    assert mod.result["a_count"] == 100
+
+
+def test_set_columns():
+    s = Scheduler()
+    with s:
+        cst = Constant(PTable("t_fused", data=DF, create=True), scheduler=s)
+        mod = FusedStats(columns=["a"], scheduler=s)
+        mod.input.table = cst.output.result
+        sink = Sink(scheduler=s)
+        sink.input.inp = mod.output.result
+    aio.run(s.start())
+    # the cells are read before the module runs again
+    mod.set_columns(["c", "a", "b"])
+    for col in ("a", "b", "c"):
+        assert mod.get_stat(col, "min") is None
+    mod._publish()
+    assert mod.result["c_count"] == 0
+    mod.set_columns(["b"])
+    assert "c_count" not in mod.result
+    assert mod.get_stat("b", "max") is None
+    assert mod.loc["b", "max"].result is None
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from ipyprogressivis.widgets.chaining.hash_aggregate import HashAggregate
+
+
+def test_string_keys(run_module):
+    # the later chunks bring new groups, appended to the result
+    boroughs = np.array(["Bronx", "Queens", "Manhattan", "Staten Island", "Brooklyn"])
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "boro": np.concatenate([boroughs[rng.integers(0, 2, 3000)],
+                                    boroughs[rng.integers(0, 5, 3000)]]).astype(object),
+            "fare": rng.random(6000),
+        }
+    )
+    mod = run_module(
+        lambda s: HashAggregate(
+            by="boro", compute=[("", "count"), ("fare", "sum")], scheduler=s
+        ),
+        table=df,
+    )
+    res = mod.result.to_df().set_index("boro").sort_index()
+    expected = df.groupby("boro")["fare"].agg(["count", "sum"])
+    assert list(res.index) == list(expected.index)
+    assert list(res["_count"]) == list(expected["count"])
+    assert np.allclose(res["fare_sum"], expected["sum"])
+
+
+def test_multi_keys(run_module):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(
+        {
+            "vendor": np.array(["a", "b", "c"])[rng.integers(0, 3, 5000)].astype(object),
+            "n": rng.integers(0, 4, 5000),
+            "x": rng.random(5000),
+        }
+    )
+    mod = run_module(
+        lambda s: HashAggregate(by=["vendor", "n"], compute=[("x", "mean")], scheduler=s),
+        table=df,
+    )
+    res = mod.result.to_df().set_index(["vendor", "n"]).sort_index()
+    expected = df.groupby(["vendor", "n"])["x"].mean()
+    assert list(res.index) == list(expected.index)
+    assert np.allclose(res["x_mean"], expected)
+
+
+def test_missing_keys(run_module):
+    df = pd.DataFrame(
+        {
+            "k": [1.0, np.nan, 2.0, 2.0, np.nan, 1.0] * 2000,
+            "name": ["a", None, "b", "b", "a", None] * 2000,
+            "x": [1.0, 10.0, 2.0, 20.0, 100.0, 3.0] * 2000,
+        }
+    )
+    df["name"] = df["name"].astype(object)
+    mod = run_module(
+        lambda s: HashAggregate(by="k", compute=[("", "count"), ("x", "sum")], scheduler=s),
+        table=df,
+    )
+    res = mod.result.to_df()
+    assert len(res) == 3
+    missing = res[res["k"].isna()]
+    assert list(missing["_count"]) == [4000]
+    assert list(missing["x_sum"]) == [110.0 * 2000]
+    assert list(res[res["k"] == 2.0]["_count"]) == [4000]
+    mod = run_module(
+        lambda s: HashAggregate(by=["k", "name"], compute=[("", "count")], scheduler=s),
+        table=df,
+    )
+    res = mod.result.to_df()
+    expected = df.groupby(["k", "name"], dropna=False).size()
+    assert len(res) == len(expected) == 5
+    assert sorted(res["_count"]) == sorted(expected)
+
+
+def test_generic_aggregates(run_module):
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({"g": rng.integers(0, 50, 10000), "v": rng.integers(0, 7, 10000)})
+    mod = run_module(
+        lambda s: HashAggregate(
+            by="g", compute=[("v", "nunique")], n_partitions=2, scheduler=s
+        ),
+        table=df,
+    )
+    res = mod.result.to_df().set_index("g").sort_index()
+    assert list(res["v_nunique"]) == list(df.groupby("g")["v"].nunique())
+    assert mod._executor is None  # shut down when the module ends
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+from progressivis.table.api import PTable
+from ipyprogressivis.widgets.chaining._raster import IncrementalRaster
+
+
+def test_missing_coordinates():
+    table = PTable("raster_nan", dshape="{x: float64, y: float64}", create=True)
+    raster = IncrementalRaster("x", "y", width=8, height=8)
+    table.append(pd.DataFrame({"x": [np.nan, np.nan], "y": [1.0, 2.0]}))
+    assert not raster.update(table)  # nothing to draw, no bounds
+    assert raster.bounds is None and raster.n_points == 2
+    table.append(pd.DataFrame({"x": [0.0, 1.0, np.inf], "y": [0.0, 1.0, 1.0]}))
+    assert raster.update(table)
+    assert raster.counts.sum() == 2
+    # out of the bounds: the grid is rebuilt, the missing points still skipped
+    table.append(pd.DataFrame({"x": [10.0, 5.0], "y": [10.0, np.nan]}))
+    assert raster.update(table)
+    assert raster.counts.sum() == 3 and raster.n_points == 7
+    x0, x1, y0, y1 = raster.bounds
+    assert x0 < 0 < 10 < x1 and y0 < 0 < 10 < y1
+    assert not raster.update(table)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from ipyprogressivis.widgets.chaining.sketches import (
+    DEFAULT_KLL_K,
+    DEFAULT_MEMORY_BUDGET,
+    KLLQuantiles,
+    QuantileSketch,
+    column_memory,
+    kll_k,
+    quantile_sketch_factory,
+)
+
+
+@pytest.mark.parametrize("n_columns", [1, 4, 32])
+def test_default_budget(n_columns):
+    # the default budget does not make the sketches larger than without budget
+    assert kll_k(column_memory(DEFAULT_MEMORY_BUDGET, n_columns)) <= DEFAULT_KLL_K
+    assert kll_k(column_memory(2**30, n_columns)) <= DEFAULT_KLL_K
+
+
+def test_quantile_sketch_is_abstract():
+    with pytest.raises(TypeError):
+        QuantileSketch()  # type: ignore
+
+
+@pytest.mark.parametrize("backend", ["kll", "tdigest", "ddsketch"])
+def test_backends(backend):
+    sketch = quantile_sketch_factory(backend, column_memory(DEFAULT_MEMORY_BUDGET, 4))()
+    assert sketch.is_empty()
+    values = np.random.default_rng(0).normal(size=10000)
+    sketch.update(values)
+    assert not sketch.is_empty()
+    assert sketch.get_min_value() == pytest.approx(values.min(), rel=1e-6)
+    assert sketch.get_max_value() == pytest.approx(values.max(), rel=1e-6)
+    assert abs(sketch.get_quantile(0.5) - np.median(values)) < 0.05
+    if backend == "kll":
+        assert isinstance(sketch, KLLQuantiles) and sketch.k == DEFAULT_KLL_K
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from ipyprogressivis.widgets.chaining.storage import (
+    CODES_DTYPE,
+    StorageOptimizer,
+    compact_dtype,
+    storage_schema,
+)
+
+
+def test_integers_are_not_downcast():
+    # an id sampled as 1..100 can grow past any narrow type later on
+    assert compact_dtype(pd.Series(np.arange(1, 101)), "int64") is None
+
+
+def test_values_outside_the_sample():
+    opt = StorageOptimizer({"id": "int16", "x": "float32"})  # int16: older settings
+    df = opt(pd.DataFrame({"id": np.arange(40000, 40100), "x": np.linspace(0, 1, 100)}))
+    assert df["id"].dtype == "int64"
+    assert list(df["id"]) == list(range(40000, 40100))
+    assert df["x"].dtype == "float32"
+    schema = storage_schema({"id": "int64", "x": "float64"}, opt.storage)
+    assert schema == {"id": "int64", "x": "float32"}
+
+
+def test_encoding_is_opt_in():
+    sample = pd.Series(["a", "b", "a", "b"] * 25, dtype=object)
+    assert compact_dtype(sample, "string") is None
+    assert compact_dtype(sample, "string", encode=True) == "category"
+
+
+def test_dictionary_round_trip():
+    opt = StorageOptimizer({"boro": "category"})
+    chunks = [
+        pd.DataFrame({"boro": ["Bronx", None, "Queens"]}),
+        pd.DataFrame({"boro": ["Queens", "Manhattan", "Bronx"]}),  # a new label
+    ]
+    dct = opt.dictionaries["boro"]
+    for chunk in chunks:
+        expected = chunk["boro"].fillna("").tolist()
+        codes = opt(chunk.copy())["boro"]
+        assert codes.dtype == CODES_DTYPE
+        assert list(dct.decode(codes)) == expected
+    assert dct.labels == ["Bronx", "Queens", "Manhattan"]